@@ -0,0 +1,47 @@
+"""add_dedicated_db_name_uniqueness
+
+Revision ID: 009e3b5df5d9
+Revises: a04484c5ec31
+Create Date: 2026-10-18 22:51:36.904127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009e3b5df5d9'
+down_revision: Union[str, None] = 'a04484c5ec31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Dedicated tenants that already share a database can't be fixed by a migration: list them
+    # before changing anything (MySQL DDL is not transactional)
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT db_name, COUNT(*) FROM tenants WHERE tenancy_mode = 'dedicated' GROUP BY db_name HAVING COUNT(*) > 1"
+    )).all()
+    if duplicates:
+        raise RuntimeError(
+            "Dedicated tenants share a database; move them apart before upgrading: "
+            + ", ".join(f"{db_name} ({count} tenants)" for db_name, count in duplicates)
+        )
+    op.add_column('tenants', sa.Column('db_created_at', sa.DateTime(), nullable=True))
+    # Virtual generated column: SQLite can add it with ALTER TABLE, and MySQL indexes it like a stored one
+    op.add_column('tenants', sa.Column(
+        'dedicated_db_name', sa.String(length=255), sa.Computed("CASE WHEN tenancy_mode = 'dedicated' THEN db_name END"),
+        nullable=True,
+    ))
+    op.create_index('uq_tenants_dedicated_db_name', 'tenants', ['dedicated_db_name'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_tenants_dedicated_db_name', table_name='tenants')
+    with op.batch_alter_table('tenants') as batch_op:
+        batch_op.drop_column('dedicated_db_name')
+        batch_op.drop_column('db_created_at')
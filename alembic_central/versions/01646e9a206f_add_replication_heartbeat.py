@@ -0,0 +1,33 @@
+"""add_replication_heartbeat
+
+Revision ID: 01646e9a206f
+Revises: 4cf6355c0075
+Create Date: 2026-10-18 21:09:48.257911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '01646e9a206f'
+down_revision: Union[str, None] = '4cf6355c0075'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'replication_heartbeat',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('beat_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('replication_heartbeat')
@@ -0,0 +1,30 @@
+"""add_spare_database_revision
+
+Revision ID: 16ef00661e79
+Revises: 912bd755d777
+Create Date: 2026-10-18 22:05:41.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '16ef00661e79'
+down_revision: Union[str, None] = '912bd755d777'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing spares start without a revision, so the next fleet run migrates them
+    op.add_column('spare_databases', sa.Column('revision', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('spare_databases') as batch_op:
+        batch_op.drop_column('revision')
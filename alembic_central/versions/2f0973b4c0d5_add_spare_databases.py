@@ -0,0 +1,41 @@
+"""add_spare_databases
+
+Revision ID: 2f0973b4c0d5
+Revises: 7fc0778706bb
+Create Date: 2026-10-18 21:06:52.174630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f0973b4c0d5'
+down_revision: Union[str, None] = '7fc0778706bb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'spare_databases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('db_name', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('db_name'),
+    )
+    op.create_index(op.f('ix_spare_databases_id'), 'spare_databases', ['id'], unique=False)
+    op.create_index(op.f('ix_spare_databases_status'), 'spare_databases', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_spare_databases_status'), table_name='spare_databases')
+    op.drop_index(op.f('ix_spare_databases_id'), table_name='spare_databases')
+    op.drop_table('spare_databases')
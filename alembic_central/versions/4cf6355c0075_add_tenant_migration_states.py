@@ -0,0 +1,43 @@
+"""add_tenant_migration_states
+
+Revision ID: 4cf6355c0075
+Revises: 2f0973b4c0d5
+Create Date: 2026-10-18 21:08:15.630284
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4cf6355c0075'
+down_revision: Union[str, None] = '2f0973b4c0d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'tenant_migration_states',
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('revision', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('error', sa.String(length=1024), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_seconds', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+        sa.PrimaryKeyConstraint('tenant_id'),
+    )
+    op.create_index(op.f('ix_tenant_migration_states_revision'), 'tenant_migration_states', ['revision'], unique=False)
+    op.create_index(op.f('ix_tenant_migration_states_status'), 'tenant_migration_states', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tenant_migration_states_status'), table_name='tenant_migration_states')
+    op.drop_index(op.f('ix_tenant_migration_states_revision'), table_name='tenant_migration_states')
+    op.drop_table('tenant_migration_states')
@@ -0,0 +1,33 @@
+"""add_tenants_updated_at
+
+Revision ID: 6565c88c4741
+Revises: efbbb460036d
+Create Date: 2026-10-18 21:02:11.418093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6565c88c4741'
+down_revision: Union[str, None] = 'efbbb460036d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Batch mode: SQLite can't ADD COLUMN with a non-constant default, so it copies the table
+    with op.batch_alter_table('tenants') as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+    op.create_index(op.f('ix_tenants_updated_at'), 'tenants', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tenants_updated_at'), table_name='tenants')
+    with op.batch_alter_table('tenants') as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,32 @@
+"""add_listing_versions
+
+Revision ID: 6986f80fd676
+Revises: c4a72848996d
+Create Date: 2026-10-18 21:15:03.327419
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6986f80fd676'
+down_revision: Union[str, None] = 'c4a72848996d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('orgs_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('organizations', sa.Column('tenants_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('organizations') as batch_op:
+        batch_op.drop_column('tenants_version')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('orgs_version')
@@ -0,0 +1,32 @@
+"""add_tenant_provisioning_status
+
+Revision ID: 7fc0778706bb
+Revises: 6565c88c4741
+Create Date: 2026-10-18 21:04:37.902516
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7fc0778706bb'
+down_revision: Union[str, None] = '6565c88c4741'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing tenants already have their databases: they start out active
+    op.add_column('tenants', sa.Column('status', sa.String(length=20), server_default='active', nullable=False))
+    op.add_column('tenants', sa.Column('provisioning_error', sa.String(length=1024), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('tenants') as batch_op:
+        batch_op.drop_column('provisioning_error')
+        batch_op.drop_column('status')
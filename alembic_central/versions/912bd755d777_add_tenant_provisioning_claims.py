@@ -0,0 +1,31 @@
+"""add_tenant_provisioning_claims
+
+Revision ID: 912bd755d777
+Revises: f2c8b5a17d36
+Create Date: 2026-10-18 21:32:07.615834
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '912bd755d777'
+down_revision: Union[str, None] = 'f2c8b5a17d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tenants', sa.Column('provisioning_claimed_by', sa.String(length=64), nullable=True))
+    op.add_column('tenants', sa.Column('provisioning_lease_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('tenants') as batch_op:
+        batch_op.drop_column('provisioning_lease_until')
+        batch_op.drop_column('provisioning_claimed_by')
@@ -0,0 +1,43 @@
+"""add_signing_keys
+
+Revision ID: b5a0366ac69d
+Revises: 6986f80fd676
+Create Date: 2026-10-18 21:16:29.745160
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5a0366ac69d'
+down_revision: Union[str, None] = '6986f80fd676'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'signing_keys',
+        sa.Column('kid', sa.String(length=64), nullable=False),
+        sa.Column('algorithm', sa.String(length=16), nullable=False),
+        sa.Column('private_key_pem', sa.Text(), nullable=False),
+        sa.Column('public_jwk', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('activates_at', sa.DateTime(), nullable=False),
+        sa.Column('retires_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('kid'),
+    )
+    op.create_index(op.f('ix_signing_keys_activates_at'), 'signing_keys', ['activates_at'], unique=False)
+    op.create_index(op.f('ix_signing_keys_expires_at'), 'signing_keys', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_signing_keys_expires_at'), table_name='signing_keys')
+    op.drop_index(op.f('ix_signing_keys_activates_at'), table_name='signing_keys')
+    op.drop_table('signing_keys')
@@ -0,0 +1,42 @@
+"""add_listing_indexes_and_lowercase_subdomains
+
+Revision ID: e4a7c2d9f1b3
+Revises: b5a0366ac69d
+Create Date: 2026-10-18 20:31:05.214877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c2d9f1b3'
+down_revision: Union[str, None] = 'b5a0366ac69d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_organizations_owner_id_id', 'organizations', ['owner_id', 'id'], unique=False)
+    op.create_index('ix_tenants_organization_id_id', 'tenants', ['organization_id', 'id'], unique=False)
+    op.create_index(op.f('ix_tenants_status'), 'tenants', ['status'], unique=False)
+
+    # Lookups compare ix_tenants_subdomain against the lowercased subdomain, so stored values
+    # must be lowercase too. Tenants that only differ by case would collide: stop and say so.
+    connection = op.get_bind()
+    collisions = connection.execute(sa.text(
+        "SELECT lower(subdomain) FROM tenants GROUP BY lower(subdomain) HAVING count(*) > 1"
+    )).scalars().all()
+    if collisions:
+        raise RuntimeError(f"Subdomains differing only by case must be renamed first: {', '.join(collisions)}")
+    connection.execute(sa.text("UPDATE tenants SET subdomain = lower(subdomain) WHERE subdomain <> lower(subdomain)"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tenants_status'), table_name='tenants')
+    op.drop_index('ix_tenants_organization_id_id', table_name='tenants')
+    op.drop_index('ix_organizations_owner_id_id', table_name='organizations')
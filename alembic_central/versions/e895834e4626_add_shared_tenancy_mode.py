@@ -0,0 +1,64 @@
+"""add_shared_tenancy_mode
+
+Revision ID: e895834e4626
+Revises: 01646e9a206f
+Create Date: 2026-10-18 21:11:26.540712
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e895834e4626'
+down_revision: Union[str, None] = '01646e9a206f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Names SQLite's unnamed UNIQUE(db_name) inside batch mode so it can be dropped
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tenants', sa.Column('tenancy_mode', sa.String(length=20), server_default='dedicated', nullable=False))
+
+    # Shared tenants all carry their shared database's name, so db_name can't stay unique.
+    # The baseline model declared it unique=True without a name: MySQL names it after the
+    # column, SQLite leaves it unnamed.
+    constraint = next(
+        (uc for uc in sa.inspect(op.get_bind()).get_unique_constraints('tenants') if uc['column_names'] == ['db_name']),
+        None,
+    )
+    if constraint is not None:
+        with op.batch_alter_table('tenants', naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(constraint['name'] or 'uq_tenants_db_name', type_='unique')
+    op.create_index(op.f('ix_tenants_db_name'), 'tenants', ['db_name'], unique=False)
+
+    op.create_table(
+        'shared_databases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('db_name', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('revision', sa.String(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('status_changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('db_name'),
+    )
+    op.create_index(op.f('ix_shared_databases_id'), 'shared_databases', ['id'], unique=False)
+    op.create_index(op.f('ix_shared_databases_status'), 'shared_databases', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fails while shared tenants exist: promote or delete them first
+    op.drop_index(op.f('ix_shared_databases_status'), table_name='shared_databases')
+    op.drop_index(op.f('ix_shared_databases_id'), table_name='shared_databases')
+    op.drop_table('shared_databases')
+    op.drop_index(op.f('ix_tenants_db_name'), table_name='tenants')
+    with op.batch_alter_table('tenants') as batch_op:
+        batch_op.create_unique_constraint('uq_tenants_db_name', ['db_name'])
+        batch_op.drop_column('tenancy_mode')
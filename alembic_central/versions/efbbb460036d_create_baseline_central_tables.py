@@ -0,0 +1,69 @@
+"""create_baseline_central_tables
+
+Revision ID: efbbb460036d
+Revises: b71c1f3df70e
+Create Date: 2026-10-18 21:18:54.096571
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'efbbb460036d'
+down_revision: Union[str, None] = 'b71c1f3df70e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # b71c1f3df70e was released empty: deployments stamped at it created these tables outside
+    # Alembic, so they are only created here when missing (a fresh database). Later revisions
+    # build on this baseline shape.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(length=255), nullable=False),
+            sa.Column('hashed_password', sa.String(length=255), nullable=False),
+            sa.Column('full_name', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+        op.create_index(op.f('ix_users_full_name'), 'users', ['full_name'], unique=False)
+        op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    if 'organizations' not in existing:
+        op.create_table(
+            'organizations',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.Column('owner_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index(op.f('ix_organizations_id'), 'organizations', ['id'], unique=False)
+        op.create_index(op.f('ix_organizations_name'), 'organizations', ['name'], unique=False)
+    if 'tenants' not in existing:
+        op.create_table(
+            'tenants',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.Column('subdomain', sa.String(length=255), nullable=False),
+            sa.Column('db_name', sa.String(length=255), nullable=False),
+            sa.Column('organization_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['organization_id'], ['organizations.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('db_name'),
+        )
+        op.create_index(op.f('ix_tenants_id'), 'tenants', ['id'], unique=False)
+        op.create_index(op.f('ix_tenants_subdomain'), 'tenants', ['subdomain'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The baseline tables may predate Alembic: leave them, like b71c1f3df70e did
+    pass
@@ -0,0 +1,38 @@
+"""add_tenant_usage
+
+Revision ID: f2c8b5a17d36
+Revises: e4a7c2d9f1b3
+Create Date: 2026-10-18 22:14:37.508163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8b5a17d36'
+down_revision: Union[str, None] = 'e4a7c2d9f1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tenant_usage',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('tenant_id', sa.Integer(), nullable=False),
+    sa.Column('requests', sa.BigInteger(), nullable=False),
+    sa.Column('errors', sa.BigInteger(), nullable=False),
+    sa.Column('bytes_in', sa.BigInteger(), nullable=False),
+    sa.Column('bytes_out', sa.BigInteger(), nullable=False),
+    sa.Column('duration_ms', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('organization_id', 'bucket_start', 'tenant_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('tenant_usage')
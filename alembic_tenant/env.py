@@ -0,0 +1,74 @@
+from logging.config import fileConfig
+
+from sqlalchemy import engine_from_config
+from sqlalchemy import pool
+
+from alembic import context
+import os
+import sys
+
+# Add project root to sys.path for imports
+# This assumes env.py is in alembic_tenant directory, so '..' goes to project root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.tenant_models import TenantBase
+from app.db.db_utils import tenant_database_url
+
+# this is the Alembic Config object, which provides
+# access to the values within the .ini file in use.
+config = context.config
+
+# Interpret the config file for Python logging, unless we are being run from inside the
+# application (run_tenant_migrations), which already has logging configured.
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = TenantBase.metadata
+
+
+def get_url() -> str:
+    # run_tenant_migrations sets sqlalchemy.url; from the command line pass -x db_name=<tenant db>
+    url = config.get_main_option("sqlalchemy.url")
+    if url:
+        return url
+    db_name = context.get_x_argument(as_dictionary=True).get("db_name")
+    if not db_name:
+        raise RuntimeError("Tenant migrations need a target database: pass -x db_name=<tenant db_name>")
+    return tenant_database_url(db_name)
+
+
+def run_migrations_offline() -> None:
+    """Run migrations in 'offline' mode."""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode."""
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+        url=get_url(),
+    )
+
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection, target_metadata=target_metadata
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
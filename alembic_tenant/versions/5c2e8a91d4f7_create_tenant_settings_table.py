@@ -0,0 +1,38 @@
+"""create_tenant_settings_table
+
+Revision ID: 5c2e8a91d4f7
+Revises: 
+Create Date: 2026-10-18 09:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e8a91d4f7'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'tenant_settings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('value', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_tenant_settings_id'), 'tenant_settings', ['id'], unique=False)
+    op.create_index(op.f('ix_tenant_settings_key'), 'tenant_settings', ['key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tenant_settings_key'), table_name='tenant_settings')
+    op.drop_index(op.f('ix_tenant_settings_id'), table_name='tenant_settings')
+    op.drop_table('tenant_settings')
@@ -0,0 +1,34 @@
+"""add_tenant_id_discriminator
+
+Revision ID: a3f19c6e2b84
+Revises: 5c2e8a91d4f7
+Create Date: 2026-10-18 14:03:21.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f19c6e2b84'
+down_revision: Union[str, None] = '5c2e8a91d4f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing (dedicated) databases keep tenant_id 0; shared databases hold many tenants' rows
+    op.add_column('tenant_settings', sa.Column('tenant_id', sa.Integer(), server_default='0', nullable=False))
+    op.drop_index(op.f('ix_tenant_settings_key'), table_name='tenant_settings')
+    op.create_index('ix_tenant_settings_tenant_id_key', 'tenant_settings', ['tenant_id', 'key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tenant_settings_tenant_id_key', table_name='tenant_settings')
+    op.create_index(op.f('ix_tenant_settings_key'), 'tenant_settings', ['key'], unique=True)
+    with op.batch_alter_table('tenant_settings') as batch_op:
+        batch_op.drop_column('tenant_id')
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional
+
+from app.core.config import settings
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+    expires_at: float
+
+
+class ListBodyCache:
+    '''
+    Short-TTL LRU of serialized list responses. Keys include the listing's version counter,
+    so an entry can never be served after the data changed; the TTL only bounds how long
+    unused versions hold memory. Disabled when `ttl_seconds` is 0.
+    '''
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, headers: Dict[str, str]) -> None:
+        with self._lock:
+            self._entries[key] = CachedBody(body, headers, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+list_body_cache = ListBodyCache(ttl_seconds=settings.LIST_CACHE_TTL_SECONDS, max_entries=settings.LIST_CACHE_MAX_ENTRIES)
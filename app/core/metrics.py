@@ -0,0 +1,137 @@
+'''
+Prometheus metrics shared by the request middleware (app/middleware/metrics.py), the DB
+engine listeners and the password hasher.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty directory shared
+by all workers (before they start): every process then writes its samples there and
+/metrics aggregates them, whichever worker serves the scrape.
+'''
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being served", multiprocess_mode="livesum")
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "http_request_db_queries", "Central/tenant DB queries per HTTP request", ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "http_request_db_seconds", "Time spent in DB queries per HTTP request", ["route"], buckets=LATENCY_BUCKETS
+)
+DB_QUERIES = Counter("db_queries_total", "DB queries, including those outside HTTP requests")
+DB_QUERY_SECONDS = Counter("db_query_seconds_total", "Time spent in DB queries")
+
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify latency, queueing included", ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to check a connection out of a central pool", ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# Counters rather than histograms: one series per tenant is already the expensive part
+TENANT_REQUESTS = Counter("tenant_requests_total", "HTTP requests routed to a tenant database", ["tenant"])
+TENANT_REQUEST_SECONDS = Counter("tenant_request_seconds_total", "Time spent serving tenant requests", ["tenant"])
+
+
+class RequestDBStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+# Set by the middleware for the duration of a request; None outside requests
+current_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("current_db_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.inc(elapsed)
+    stats = current_db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+def instrument_engine(engine: Engine) -> None:
+    '''
+    Counts queries and their time on `engine` (pass `async_engine.sync_engine` for async engines).
+    '''
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def instrument_pool_waits(waits) -> None:
+    '''
+    Observes every checkout of a central pool (db/pool_monitor.PoolWaits) in DB_POOL_CHECKOUT_WAIT.
+    '''
+    if not waits.observers:
+        waits.observers.append(DB_POOL_CHECKOUT_WAIT.labels(waits.name).observe)
+
+
+class StatsCollector:
+    '''
+    Exports the stats() dicts of in-process components (caches, pools, pipelines) as gauges,
+    read at scrape time. These describe the worker serving the scrape, hence the pid label
+    in multiprocess mode.
+    '''
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], dict]] = {}
+
+    def register(self, component: str, stats: Callable[[], dict]) -> None:
+        self._sources[component] = stats
+
+    def collect(self) -> List[GaugeMetricFamily]:
+        labels = ["pid"] if MULTIPROCESS else []
+        values = [str(os.getpid())] if MULTIPROCESS else []
+        families = []
+        for component, stats in self._sources.items():
+            for key, value in stats().items():
+                if isinstance(value, (bool, int, float)):
+                    family = GaugeMetricFamily(f"saas_{component}_{key}", f"{component} {key}", labels=labels)
+                    family.add_metric(values, float(value))
+                    families.append(family)
+        return families
+
+
+stats_collector = StatsCollector()
+_stats_registry = CollectorRegistry()
+_stats_registry.register(stats_collector)
+
+
+def render_metrics() -> bytes:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry) + generate_latest(_stats_registry)
+    return generate_latest(REGISTRY) + generate_latest(_stats_registry)
+
+def mark_process_dead() -> None:
+    # Drops this worker's live gauges (in-progress requests) from the shared directory
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_LATENCY
+
+logger = logging.getLogger(__name__)
+
+_bcrypt = CryptContext(schemes=["bcrypt"], deprecated="auto").handler("bcrypt")
+
+
+# Module-level so they can be pickled into the worker processes
+
+def bcrypt_hash(password: str, rounds: int) -> str:
+    return _bcrypt.using(rounds=rounds).hash(password)
+
+def bcrypt_verify(password: str, hashed_password: str) -> bool:
+    return _bcrypt.verify(password, hashed_password)
+
+def _time_hash(rounds: int, samples: int) -> float:
+    start = time.perf_counter()
+    for _ in range(samples):
+        bcrypt_hash("calibration-password", rounds)
+    return (time.perf_counter() - start) / samples
+
+
+def get_hash_rounds(hashed_password: str) -> Optional[int]:
+    try:
+        return _bcrypt.from_string(hashed_password).rounds
+    except ValueError:
+        return None
+
+
+class PasswordHasher:
+    '''
+    Runs bcrypt in a dedicated process pool so login bursts cannot pin the request
+    threadpool. At most `max_workers` hashes run at once and at most `max_queue` more wait;
+    beyond that callers get a 503 instead of piling up behind the CPU.
+    '''
+
+    def __init__(self, max_workers: int, max_queue: int, rounds: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            # Not started (scripts, background jobs): fall back to the threadpool
+            return await run_in_threadpool(fn, *args)
+        if self._pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests, please retry.",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        with PASSWORD_HASH_LATENCY.labels("hash").time():
+            return await self._run(bcrypt_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        with PASSWORD_HASH_LATENCY.labels("verify").time():
+            return await self._run(bcrypt_verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        rounds = get_hash_rounds(hashed_password)
+        if rounds is None:
+            return False
+        # Upgrade weaker hashes; only downgrade when more than one round too slow, so workers
+        # whose calibration lands one round apart do not keep rehashing each other's output.
+        return rounds < self.rounds or rounds > self.rounds + 1
+
+    async def calibrate(self, target_ms: float, min_rounds: int, max_rounds: int) -> int:
+        '''
+        Picks the highest bcrypt cost whose hash time on this host stays under `target_ms`.
+        Each extra round doubles the cost, so one measurement at `min_rounds` is enough.
+        '''
+        seconds = await self._run(_time_hash, min_rounds, 3)
+        rounds = min_rounds
+        while rounds < max_rounds and seconds * 2 * 1000 <= target_ms:
+            seconds *= 2
+            rounds += 1
+        self.rounds = rounds
+        logger.info(f"bcrypt cost calibrated to {rounds} rounds (~{seconds * 1000:.0f} ms per hash)")
+        return rounds
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "max_workers": self.max_workers,
+            "pending": self._pending,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    rounds=settings.PASSWORD_HASH_ROUNDS,
+)
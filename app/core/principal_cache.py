@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models.central_models import User
+
+
+class Principal(NamedTuple):
+    id: int
+    email: str
+    full_name: Optional[str]
+    expires_at: float # The token's exp; the entry is never served past it
+    jti: Optional[str] = None # Checked against the token denylist on every hit
+
+    def to_user(self) -> User:
+        # A fresh detached instance per request, so handlers can't mutate a shared object
+        user = User(id=self.id, email=self.email, full_name=self.full_name)
+        make_transient_to_detached(user)
+        return user
+
+
+class PrincipalCache:
+    '''
+    Bounded LRU of access token -> authenticated principal, so get_current_user can skip
+    the users lookup on repeat requests. Updating a user drops their entries and makes
+    tokens issued before the update fall back to a DB lookup.
+    '''
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Principal]" = OrderedDict()
+        self._invalidated_at: Dict[int, float] = {} # user id -> time of the last update
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            principal = self._entries.get(token)
+            if principal is None:
+                self.misses += 1
+                return None
+            if principal.expires_at <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return principal
+
+    def put(self, token: str, principal: Principal) -> None:
+        with self._lock:
+            self._entries[token] = principal
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        now = time.time()
+        with self._lock:
+            for token in [t for t, p in self._entries.items() if p.id == user_id]:
+                del self._entries[token]
+            self._invalidated_at[user_id] = now
+            # Markers older than the longest token lifetime can no longer match any live token
+            horizon = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            for uid in [u for u, at in self._invalidated_at.items() if at < horizon]:
+                del self._invalidated_at[uid]
+
+    def issued_before_invalidation(self, user_id: int, issued_at: Optional[float]) -> bool:
+        invalidated_at = self._invalidated_at.get(user_id)
+        if invalidated_at is None:
+            return False
+        return issued_at is None or issued_at <= invalidated_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._invalidated_at.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+principal_cache = PrincipalCache(max_entries=settings.PRINCIPAL_CACHE_SIZE)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target: User) -> None:
+    # Fires for every ORM flush that updates a user, sync or async, in this process
+    principal_cache.invalidate_user(target.id)
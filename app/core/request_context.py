@@ -0,0 +1,97 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Depends, Request
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_current_active_user
+from app.db.replicas import get_read_db
+from app.db.session import get_async_db
+from app.models.central_models import Organization, Tenant, User
+from app.services.list_versions import tenants_version_statement
+from app.services.tenant_service import TENANT_READ_COLUMNS
+from app.services.usage_service import record_usage_owner
+
+
+class RequestContext:
+    '''
+    Per-request view of what the current user may touch. Organizations (and, when asked
+    for together, a page of their tenants) are loaded in one query and memoized, so a
+    handler and the services it calls never repeat the same ownership lookup. Every
+    organization that passes the check is recorded as the request's usage owner.
+    '''
+
+    def __init__(self, db: AsyncSession, user: User, request: Optional[Request] = None):
+        self.db = db
+        self.user = user
+        self.request = request
+        self._organizations: Dict[int, Optional[Organization]] = {}
+
+    def _owned(self, org_id: int) -> None:
+        if self.request is not None:
+            record_usage_owner(self.request, org_id)
+
+    async def get_organization(self, org_id: int) -> Optional[Organization]:
+        if org_id not in self._organizations:
+            result = await self.db.execute(
+                select(Organization).where(Organization.id == org_id, Organization.owner_id == self.user.id).limit(1)
+            )
+            self._organizations[org_id] = result.scalars().first()
+        if self._organizations[org_id] is not None:
+            self._owned(org_id)
+        return self._organizations[org_id]
+
+    async def get_tenants_version(self, org_id: int) -> Optional[int]:
+        '''
+        Version of the organization's tenant listing, or None if it is not the user's.
+        '''
+        version = await self.db.scalar(tenants_version_statement(org_id, self.user.id))
+        if version is not None:
+            self._owned(org_id)
+        return version
+
+    async def get_organization_tenant_rows(
+        self, org_id: int, limit: int, after_id: Optional[int] = None, name_prefix: Optional[str] = None
+    ) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+        '''
+        Ownership check, listing version and one keyset page of tenants in a single round trip:
+        the outer join still returns the organization row when the page is empty. Returns
+        (tenants_version, rows), with version None if the organization is not the user's.
+        Tenants come back as dicts shaped like TenantRead, straight from the selected columns.
+        '''
+        tenant_filter = Tenant.organization_id == Organization.id
+        if after_id is not None:
+            tenant_filter = and_(tenant_filter, Tenant.id > after_id)
+        if name_prefix:
+            tenant_filter = and_(tenant_filter, Tenant.name.startswith(name_prefix, autoescape=True))
+        result = await self.db.execute(
+            select(Organization.tenants_version.label("tenants_version_"), *TENANT_READ_COLUMNS)
+            .outerjoin(Tenant, tenant_filter)
+            .where(Organization.id == org_id, Organization.owner_id == self.user.id)
+            .order_by(Tenant.id)
+            .limit(limit)
+        )
+        keys = list(result.keys())[1:]
+        rows = result.all()
+        version = rows[0].tenants_version_ if rows else None
+        if version is not None:
+            self._owned(org_id)
+        return version, [dict(zip(keys, row[1:])) for row in rows if row.id is not None]
+
+
+# FastAPI caches dependencies per request, so every Depends(get_request_context) in one
+# request shares the same context (and the same session).
+async def get_request_context(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user),
+) -> RequestContext:
+    return RequestContext(db=db, user=current_user, request=request)
+
+# Same, for read-only handlers: the session comes from a replica when one is usable.
+async def get_read_request_context(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user),
+) -> RequestContext:
+    return RequestContext(db=db, user=current_user, request=request)
@@ -1,35 +1,67 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import settings
-from app.db.session import get_db
+from app.core.principal_cache import Principal, principal_cache
+from app.core.signing_keys import key_ring
+from app.core.token_denylist import token_denylist
+from app.db.replicas import current_principal_id, get_read_db
 from app.models.central_models import User
 from app.schemas.auth_schemas import TokenData
-from app.services import auth_service # For get_user_by_email
+from app.services import auth_service # For get_user_by_email_async
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login") # tokenUrl should match your login endpoint
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)) -> User:
+    cached = principal_cache.get(token)
+    if cached is not None:
+        if cached.jti is not None and token_denylist.is_revoked(cached.jti):
+            raise _credentials_exception()
+        current_principal_id.set(cached.id)
+        return cached.to_user()
+
+    credentials_exception = _credentials_exception()
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = await key_ring.decode_async(token) # Keys are parsed once per worker, looked up by kid
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    
-    user = auth_service.get_user_by_email(db, email=token_data.email)
-    if user is None:
+    if payload.get("typ") == auth_service.REFRESH_TOKEN_TYPE:
+        raise credentials_exception # Refresh tokens only work on /auth/refresh
+    jti = payload.get("jti")
+    if jti is not None and token_denylist.is_revoked(jti):
         raise credentials_exception
-    return user
+
+    user_id = payload.get("uid")
+    if user_id is not None and not principal_cache.issued_before_invalidation(user_id, payload.get("iat")):
+        # Tokens carry the user id and name, so they resolve without a users lookup
+        principal = Principal(
+            id=user_id, email=token_data.email, full_name=payload.get("name"), expires_at=payload["exp"], jti=jti
+        )
+    else:
+        # Tokens issued before this change, or before the user was last updated
+        user = await auth_service.get_user_by_email_async(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        principal = Principal(id=user.id, email=user.email, full_name=user.full_name, expires_at=payload["exp"], jti=jti)
+    principal_cache.put(token, principal)
+    current_principal_id.set(principal.id) # Writes in this request start its read-your-writes window
+    return principal.to_user()
+
+async def get_current_token_claims(token: str = Depends(oauth2_scheme), current_user: User = Depends(get_current_user)) -> dict:
+    # Claims of the bearer token; get_current_user has already verified it
+    return jwt.get_unverified_claims(token)
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     # If you add an is_active field to User model, you can check it here.
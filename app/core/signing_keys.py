@@ -0,0 +1,298 @@
+'''
+Asymmetric JWT signing with rotated keys.
+
+Tokens are signed with the current key of the key ring and carry its id in the `kid`
+header; anyone can verify them against the public keys served at /.well-known/jwks.json,
+so edge services need neither SECRET_KEY nor a call to this API.
+
+Keys live in the signing_keys table (private keys encrypted with SECRET_KEY). Each one is:
+
+- published in the JWKS from creation, JWT_KEY_PREPUBLISH_HOURS before it starts signing,
+  so verifiers that cache the JWKS already have it when the first token arrives;
+- the signing key from activates_at for JWT_KEY_ROTATION_DAYS;
+- kept published after that until every token it signed has expired.
+
+Every worker loads the keys at startup and re-reads them every JWT_KEY_CHECK_SECONDS,
+creating the next key when it is due. Keys are parsed once per worker into jose key
+objects, so verifying a token is a dict lookup by kid plus the signature check.
+
+With ALGORITHM = "HS256" none of this is used and tokens are signed with SECRET_KEY, as
+before. Tokens without a kid (issued before the switch) keep verifying against SECRET_KEY
+while JWT_ACCEPT_LEGACY_HS256 is on.
+'''
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.central_models import SigningKey, utcnow
+
+logger = logging.getLogger(__name__)
+
+LEGACY_ALGORITHM = "HS256"
+# Tokens with an unknown kid trigger a reload (a key another worker just created) at most this often
+UNKNOWN_KID_RELOAD_SECONDS = 5.0
+
+
+class UnknownKeyError(JWTError):
+    pass
+
+
+def _epoch(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _generate_private_key(algorithm: str):
+    if algorithm in ("RS256", "RS384", "RS512"):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "ES384":
+        return ec.generate_private_key(ec.SECP384R1())
+    raise ValueError(f"Unsupported JWT signing algorithm {algorithm}")
+
+
+def new_signing_key(algorithm: str, activates_at: datetime) -> SigningKey:
+    '''
+    Generates a key pair signing from `activates_at` for JWT_KEY_ROTATION_DAYS. The kid is
+    derived from the algorithm and activation time, so workers that create the same
+    scheduled key at once collide on the primary key instead of publishing two.
+    '''
+    private_key = _generate_private_key(algorithm)
+    kid = f"{algorithm.lower()}-{activates_at:%Y%m%dT%H%M%S}"
+    public_jwk = {**jwk.construct(private_key.public_key(), algorithm).to_dict(), "kid": kid, "use": "sig"}
+    retires_at = activates_at + timedelta(days=settings.JWT_KEY_ROTATION_DAYS)
+    # Refresh tokens are signed too, so a retired key must outlive the longest-lived token
+    token_lifetime = max(
+        timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES), timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    return SigningKey(
+        kid=kid,
+        algorithm=algorithm,
+        private_key_pem=private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.BestAvailableEncryption(settings.SECRET_KEY.encode()),
+        ).decode(),
+        public_jwk=json.dumps(public_jwk, sort_keys=True),
+        activates_at=activates_at,
+        retires_at=retires_at,
+        expires_at=retires_at + token_lifetime,
+    )
+
+
+@dataclass
+class LoadedKey:
+    kid: str
+    algorithm: str
+    private_key: Key # Parsed once at load
+    public_key: Key
+    public_jwk: dict
+    activates_at: float
+    retires_at: float
+
+
+class KeyRing:
+    '''
+    The worker's parsed signing keys by kid, plus the serialized JWKS document.
+    '''
+
+    def __init__(self):
+        self._keys: Dict[str, LoadedKey] = {}
+        self._jwks_body = b'{"keys":[]}'
+        self._jwks_etag = '"jwks-empty"'
+        self._lock = threading.Lock()
+        self._last_reload = 0.0
+        self.loaded = False
+        self.reloads = 0
+        self.rotations = 0
+        self.unknown_kids = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ALGORITHM != LEGACY_ALGORITHM
+
+    @property
+    def jwks(self) -> tuple:
+        # (body, etag), replaced together on reload
+        return self._jwks_body, self._jwks_etag
+
+    def signing_key(self) -> LoadedKey:
+        '''
+        The newest key that has activated. If rotation has stalled that may be past its
+        retires_at; it still signs, since it stays published until its expires_at.
+        '''
+        now = time.time()
+        current = None
+        for key in self._keys.values():
+            if key.activates_at <= now and key.algorithm == settings.ALGORITHM:
+                if current is None or (key.activates_at, key.kid) > (current.activates_at, current.kid):
+                    current = key
+        if current is None:
+            raise RuntimeError("No JWT signing key is loaded")
+        return current
+
+    def encode(self, claims: dict) -> str:
+        if not self.enabled:
+            return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        key = self.signing_key()
+        return jwt.encode(claims, key.private_key, algorithm=key.algorithm, headers={"kid": key.kid})
+
+    def decode(self, token: str) -> dict:
+        '''
+        Verified claims of `token`; raises JWTError. The algorithm is the one of the key
+        named by the kid, never the one the token claims.
+        '''
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            if self.enabled and not settings.JWT_ACCEPT_LEGACY_HS256:
+                raise JWTError("Token has no key id")
+            return jwt.decode(token, settings.SECRET_KEY, algorithms=[LEGACY_ALGORITHM])
+        key = self._keys.get(kid)
+        if key is None:
+            self.unknown_kids += 1
+            raise UnknownKeyError(f"Unknown key id {kid!r}")
+        return jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+
+    async def decode_async(self, token: str) -> dict:
+        # As decode, but a token signed with a key this worker has not loaded yet reloads the keys once
+        try:
+            return self.decode(token)
+        except UnknownKeyError:
+            if time.monotonic() - self._last_reload < UNKNOWN_KID_RELOAD_SECONDS:
+                raise
+            self._last_reload = time.monotonic()
+            await run_in_threadpool(self.load_from_db)
+            return self.decode(token)
+
+    def _parse(self, row: SigningKey) -> LoadedKey:
+        private_key = serialization.load_pem_private_key(row.private_key_pem.encode(), password=settings.SECRET_KEY.encode())
+        return LoadedKey(
+            kid=row.kid,
+            algorithm=row.algorithm,
+            private_key=jwk.construct(private_key, row.algorithm),
+            public_key=jwk.construct(private_key.public_key(), row.algorithm),
+            public_jwk=json.loads(row.public_jwk),
+            activates_at=_epoch(row.activates_at),
+            retires_at=_epoch(row.retires_at),
+        )
+
+    def load(self, db: Session) -> int:
+        '''
+        Replaces the key set with the unexpired keys in the database, parsing only keys not
+        already loaded. Returns the number of keys.
+        '''
+        keys: Dict[str, LoadedKey] = {}
+        for row in db.query(SigningKey).filter(SigningKey.expires_at > utcnow()).order_by(SigningKey.activates_at.desc()):
+            key = self._keys.get(row.kid)
+            if key is None:
+                try:
+                    key = self._parse(row)
+                except Exception as e: # Typically SECRET_KEY changed since the key was stored
+                    self.errors += 1
+                    logger.error(f"Could not load JWT signing key {row.kid}: {e}")
+                    continue
+            keys[row.kid] = key
+        body = json.dumps({"keys": [key.public_jwk for key in keys.values()]}, separators=(",", ":")).encode()
+        with self._lock:
+            self._keys = keys
+            self._jwks_body = body
+            self._jwks_etag = f'"jwks-{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            self.loaded = True
+            self.reloads += 1
+        return len(keys)
+
+    def rotate(self, db: Session) -> Optional[SigningKey]:
+        '''
+        Creates the next key when it is due: immediately if no key of ALGORITHM has
+        activated, else once the newest key is within JWT_KEY_PREPUBLISH_HOURS of retiring,
+        activating when it retires. Returns the new key, or None.
+        '''
+        now = utcnow()
+        rows = (
+            db.query(SigningKey.activates_at, SigningKey.retires_at)
+            .filter(SigningKey.algorithm == settings.ALGORITHM, SigningKey.expires_at > now)
+            .order_by(SigningKey.activates_at.desc())
+            .all()
+        )
+        if not rows or min(row.activates_at for row in rows) > now:
+            activates_at = now.replace(second=0, microsecond=0) # Workers starting in the same minute create the same kid
+        elif rows[0].retires_at - now <= timedelta(hours=settings.JWT_KEY_PREPUBLISH_HOURS):
+            activates_at = max(rows[0].retires_at, now.replace(second=0, microsecond=0))
+        else:
+            return None
+        key = new_signing_key(settings.ALGORITHM, activates_at)
+        db.add(key)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback() # Another worker created it first
+            return None
+        self.rotations += 1
+        logger.info(f"Created JWT signing key {key.kid}, signing from {key.activates_at:%Y-%m-%d %H:%M:%S} UTC")
+        return key
+
+    def load_from_db(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.load(db)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"JWT signing key reload failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def refresh_from_db(self) -> int:
+        db = SessionLocal()
+        try:
+            self.rotate(db)
+            return self.load(db)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"JWT signing key refresh failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def run_rotator(self) -> None:
+        '''
+        Background loop started from the app lifespan.
+        '''
+        while True:
+            await asyncio.sleep(settings.JWT_KEY_CHECK_SECONDS)
+            await run_in_threadpool(self.refresh_from_db)
+
+    def stats(self) -> dict:
+        stats = {
+            "keys": len(self._keys),
+            "loaded": self.loaded,
+            "reloads": self.reloads,
+            "rotations": self.rotations,
+            "unknown_kids": self.unknown_kids,
+            "errors": self.errors,
+        }
+        try:
+            stats["signing_key_age_seconds"] = time.time() - self.signing_key().activates_at
+        except RuntimeError:
+            pass
+        return stats
+
+
+key_ring = KeyRing()
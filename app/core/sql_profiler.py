@@ -0,0 +1,281 @@
+'''
+Opt-in SQL statement profiler (SQL_PROFILER_ENABLED). Statements are normalized into
+fingerprints (literals and bind parameters replaced, IN lists collapsed) and aggregated
+per endpoint; a fingerprint repeated within one request is reported as a likely N+1.
+
+In tests and scripts, `sql_profiler.profile()` enforces a query budget. With the profiler
+disabled it attaches its listeners only while a profile() block is open:
+
+    with sql_profiler.profile("list tenants", max_queries=2):
+        client.get("/organizations/1/tenants/", headers=headers)
+'''
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NO_REQUEST = "<no request>" # Endpoint label for queries from background jobs and scripts
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_BIND_PARAMETER = re.compile(r"%\((\w+)\)s|%s|:\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    '''
+    Normalizes a statement so that executions differing only in values share one fingerprint.
+    '''
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _BIND_PARAMETER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("(?...)", normalized)
+    normalized = _VALUES_LIST.sub(r"\1", normalized) # Multi-row VALUES
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+@dataclass
+class FingerprintStats:
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+
+@dataclass
+class RequestProfile:
+    endpoint: str
+    queries: int = 0
+    seconds: float = 0.0
+    fingerprints: Dict[str, FingerprintStats] = field(default_factory=dict)
+    parent: Optional["RequestProfile"] = None # Enclosing profile() block, which sees nested requests' queries too
+    record: bool = True # Added to the per-endpoint totals when closed
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [(fp, stats.count) for fp, stats in self.fingerprints.items() if stats.count >= threshold]
+
+
+@dataclass
+class NPlusOneFinding:
+    endpoint: str
+    fingerprint: str
+    count: int # Executions in the worst request seen
+    occurrences: int = 1 # Requests in which it was flagged
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_sql_profile", default=None)
+
+
+class SQLProfiler:
+    '''
+    Aggregates count/total/max time per (endpoint, fingerprint). Listeners are only
+    attached to engines when enabled, so the disabled profiler costs nothing.
+    '''
+
+    def __init__(self, enabled: bool, n_plus_one_threshold: int, slow_query_ms: float):
+        self.enabled = enabled
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_query_seconds = slow_query_ms / 1000
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], FingerprintStats] = {}
+        self._findings: Dict[Tuple[str, str], NPlusOneFinding] = {}
+        self.requests = 0
+        self.slow_queries = 0
+        self._open_profiles = 0 # profile() blocks open in this process while disabled
+
+    def install(self, engine: Engine) -> None:
+        if not event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def uninstall(self, engine: Engine) -> None:
+        if event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start_times = conn.info.get("profiler_start_time")
+        if not start_times:
+            return # Listeners attached while this statement was running
+        elapsed = time.perf_counter() - start_times.pop()
+        fp = fingerprint(statement)
+        profile = _current_profile.get()
+        if profile is not None:
+            # Merged into the totals in end_request, once the route (and so the endpoint) is known
+            current = profile
+            while current is not None:
+                current.queries += 1
+                current.seconds += elapsed
+                current.fingerprints.setdefault(fp, FingerprintStats()).add(elapsed)
+                current = current.parent
+        else:
+            with self._lock:
+                self._stats.setdefault((NO_REQUEST, fp), FingerprintStats()).add(elapsed)
+        if elapsed >= self.slow_query_seconds:
+            self.slow_queries += 1
+            endpoint = profile.endpoint if profile is not None else NO_REQUEST
+            logger.warning(f"Slow query on {endpoint} ({elapsed * 1000:.1f} ms): {fp}")
+
+    def begin_request(self, endpoint: str, record: bool = True):
+        return _current_profile.set(RequestProfile(endpoint=endpoint, parent=_current_profile.get(), record=record))
+
+    def end_request(self, token, endpoint: Optional[str] = None) -> RequestProfile:
+        '''
+        Closes the profile opened by begin_request, adds it to the per-endpoint totals and
+        records N+1 findings.
+        '''
+        profile = _current_profile.get()
+        _current_profile.reset(token)
+        if endpoint is not None:
+            profile.endpoint = endpoint
+        if not profile.record:
+            return profile
+        repeated = profile.repeated(self.n_plus_one_threshold)
+        with self._lock:
+            self.requests += 1
+            for fp, stats in profile.fingerprints.items():
+                total = self._stats.setdefault((profile.endpoint, fp), FingerprintStats())
+                total.count += stats.count
+                total.total_seconds += stats.total_seconds
+                total.max_seconds = max(total.max_seconds, stats.max_seconds)
+            for fp, count in repeated:
+                finding = self._findings.get((profile.endpoint, fp))
+                if finding is None:
+                    self._findings[(profile.endpoint, fp)] = NPlusOneFinding(profile.endpoint, fp, count)
+                    logger.warning(f"Possible N+1 on {profile.endpoint}: {count} executions of {fp}")
+                else:
+                    finding.occurrences += 1
+                    finding.count = max(finding.count, count)
+        return profile
+
+    @contextmanager
+    def profile(
+        self,
+        name: str,
+        max_queries: Optional[int] = None,
+        max_repeats: Optional[int] = None,
+    ) -> Iterator[RequestProfile]:
+        '''
+        Profiles the block like a request named `name` and raises QueryBudgetExceeded when it
+        ran more than `max_queries` statements or one fingerprint more than `max_repeats` times.
+        Works whether or not the profiler is enabled for the app: when disabled, the listeners
+        are attached by the first open block and detached when the last one exits.
+        '''
+        if not self.enabled:
+            self._open_profile()
+        try:
+            token = self.begin_request(name, record=False)
+            try:
+                yield _current_profile.get()
+            finally:
+                profile = self.end_request(token)
+        finally:
+            if not self.enabled:
+                self._close_profile()
+        if max_queries is not None and profile.queries > max_queries:
+            raise QueryBudgetExceeded(
+                f"{name}: {profile.queries} queries, budget {max_queries}\n" + self._format_profile(profile)
+            )
+        if max_repeats is not None:
+            repeated = profile.repeated(max_repeats + 1)
+            if repeated:
+                raise QueryBudgetExceeded(
+                    f"{name}: statements repeated more than {max_repeats} times (N+1?)\n"
+                    + "\n".join(f"  {count}x {fp}" for fp, count in repeated)
+                )
+
+    def _open_profile(self) -> None:
+        from app.db.session import central_engines
+        with self._lock:
+            self._open_profiles += 1
+            if self._open_profiles == 1:
+                central_engines.add_hook(self.install)
+
+    def _close_profile(self) -> None:
+        from app.db.session import central_engines
+        with self._lock:
+            self._open_profiles -= 1
+            if self._open_profiles == 0:
+                central_engines.remove_hook(self.install, self.uninstall)
+
+    def _format_profile(self, profile: RequestProfile) -> str:
+        return "\n".join(
+            f"  {stats.count}x {stats.total_seconds * 1000:.1f} ms {fp}"
+            for fp, stats in sorted(profile.fingerprints.items(), key=lambda item: -item[1].count)
+        )
+
+    def report(self, top: int = 20) -> dict:
+        with self._lock:
+            stats = sorted(self._stats.items(), key=lambda item: -item[1].total_seconds)[:top]
+            findings = sorted(self._findings.values(), key=lambda f: -f.count)
+            return {
+                "requests": self.requests,
+                "slow_queries": self.slow_queries,
+                "fingerprints": [
+                    {
+                        "endpoint": endpoint,
+                        "fingerprint": fp,
+                        "count": s.count,
+                        "total_ms": round(s.total_seconds * 1000, 3),
+                        "avg_ms": round(s.total_seconds / s.count * 1000, 3),
+                        "max_ms": round(s.max_seconds * 1000, 3),
+                    }
+                    for (endpoint, fp), s in stats
+                ],
+                "n_plus_one": [
+                    {"endpoint": f.endpoint, "fingerprint": f.fingerprint, "count": f.count, "occurrences": f.occurrences}
+                    for f in findings
+                ],
+            }
+
+    def format_report(self, top: int = 20) -> str:
+        report = self.report(top)
+        lines = [f"SQL profile: {report['requests']} requests, {report['slow_queries']} slow queries"]
+        for row in report["fingerprints"]:
+            lines.append(
+                f"{row['total_ms']:10.1f} ms {row['count']:7}x avg {row['avg_ms']:7.2f} max {row['max_ms']:7.2f}  "
+                f"{row['endpoint']}  {row['fingerprint']}"
+            )
+        for row in report["n_plus_one"]:
+            lines.append(f"N+1 {row['endpoint']}: up to {row['count']}x in {row['occurrences']} requests  {row['fingerprint']}")
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._findings.clear()
+            self.requests = 0
+            self.slow_queries = 0
+
+
+sql_profiler = SQLProfiler(
+    enabled=settings.SQL_PROFILER_ENABLED,
+    n_plus_one_threshold=settings.SQL_PROFILER_N_PLUS_ONE_THRESHOLD,
+    slow_query_ms=settings.SQL_PROFILER_SLOW_QUERY_MS,
+)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.central_models import RefreshToken, RevokedToken, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Same overlap as the tenant directory: re-read recent rows so late commits are not missed
+MARKER_OVERLAP = timedelta(seconds=30)
+# Expired rows are deleted from the central DB every this many syncs
+PURGE_EVERY_SYNCS = 120
+
+
+def _epoch(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TokenDenylist:
+    '''
+    In-process set of revoked access token ids (jti -> exp), so get_current_user checks
+    revocation with a dict lookup instead of a query. Loaded at startup and synced
+    incrementally from revoked_tokens using revoked_at as the change marker; revocations
+    made by this worker apply immediately, other workers' within one sync interval.
+
+    Entries are dropped once the token they deny has expired, so the set only ever holds
+    revocations from the last ACCESS_TOKEN_EXPIRE_MINUTES.
+    '''
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._marker: Optional[datetime] = None
+        self._lock = threading.Lock() # add() runs on the event loop, sync() and its prune in the threadpool
+        self.loaded = False
+        self.syncs = 0
+        self.sync_errors = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti in self._revoked:
+            self.rejected += 1
+            return True
+        return False
+
+    def add(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def _prune_locked(self) -> None:
+        now = time.time()
+        for jti in [j for j, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[jti]
+
+    def sync(self, db: Session) -> int:
+        '''
+        Loads every unexpired revocation on the first call, then rows revoked since the last
+        marker. Returns the number of rows applied.
+        '''
+        query = db.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+        if self._marker is None:
+            query = query.filter(RevokedToken.expires_at > utcnow())
+        else:
+            query = query.filter(RevokedToken.revoked_at >= self._marker - MARKER_OVERLAP)
+        # Fetched before taking the lock, so add() on the event loop never waits on the database
+        rows = query.all()
+        marker = self._marker
+        with self._lock:
+            for jti, expires_at, revoked_at in rows:
+                self._revoked[jti] = _epoch(expires_at)
+                if marker is None or revoked_at > marker:
+                    marker = revoked_at
+            self._prune_locked()
+            self._marker = marker or utcnow() - MARKER_OVERLAP
+            self.loaded = True
+            self.syncs += 1
+        return len(rows)
+
+    def purge_expired(self, db: Session) -> None:
+        # Neither expired revocations nor expired refresh tokens can match a usable token
+        now = utcnow()
+        db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        db.execute(delete(RefreshToken).where(RefreshToken.expires_at < now))
+        db.commit()
+
+    def sync_from_db(self) -> int:
+        db = SessionLocal()
+        try:
+            applied = self.sync(db)
+            if self.syncs % PURGE_EVERY_SYNCS == 0:
+                self.purge_expired(db)
+            return applied
+        except Exception as e:
+            self.sync_errors += 1
+            logger.error(f"Token denylist sync failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def run_syncer(self) -> None:
+        '''
+        Background loop started from the app lifespan.
+        '''
+        while True:
+            await asyncio.sleep(settings.TOKEN_DENYLIST_SYNC_SECONDS)
+            await run_in_threadpool(self.sync_from_db)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._revoked),
+            "loaded": self.loaded,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+            "rejected": self.rejected,
+        }
+
+
+token_denylist = TokenDenylist()
@@ -1,46 +1,85 @@
 import sqlalchemy
 from app.core.config import settings
+from app.db.provisioners import get_provisioner
+from typing import TYPE_CHECKING, Optional
 import logging
+import os
+import threading
+
+if TYPE_CHECKING:
+    from alembic.config import Config
 
 logger = logging.getLogger(__name__)
 
+TENANT_ALEMBIC_INI = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "alembic_tenant.ini"))
+
+# Alembic's `context`/`op` proxies are module globals, so migrations must not run in two
+# threads of one process at once. Parallel fleet runs use processes (see fleet_migrations.py).
+_alembic_lock = threading.Lock()
+
+def tenant_database_url(db_name: str) -> str:
+    '''
+    Builds the SQLAlchemy URL of a tenant database for the configured TENANT_DB_BACKEND.
+    '''
+    return get_provisioner().database_url(db_name)
+
 def create_mysql_database(db_name: str):
     '''
-    Creates a new MySQL database.
-    Uses root credentials from settings to connect to the MySQL server (not a specific DB).
+    Creates a tenant database through the shared provisioner (MySQL or SQLite files).
+    Returns False if it already existed, so callers know not to drop it on rollback.
     '''
     try:
-        # Connect to MySQL server (without specifying a database initially)
-        engine = sqlalchemy.create_engine(
-            f"mysql+mysqlclient://{settings.MYSQL_ROOT_USER}:{settings.MYSQL_ROOT_PASSWORD}@{settings.MYSQL_HOST}:{settings.MYSQL_PORT}",
-            isolation_level="AUTOCOMMIT" # Autocommit needed for CREATE DATABASE
-        )
-        with engine.connect() as connection:
-            # Check if database exists
-            result = connection.execute(sqlalchemy.text(f"SHOW DATABASES LIKE '{db_name}'"))
-            if result.fetchone():
-                logger.warning(f"Database {db_name} already exists.")
-                # Depending on policy, could raise error or return success
-                # For now, let's allow it to proceed if it exists, assuming it's benign or for idempotency
-                return True 
-            
-            # Create the database
-            connection.execute(sqlalchemy.text(f"CREATE DATABASE {db_name} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"))
-            logger.info(f"Successfully created database: {db_name}")
-        return True
+        return get_provisioner().create_database(db_name)
     except sqlalchemy.exc.SQLAlchemyError as e:
         logger.error(f"Error creating database {db_name}: {e}")
         raise Exception(f"Could not create database {db_name}: {e}") # Re-raise to be caught by service layer
 
-def run_tenant_migrations(db_name: str):
+def drop_mysql_database(db_name: str):
+    '''
+    Drops a tenant database. Used to compensate a failed provisioning.
+    '''
+    try:
+        get_provisioner().drop_database(db_name)
+    except sqlalchemy.exc.SQLAlchemyError as e:
+        logger.error(f"Error dropping database {db_name}: {e}")
+        raise Exception(f"Could not drop database {db_name}: {e}")
+
+# Alembic is imported inside the migration helpers: the request path never needs it,
+# and importing it would add noticeably to worker startup.
+
+def get_tenant_alembic_config(db_name: str) -> "Config":
+    from alembic.config import Config
+    alembic_cfg = Config(TENANT_ALEMBIC_INI)
+    # ConfigParser interpolates "%", which may appear in passwords
+    alembic_cfg.set_main_option("sqlalchemy.url", tenant_database_url(db_name).replace("%", "%%"))
+    alembic_cfg.attributes["configure_logger"] = False
+    return alembic_cfg
+
+def get_tenant_head_revision() -> Optional[str]:
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    return ScriptDirectory.from_config(Config(TENANT_ALEMBIC_INI)).get_current_head()
+
+def get_tenant_revision(db_name: str) -> Optional[str]:
+    '''
+    Returns the Alembic revision a tenant database is currently at (None if never migrated).
+    '''
+    from alembic.runtime.migration import MigrationContext
+    engine = sqlalchemy.create_engine(tenant_database_url(db_name), poolclass=sqlalchemy.pool.NullPool)
+    try:
+        with engine.connect() as connection:
+            return MigrationContext.configure(connection).get_current_revision()
+    finally:
+        engine.dispose()
+
+def run_tenant_migrations(db_name: str, revision: str = "head") -> Optional[str]:
     '''
-    Placeholder for running Alembic migrations on the newly created tenant database.
-    This will be fully implemented in a later step (Phase 2, Step 7) when tenant models and tenant-specific Alembic are set up.
-    For now, it can just log or do nothing.
+    Upgrades a tenant database to `revision` with the alembic_tenant environment and
+    returns the revision it ended up at.
     '''
-    logger.info(f"Placeholder: Tenant migrations would run for database: {db_name}")
-    # Example of what might go here later:
-    # alembic_cfg = Config("alembic_tenant.ini") # Assuming a separate ini for tenant migrations
-    # alembic_cfg.set_main_option("sqlalchemy.url", f"mysql+mysqlclient://{settings.MYSQL_USER}:{settings.MYSQL_PASSWORD}@{settings.MYSQL_HOST}/{db_name}")
-    # command.upgrade(alembic_cfg, "head")
-    pass
+    from alembic import command
+    with _alembic_lock:
+        command.upgrade(get_tenant_alembic_config(db_name), revision)
+    current = get_tenant_revision(db_name)
+    logger.info(f"Tenant database {db_name} migrated to {current}")
+    return current
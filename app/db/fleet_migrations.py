@@ -0,0 +1,231 @@
+'''
+Upgrades every tenant database with the alembic_tenant environment, with bounded
+parallelism, recording each tenant's revision and outcome in tenant_migration_states.
+
+Re-running resumes: tenants already at the target revision are skipped, and tenants left
+"running" by an interrupted run are migrated again.
+
+Shared databases (see SharedDatabase) and the warm pool's ready spare databases (see
+SpareDatabase) are migrated once each, alongside the dedicated tenant databases, and their
+revision is kept on their own row; filters that select tenants (--org-id, --at-revision,
+--failed-only) leave them out.
+
+    python -m app.db.fleet_migrations --concurrency 8
+    python -m app.db.fleet_migrations --org-id 42 --revision 5c2e8a91d4f7
+    python -m app.db.fleet_migrations --failed-only --json fleet_report.json
+'''
+import argparse
+import json
+import logging
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.db import db_utils
+from app.db.session import SessionLocal
+from app.models.central_models import (
+    MigrationStatus, SharedDatabase, SharedDatabaseStatus, SpareDatabase, SpareDatabaseStatus, TenancyMode, Tenant, TenantMigrationState, TenantStatus, utcnow,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TenantResult:
+    tenant_id: Optional[int] # None for a shared or spare database
+    db_name: str
+    status: str
+    revision: Optional[str] = None
+    duration_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class FleetReport:
+    target_revision: Optional[str]
+    selected: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed_seconds: float = 0.0
+    tenants_per_minute: float = 0.0
+    duration_p50_seconds: float = 0.0
+    duration_p95_seconds: float = 0.0
+    duration_max_seconds: float = 0.0
+    results: List[TenantResult] = field(default_factory=list)
+
+
+def _migrate_tenant(db_name: str, revision: str) -> Tuple[Optional[str], float]:
+    # Runs in a worker process: Alembic is not thread-safe, processes give real parallelism
+    started = time.perf_counter()
+    current = db_utils.run_tenant_migrations(db_name, revision)
+    return current, time.perf_counter() - started
+
+
+def select_tenants(
+    db: Session,
+    target_revision: Optional[str],
+    org_id: Optional[int] = None,
+    at_revision: Optional[str] = None,
+    failed_only: bool = False,
+    force: bool = False,
+) -> List[Tuple[int, str]]:
+    query = (
+        db.query(Tenant.id, Tenant.db_name)
+        .outerjoin(TenantMigrationState, TenantMigrationState.tenant_id == Tenant.id)
+        .filter(Tenant.status == TenantStatus.ACTIVE, Tenant.tenancy_mode == TenancyMode.DEDICATED)
+    )
+    if org_id is not None:
+        query = query.filter(Tenant.organization_id == org_id)
+    if at_revision is not None:
+        query = query.filter(TenantMigrationState.revision == at_revision)
+    if failed_only:
+        query = query.filter(TenantMigrationState.status == MigrationStatus.FAILED)
+    if not force:
+        # Resume: skip tenants a previous run already brought to the target
+        query = query.filter(or_(
+            TenantMigrationState.tenant_id.is_(None),
+            ~and_(
+                TenantMigrationState.status == MigrationStatus.SUCCEEDED,
+                TenantMigrationState.revision == target_revision,
+            ),
+        ))
+    return [(tenant_id, db_name) for tenant_id, db_name in query.order_by(Tenant.id)]
+
+
+def select_shared_databases(db: Session, target_revision: Optional[str], force: bool = False) -> List[Tuple[None, str]]:
+    query = db.query(SharedDatabase.db_name).filter(SharedDatabase.status == SharedDatabaseStatus.READY)
+    if not force:
+        query = query.filter(or_(SharedDatabase.revision.is_(None), SharedDatabase.revision != target_revision))
+    return [(None, db_name) for (db_name,) in query.order_by(SharedDatabase.id)]
+
+
+def select_spare_databases(db: Session, target_revision: Optional[str], force: bool = False) -> List[Tuple[None, str]]:
+    # Ready spares are claimed as-is by create_tenant, so they must not lag the tenants
+    query = db.query(SpareDatabase.db_name).filter(SpareDatabase.status == SpareDatabaseStatus.READY)
+    if not force:
+        query = query.filter(or_(SpareDatabase.revision.is_(None), SpareDatabase.revision != target_revision))
+    return [(None, db_name) for (db_name,) in query.order_by(SpareDatabase.id)]
+
+
+def _record(db: Session, tenant_id: Optional[int], db_name: str, **values) -> None:
+    if tenant_id is None:
+        # A shared or spare database: its revision lives on whichever row holds the name
+        if values.get("revision") is not None:
+            for model in (SharedDatabase, SpareDatabase):
+                db.query(model).filter(model.db_name == db_name).update({"revision": values["revision"]})
+            db.commit()
+        return
+    state = db.get(TenantMigrationState, tenant_id)
+    if state is None:
+        state = TenantMigrationState(tenant_id=tenant_id)
+        db.add(state)
+    for key, value in values.items():
+        setattr(state, key, value)
+    db.commit()
+
+
+def migrate_fleet(
+    revision: str = "head",
+    concurrency: int = 4,
+    org_id: Optional[int] = None,
+    at_revision: Optional[str] = None,
+    failed_only: bool = False,
+    force: bool = False,
+) -> FleetReport:
+    target_revision = db_utils.get_tenant_head_revision() if revision == "head" else revision
+    report = FleetReport(target_revision=target_revision)
+    db = SessionLocal()
+    try:
+        tenants = select_tenants(db, target_revision, org_id, at_revision, failed_only, force)
+        if org_id is None and at_revision is None and not failed_only:
+            tenants = (
+                select_shared_databases(db, target_revision, force)
+                + select_spare_databases(db, target_revision, force)
+                + tenants
+            )
+        report.selected = len(tenants)
+        logger.info(f"Migrating {len(tenants)} tenant databases to {target_revision} with concurrency {concurrency}")
+
+        started = time.perf_counter()
+        pending = iter(tenants)
+        in_flight = {}
+        with ProcessPoolExecutor(max_workers=concurrency) as executor:
+            def submit_next() -> bool:
+                tenant = next(pending, None)
+                if tenant is None:
+                    return False
+                tenant_id, db_name = tenant
+                # Marked before it runs, so an interrupted run leaves "running" rows that the next run redoes
+                _record(db, tenant_id, db_name, status=MigrationStatus.RUNNING, error=None, started_at=utcnow(), finished_at=None)
+                in_flight[executor.submit(_migrate_tenant, db_name, revision)] = tenant
+                return True
+
+            # Keep a small window in flight instead of queueing the whole fleet up front
+            for _ in range(concurrency * 2):
+                if not submit_next():
+                    break
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tenant_id, db_name = in_flight.pop(future)
+                    try:
+                        current, duration = future.result()
+                        result = TenantResult(tenant_id, db_name, MigrationStatus.SUCCEEDED, current, duration)
+                        report.succeeded += 1
+                    except Exception as e:
+                        result = TenantResult(tenant_id, db_name, MigrationStatus.FAILED, error=str(e)[:1024])
+                        report.failed += 1
+                        logger.error(f"Migration failed for {f'tenant {tenant_id}' if tenant_id else 'database'} ({db_name}): {e}")
+                    values = dict(status=result.status, error=result.error, finished_at=utcnow(), duration_seconds=result.duration_seconds)
+                    if result.revision is not None:
+                        values["revision"] = result.revision
+                    _record(db, tenant_id, db_name, **values)
+                    report.results.append(result)
+                    submit_next()
+
+        report.elapsed_seconds = time.perf_counter() - started
+    finally:
+        db.close()
+
+    durations = sorted(r.duration_seconds for r in report.results if r.status == MigrationStatus.SUCCEEDED)
+    if report.elapsed_seconds > 0:
+        report.tenants_per_minute = len(report.results) / report.elapsed_seconds * 60
+    if durations:
+        report.duration_p50_seconds = statistics.median(durations)
+        report.duration_p95_seconds = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        report.duration_max_seconds = durations[-1]
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--revision", default="head", help="Target revision (default: head)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Tenant databases migrated in parallel")
+    parser.add_argument("--org-id", type=int, help="Only tenants of this organization")
+    parser.add_argument("--at-revision", help="Only tenants whose recorded revision is this one")
+    parser.add_argument("--failed-only", action="store_true", help="Only tenants whose last migration failed")
+    parser.add_argument("--force", action="store_true", help="Also re-run tenants already at the target revision")
+    parser.add_argument("--json", help="Write the full report, including per-tenant durations, to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-5.5s [%(name)s] %(message)s")
+    report = migrate_fleet(args.revision, args.concurrency, args.org_id, args.at_revision, args.failed_only, args.force)
+    print(
+        f"target {report.target_revision}: {report.selected} selected, {report.succeeded} succeeded, "
+        f"{report.failed} failed in {report.elapsed_seconds:.1f}s ({report.tenants_per_minute:.1f} tenants/min); "
+        f"per tenant p50 {report.duration_p50_seconds:.2f}s p95 {report.duration_p95_seconds:.2f}s "
+        f"max {report.duration_max_seconds:.2f}s"
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(asdict(report), f, indent=2)
+    raise SystemExit(1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
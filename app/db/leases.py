@@ -0,0 +1,57 @@
+'''
+Named leases in the central database, for background jobs that every app worker runs a loop
+for but only one should act at a time (e.g. the warm pool filler). Portable across MySQL and
+SQLite, unlike GET_LOCK, and a crashed holder's lease simply expires.
+'''
+import os
+import socket
+import uuid
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.central_models import BackgroundLease, utcnow
+
+_worker_id: Optional[Tuple[int, str]] = None # (pid, id)
+
+
+def worker_id() -> str:
+    '''
+    Identifies this worker process; the holder renews its own lease on every tick. Created per
+    pid, like the central engines (see CentralEngines), so workers forked from a preloaded
+    master each get their own.
+    '''
+    global _worker_id
+    pid = os.getpid()
+    if _worker_id is None or _worker_id[0] != pid:
+        _worker_id = (pid, f"{socket.gethostname()[:30]}:{pid}:{uuid.uuid4().hex[:12]}")
+    return _worker_id[1]
+
+
+def acquire_lease(db: Session, name: str, seconds: float, holder: Optional[str] = None) -> bool:
+    '''
+    Takes or renews the lease `name` for `seconds` and commits. Returns False while another
+    holder's lease is live. `holder` defaults to this worker process.
+    '''
+    holder = holder or worker_id()
+    now = utcnow()
+    lease_until = now + timedelta(seconds=seconds)
+    renewed = db.execute(
+        update(BackgroundLease)
+        .where(BackgroundLease.name == name, or_(BackgroundLease.holder == holder, BackgroundLease.lease_until < now))
+        .values(holder=holder, lease_until=lease_until)
+    ).rowcount
+    if renewed == 1:
+        db.commit()
+        return True
+    try:
+        # First use of the lease; a concurrent first taker loses on the primary key
+        db.execute(insert(BackgroundLease).values(name=name, holder=holder, lease_until=lease_until))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
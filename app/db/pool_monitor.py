@@ -0,0 +1,118 @@
+'''
+Checkout wait tracking for the central connection pools.
+
+The central engines use QueuePool subclasses that time every checkout: how many callers are
+waiting for a connection right now, how long the oldest has been waiting, and totals for
+metrics. The admission control middleware (app/middleware/admission.py) reads the request
+pool's numbers to decide when to shed load.
+'''
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Type
+
+from sqlalchemy import exc
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import settings
+
+
+class PoolWaits:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool: Optional[QueuePool] = None # The current pool, set when the engine creates it
+        self.observers: List[Callable[[float], None]] = [] # Called with every checkout's wait, e.g. a histogram
+        self._waiting: Dict[int, float] = {} # Checkout id -> monotonic start
+        self._ids = itertools.count()
+        self._lock = threading.Lock() # The sync pool is used from threadpool threads
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def oldest_wait_seconds(self) -> float:
+        with self._lock:
+            oldest = min(self._waiting.values(), default=None)
+        return 0.0 if oldest is None else time.monotonic() - oldest
+
+    def start(self) -> int:
+        checkout_id = next(self._ids)
+        with self._lock:
+            self._waiting[checkout_id] = time.monotonic()
+        return checkout_id
+
+    def finish(self, checkout_id: int, timed_out: bool) -> None:
+        with self._lock:
+            waited = time.monotonic() - self._waiting.pop(checkout_id)
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        for observer in self.observers:
+            observer(waited)
+
+    def stats(self) -> dict:
+        stats = {
+            "waiting": self.waiting,
+            "oldest_wait_seconds": self.oldest_wait_seconds(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+        if self.pool is not None:
+            stats.update({
+                "size": self.pool.size(),
+                "checked_out": self.pool.checkedout(),
+                "overflow": max(0, self.pool.overflow()),
+                # 1.0 when every connection the pool may open is in use
+                "saturation": self.pool.checkedout() / max(1, self.pool.size() + max(0, self.pool._max_overflow)),
+            })
+        return stats
+
+
+def _metered_pool_class(base: Type[QueuePool], waits: PoolWaits) -> Type[QueuePool]:
+    # A subclass per engine, so Pool.recreate() (which uses self.__class__) keeps the same PoolWaits
+    def __init__(self, *args, **kwargs):
+        base.__init__(self, *args, **kwargs)
+        waits.pool = self
+
+    def connect(self):
+        checkout_id = waits.start()
+        timed_out = False
+        try:
+            return base.connect(self)
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waits.finish(checkout_id, timed_out)
+
+    return type(f"Metered{base.__name__}", (base,), {"__init__": __init__, "connect": connect})
+
+
+def pool_options(url: str, waits: PoolWaits) -> dict:
+    '''
+    create_engine/create_async_engine keyword arguments applying the DATABASE_POOL_* settings,
+    with checkouts timed into `waits`. Dialects that don't pool through a QueuePool (e.g.
+    in-memory SQLite) keep their own pool and only get pre-ping.
+    '''
+    options = {"pool_pre_ping": settings.DATABASE_POOL_PRE_PING}
+    parsed = make_url(url)
+    poolclass = parsed.get_dialect().get_pool_class(parsed)
+    if issubclass(poolclass, QueuePool): # AsyncAdaptedQueuePool included
+        options.update(
+            poolclass=_metered_pool_class(poolclass, waits),
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        )
+    return options
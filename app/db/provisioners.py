@@ -0,0 +1,196 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Set
+
+import sqlalchemy
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tenant database names are generated by us, but they still end up in DDL: refuse anything unexpected
+DB_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+
+
+def _validate_names(names: Iterable[str]) -> List[str]:
+    names = list(dict.fromkeys(names)) # De-duplicate, keep order
+    for name in names:
+        if not DB_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid tenant database name: {name!r}")
+    return names
+
+
+class DatabaseProvisioner:
+    '''
+    Creates, drops and checks tenant databases. One instance is shared by the app
+    (request path, provisioning pipeline, warm pool) and disposed in the lifespan hook.
+    '''
+
+    def database_url(self, db_name: str) -> str:
+        raise NotImplementedError
+
+    def existing_databases(self, names: Iterable[str]) -> Set[str]:
+        raise NotImplementedError
+
+    def create_databases(self, names: Iterable[str]) -> List[str]:
+        '''
+        Creates every missing database and returns the names actually created.
+        '''
+        raise NotImplementedError
+
+    def drop_databases(self, names: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def dispose(self) -> None:
+        pass
+
+    def database_exists(self, name: str) -> bool:
+        return name in self.existing_databases([name])
+
+    def create_database(self, name: str) -> bool:
+        # False if it already existed, so callers know not to drop it on rollback
+        return bool(self.create_databases([name]))
+
+    def drop_database(self, name: str) -> None:
+        self.drop_databases([name])
+
+
+class MySQLProvisioner(DatabaseProvisioner):
+    '''
+    Keeps one small AUTOCOMMIT pool of admin connections for all DDL instead of building
+    a new root engine per tenant.
+    '''
+
+    def __init__(self, url_template: str):
+        self.url_template = url_template
+        self._engine: Optional[Engine] = None
+        self._lock = threading.Lock()
+
+    def database_url(self, db_name: str) -> str:
+        return self.url_template.format(
+            user=settings.MYSQL_ROOT_USER,
+            password=settings.MYSQL_ROOT_PASSWORD,
+            host=settings.MYSQL_HOST,
+            port=settings.MYSQL_PORT,
+            db_name=db_name,
+        )
+
+    @property
+    def engine(self) -> Engine:
+        with self._lock:
+            if self._engine is None:
+                # Server-level URL: the template with an empty database name
+                self._engine = sqlalchemy.create_engine(
+                    self.database_url(""),
+                    isolation_level="AUTOCOMMIT", # Autocommit needed for CREATE DATABASE
+                    pool_size=2,
+                    max_overflow=2,
+                    pool_pre_ping=True,
+                    pool_recycle=settings.TENANT_POOL_RECYCLE,
+                )
+            return self._engine
+
+    def _quote(self, name: str) -> str:
+        return self.engine.dialect.identifier_preparer.quote_identifier(name)
+
+    def existing_databases(self, names: Iterable[str]) -> Set[str]:
+        names = _validate_names(names)
+        if not names:
+            return set()
+        statement = sqlalchemy.text(
+            "SELECT schema_name FROM information_schema.schemata WHERE schema_name IN :names"
+        ).bindparams(sqlalchemy.bindparam("names", expanding=True))
+        with self.engine.connect() as connection:
+            return {row[0] for row in connection.execute(statement, {"names": names})}
+
+    def create_databases(self, names: Iterable[str]) -> List[str]:
+        names = _validate_names(names)
+        existing = self.existing_databases(names) # One round trip for the whole batch
+        created = []
+        with self.engine.connect() as connection:
+            for name in names:
+                if name in existing:
+                    logger.warning(f"Database {name} already exists.")
+                    continue
+                connection.execute(sqlalchemy.text(
+                    f"CREATE DATABASE IF NOT EXISTS {self._quote(name)} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+                ))
+                created.append(name)
+                logger.info(f"Successfully created database: {name}")
+        return created
+
+    def drop_databases(self, names: Iterable[str]) -> None:
+        names = _validate_names(names)
+        with self.engine.connect() as connection:
+            for name in names:
+                connection.execute(sqlalchemy.text(f"DROP DATABASE IF EXISTS {self._quote(name)}"))
+                logger.info(f"Dropped database: {name}")
+
+    def dispose(self) -> None:
+        with self._lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+
+class SQLiteProvisioner(DatabaseProvisioner):
+    '''
+    One SQLite file per tenant database in `directory`, for local development and
+    load-testing provisioning without a MySQL server.
+    '''
+
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.db")
+
+    def database_url(self, db_name: str) -> str:
+        return f"sqlite:///{self._path(db_name)}"
+
+    def existing_databases(self, names: Iterable[str]) -> Set[str]:
+        return {name for name in _validate_names(names) if os.path.exists(self._path(name))}
+
+    def create_databases(self, names: Iterable[str]) -> List[str]:
+        names = _validate_names(names)
+        os.makedirs(self.directory, exist_ok=True)
+        created = []
+        for name in names:
+            if os.path.exists(self._path(name)):
+                logger.warning(f"Database {name} already exists.")
+                continue
+            sqlite3.connect(self._path(name)).close() # Creates the file
+            created.append(name)
+        return created
+
+    def drop_databases(self, names: Iterable[str]) -> None:
+        for name in _validate_names(names):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+
+_provisioner: Optional[DatabaseProvisioner] = None
+_provisioner_lock = threading.Lock()
+
+def get_provisioner() -> DatabaseProvisioner:
+    global _provisioner
+    with _provisioner_lock:
+        if _provisioner is None:
+            if settings.TENANT_DB_BACKEND == "sqlite":
+                _provisioner = SQLiteProvisioner(settings.TENANT_SQLITE_DIR)
+            elif settings.TENANT_DB_BACKEND == "mysql":
+                _provisioner = MySQLProvisioner(settings.TENANT_DATABASE_URL_TEMPLATE)
+            else:
+                raise ValueError(f"Unknown TENANT_DB_BACKEND: {settings.TENANT_DB_BACKEND!r}")
+        return _provisioner
+
+def dispose_provisioner() -> None:
+    global _provisioner
+    with _provisioner_lock:
+        if _provisioner is not None:
+            _provisioner.dispose()
+            _provisioner = None
@@ -0,0 +1,241 @@
+'''
+Read-replica routing for the central database.
+
+Read-only dependencies (principal lookup, organization/tenant listings) take their session
+from `get_read_db`, which picks a healthy replica round-robin and falls back to the primary
+when none is usable. Writes always use the primary (`get_async_db`).
+
+Lag is measured with a heartbeat: every health check the primary rewrites the single
+replication_heartbeat row, and each replica is lagging by however old its copy of that
+row is. This works for MySQL replicas and for SQLite files copied from the primary.
+
+Read-your-writes: once an authenticated user's request writes, that user's reads go to the
+primary for READ_YOUR_WRITES_SECONDS. This is tracked per worker process; a client that
+needs it across workers, or just wants fresh data, can send `X-Read-Consistency: primary`.
+'''
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fastapi import Depends, Request
+from jose import JWTError, jwt
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, to_async_url
+from app.models.central_models import ReplicationHeartbeat, utcnow
+
+logger = logging.getLogger(__name__)
+
+CONSISTENCY_HEADER = "x-read-consistency"
+
+# Id of the authenticated user of the current request, set by get_current_user
+current_principal_id: ContextVar[Optional[int]] = ContextVar("current_principal_id", default=None)
+
+
+@dataclass
+class Replica:
+    url: str
+    engine: Optional[AsyncEngine] = None
+    sessionmaker: Optional[async_sessionmaker] = None
+    healthy: bool = False # Until the first health check says otherwise
+    lag_seconds: Optional[float] = None
+    last_error: Optional[str] = None
+    reads: int = 0
+
+    def usable(self, max_lag_seconds: float) -> bool:
+        return self.healthy and self.lag_seconds is not None and self.lag_seconds <= max_lag_seconds
+
+
+@dataclass
+class ReplicaRouter:
+    urls: List[str]
+    max_lag_seconds: float
+    health_check_seconds: float
+    read_your_writes_seconds: float
+    _replicas: List[Replica] = field(default_factory=list)
+    _pid: Optional[int] = None
+    _round_robin: "itertools.count" = field(default_factory=itertools.count)
+    _last_write: Dict[int, float] = field(default_factory=dict) # user id -> monotonic time of last write
+    _last_beat: Optional[object] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    primary_reads: int = 0
+    fallbacks: int = 0 # Reads sent to the primary because no replica was usable
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    @property
+    def replicas(self) -> List[Replica]:
+        # Engines are per process, like the central ones (see CentralEngines)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._replicas = []
+                    for url in self.urls:
+                        engine = create_async_engine(to_async_url(url), pool_pre_ping=True)
+                        self._replicas.append(Replica(
+                            url=url,
+                            engine=engine,
+                            sessionmaker=async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False),
+                        ))
+                    self._pid = os.getpid()
+        return self._replicas
+
+    def record_write(self, user_id: Optional[int]) -> None:
+        if user_id is not None and self.enabled:
+            self._last_write[user_id] = time.monotonic()
+
+    def _recently_wrote(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        wrote_at = self._last_write.get(user_id)
+        return wrote_at is not None and time.monotonic() - wrote_at < self.read_your_writes_seconds
+
+    def choose(self) -> Optional[Replica]:
+        '''
+        Next usable replica in round-robin order, or None.
+        '''
+        replicas = self.replicas
+        for _ in range(len(replicas)):
+            replica = replicas[next(self._round_robin) % len(replicas)]
+            if replica.usable(self.max_lag_seconds):
+                return replica
+        return None
+
+    def reader(self, request: Request) -> async_sessionmaker:
+        '''
+        Session factory for a read-only request: a replica when allowed and usable, else the primary.
+        '''
+        if not self.enabled or request.headers.get(CONSISTENCY_HEADER) == "primary":
+            self.primary_reads += 1
+            return AsyncSessionLocal
+        if self._recently_wrote(_request_user_id(request)):
+            self.primary_reads += 1
+            return AsyncSessionLocal
+        replica = self.choose()
+        if replica is None:
+            self.fallbacks += 1
+            self.primary_reads += 1
+            return AsyncSessionLocal
+        replica.reads += 1
+        return replica.sessionmaker
+
+    async def _write_heartbeat(self):
+        beat_at = utcnow()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(ReplicationHeartbeat).where(ReplicationHeartbeat.id == 1).values(beat_at=beat_at)
+            )
+            if result.rowcount == 0:
+                db.add(ReplicationHeartbeat(id=1, beat_at=beat_at))
+            await db.commit()
+        return beat_at
+
+    async def _check_replica(self, replica: Replica, last_beat) -> None:
+        try:
+            async with replica.sessionmaker() as db:
+                beat_at = await db.scalar(select(ReplicationHeartbeat.beat_at).where(ReplicationHeartbeat.id == 1))
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(f"Replica {replica.engine.url!r} unhealthy: {e}")
+            replica.healthy, replica.lag_seconds, replica.last_error = False, None, str(e)[:200]
+            return
+        replica.healthy, replica.last_error = True, None
+        if beat_at is None:
+            replica.lag_seconds = None # Never received a heartbeat: lag unknown
+        elif last_beat is not None and beat_at >= last_beat:
+            replica.lag_seconds = 0.0
+        else:
+            # Upper bound: the replica has at least everything up to its newest heartbeat
+            replica.lag_seconds = (utcnow() - beat_at).total_seconds()
+
+    async def check(self) -> None:
+        '''
+        Writes a heartbeat on the primary, then measures every replica against it.
+        '''
+        try:
+            self._last_beat = await self._write_heartbeat()
+        except Exception as e:
+            logger.error(f"Could not write replication heartbeat: {e}")
+        await asyncio.gather(*(self._check_replica(replica, self._last_beat) for replica in self.replicas))
+        # Forget read-your-writes markers that have expired
+        cutoff = time.monotonic() - self.read_your_writes_seconds
+        for user_id, wrote_at in list(self._last_write.items()):
+            if wrote_at < cutoff:
+                self._last_write.pop(user_id, None)
+
+    async def run_health_checker(self) -> None:
+        '''
+        Background loop started from the app lifespan.
+        '''
+        while True:
+            await self.check()
+            await asyncio.sleep(self.health_check_seconds)
+
+    async def dispose(self) -> None:
+        with self._lock:
+            replicas, self._replicas, self._pid = self._replicas, [], None
+        for replica in replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        stats = {
+            "replicas": len(self.urls),
+            "usable": sum(1 for r in self._replicas if r.usable(self.max_lag_seconds)),
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+            "replica_reads": sum(r.reads for r in self._replicas),
+        }
+        lags = [r.lag_seconds for r in self._replicas if r.lag_seconds is not None]
+        stats["max_lag_seconds"] = max(lags) if lags else 0.0
+        return stats
+
+
+def _request_user_id(request: Request) -> Optional[int]:
+    # Routing only: the token is verified by get_current_user, this merely reads its uid claim
+    authorization = request.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return jwt.get_unverified_claims(authorization[7:]).get("uid")
+    except JWTError:
+        return None
+
+
+replica_router = ReplicaRouter(
+    urls=[url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()],
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    health_check_seconds=settings.REPLICA_HEALTH_CHECK_SECONDS,
+    read_your_writes_seconds=settings.READ_YOUR_WRITES_SECONDS,
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    replica_router.record_write(current_principal_id.get())
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_dml(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements write without flushing
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        replica_router.record_write(current_principal_id.get())
+
+
+# Dependencies for read-only route handlers. The session factory is resolved once per request,
+# so a handler that also streams (in its own session) reads from the same server.
+async def get_read_sessionmaker(request: Request) -> async_sessionmaker:
+    return replica_router.reader(request)
+
+async def get_read_db(sessionmaker: async_sessionmaker = Depends(get_read_sessionmaker)):
+    async with sessionmaker() as db:
+        yield db
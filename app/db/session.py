@@ -1,13 +1,165 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.db.pool_monitor import PoolWaits, pool_options
+from typing import Callable, List, Optional
+from contextlib import AsyncExitStack
+import asyncio
 import os
+import threading
+
+# Async drivers for the sync URLs we accept in DATABASE_URL
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+mysqlclient": "mysql+aiomysql",
+    "mysql+mysqldb": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    '''
+    Maps a sync database URL onto its async driver, e.g. sqlite:///x.db -> sqlite+aiosqlite:///x.db.
+    URLs that already name an async driver are returned unchanged.
+    '''
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
 
 # This should point to the central DB for the main application
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL 
+ASYNC_SQLALCHEMY_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(SQLALCHEMY_DATABASE_URL)
+
+
+class CentralEngines:
+    '''
+    Creates the central engines on first use in each process rather than at import, so a
+    preloading server (gunicorn --preload) never hands pooled sockets to forked workers.
+    A worker that inherits engines from its parent drops them without closing the parent's
+    connections and builds its own.
+    '''
+
+    def __init__(self):
+        self._engine: Optional[Engine] = None
+        self._async_engine: Optional[AsyncEngine] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._hooks: List[Callable[[Engine], None]] = []
+        # Checkout waits of the sync pool (background jobs, scripts) and of the async one (requests)
+        self.pool_waits = PoolWaits("central")
+        self.async_pool_waits = PoolWaits("central_async")
+
+    def add_hook(self, hook: Callable[[Engine], None]) -> None:
+        '''
+        Calls `hook` with every central (sync) engine, existing or created later in this
+        process, e.g. to attach metrics listeners. The async engine's sync_engine is included.
+        '''
+        with self._lock:
+            if hook in self._hooks:
+                return
+            self._hooks.append(hook)
+            if self._pid == os.getpid():
+                hook(self._engine)
+                hook(self._async_engine.sync_engine)
+
+    def remove_hook(self, hook: Callable[[Engine], None], undo: Callable[[Engine], None]) -> None:
+        '''
+        Stops calling `hook` for engines created later and calls `undo` on this process's
+        existing engines, e.g. to detach the listeners the hook attached.
+        '''
+        with self._lock:
+            if hook not in self._hooks:
+                return
+            self._hooks.remove(hook)
+            if self._pid == os.getpid():
+                undo(self._engine)
+                undo(self._async_engine.sync_engine)
+
+    def _ensure(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._engine is not None:
+                # Inherited across fork: forget the parent's pool without closing its sockets
+                self._engine.dispose(close=False)
+                self._async_engine.sync_engine.dispose(close=False)
+            # The sync engine serves background jobs and scripts; request handlers use the async engine.
+            self._engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL, self.pool_waits))
+            self._async_engine = create_async_engine(
+                ASYNC_SQLALCHEMY_DATABASE_URL, **pool_options(ASYNC_SQLALCHEMY_DATABASE_URL, self.async_pool_waits)
+            )
+            for hook in self._hooks:
+                hook(self._engine)
+                hook(self._async_engine.sync_engine)
+            self._pid = os.getpid()
+
+    @property
+    def engine(self) -> Engine:
+        self._ensure()
+        return self._engine
+
+    @property
+    def async_engine(self) -> AsyncEngine:
+        self._ensure()
+        return self._async_engine
+
+    async def warm_up(self, connections: int) -> None:
+        '''
+        Opens `connections` pooled connections on the async engine, so the first requests
+        after startup do not pay for connection setup.
+        '''
+        if connections <= 0:
+            return
+        async_engine = self.async_engine
+        # Hold all of them at once so each checkout opens a new connection, then hand them back to the pool
+        async with AsyncExitStack() as stack:
+            await asyncio.gather(*(stack.enter_async_context(async_engine.connect()) for _ in range(connections)))
+
+    def stats(self) -> dict:
+        stats = {f"sync_{key}": value for key, value in self.pool_waits.stats().items()}
+        stats.update(self.async_pool_waits.stats())
+        return stats
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async def dispose(self) -> None:
+        with self._lock:
+            engine, async_engine = self._engine, self._async_engine
+            self._engine = self._async_engine = None
+            self._pid = None
+        if async_engine is not None:
+            await async_engine.dispose()
+        if engine is not None:
+            engine.dispose()
+
+
+central_engines = CentralEngines()
+
+def get_engine() -> Engine:
+    return central_engines.engine
+
+def get_async_engine() -> AsyncEngine:
+    return central_engines.async_engine
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw) -> Session:
+        local_kw.setdefault("bind", central_engines.engine)
+        return super().__call__(**local_kw)
+
+class _LazyAsyncSessionmaker(async_sessionmaker):
+    def __call__(self, **local_kw) -> AsyncSession:
+        local_kw.setdefault("bind", central_engines.async_engine)
+        return super().__call__(**local_kw)
+
+# Bound to this process's engine when a session is opened
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
+
+# expire_on_commit=False: attributes of committed objects stay loaded, since lazy refreshes
+# are not possible outside an awaited call.
+AsyncSessionLocal = _LazyAsyncSessionmaker(autoflush=False, expire_on_commit=False)
 
 # Dependency to get DB session
 def get_db():
@@ -17,5 +169,10 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get an async DB session for async route handlers
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Base for declarative models (already in central_models.py, but good to be aware)
 # from app.models.central_models import Base
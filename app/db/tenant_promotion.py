@@ -0,0 +1,154 @@
+'''
+Promotes a tenant from a shared database to a dedicated one by bulk-copying its rows.
+
+    python -m app.db.tenant_promotion --tenant-id 42
+    python -m app.db.tenant_promotion --tenant-id 42 --batch-size 5000 --keep-source
+
+Steps: the tenant is marked "migrating" (its requests get 503 + Retry-After) and the tool
+waits for every worker's tenant directory to pick that up; the dedicated database is
+created and migrated; every TenantScoped table is copied in batches with tenant_id reset
+to 0, row counts are checked, and the tenant is switched over. Its rows are then deleted
+from the shared database unless --keep-source is given.
+
+A failed run puts the tenant back to "active" in its shared database. Re-running is safe:
+the copy is one transaction, and rows committed by a run that crashed before switching
+over are replaced.
+'''
+import argparse
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.db import db_utils
+from app.db.session import SessionLocal
+from app.db.tenant_session import tenant_engine_registry
+from app.models.central_models import TenancyMode, Tenant, TenantStatus
+from app.models.tenant_models import TenantBase
+from app.services.list_versions import bump_tenants_version
+from app.services.tenant_directory import tenant_directory
+from app.services.tenant_service import generate_db_name
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PromotionReport:
+    tenant_id: int
+    source_db_name: str
+    target_db_name: str
+    rows_copied: Dict[str, int] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+
+
+def _tenant_tables():
+    tables = TenantBase.metadata.sorted_tables # Parents before children
+    unscoped = [table.name for table in tables if "tenant_id" not in table.c]
+    if unscoped:
+        raise RuntimeError(f"Tenant tables without a tenant_id column cannot be promoted: {', '.join(unscoped)}")
+    return tables
+
+
+def copy_tenant_rows(source: Connection, target: Connection, tenant_id: int, batch_size: int) -> Dict[str, int]:
+    '''
+    Copies the tenant's rows of every tenant table from `source` to `target` with
+    executemany inserts of `batch_size` rows. Returns rows copied per table.
+    '''
+    copied: Dict[str, int] = {}
+    tables = _tenant_tables()
+    for table in reversed(tables): # Rows from a run that copied but crashed before switching over
+        target.execute(delete(table).where(table.c.tenant_id.in_([tenant_id, 0])))
+    for table in tables:
+        copied[table.name] = 0
+        result = source.execution_options(yield_per=batch_size).execute(
+            select(table).where(table.c.tenant_id == tenant_id).order_by(*table.primary_key.columns)
+        )
+        for rows in result.mappings().partitions():
+            target.execute(insert(table), [{**row, "tenant_id": 0} for row in rows])
+            copied[table.name] += len(rows)
+        expected = source.scalar(select(func.count()).select_from(table).where(table.c.tenant_id == tenant_id))
+        if copied[table.name] != expected:
+            raise RuntimeError(f"{table.name}: copied {copied[table.name]} rows, source has {expected}")
+    return copied
+
+
+def promote_tenant(
+    tenant_id: int, batch_size: int = 1000, drain_seconds: Optional[float] = None, keep_source: bool = False
+) -> PromotionReport:
+    if drain_seconds is None:
+        # Long enough for every worker's directory refresher to see the "migrating" status
+        drain_seconds = settings.TENANT_DIRECTORY_REFRESH_SECONDS * 2
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        tenant = db.get(Tenant, tenant_id)
+        if tenant is None:
+            raise RuntimeError(f"Tenant {tenant_id} does not exist")
+        if tenant.tenancy_mode != TenancyMode.SHARED:
+            raise RuntimeError(f"Tenant {tenant_id} already has a dedicated database ({tenant.db_name})")
+        if tenant.status not in (TenantStatus.ACTIVE, TenantStatus.MIGRATING): # "migrating": resuming a crashed run
+            raise RuntimeError(f"Tenant {tenant_id} is {tenant.status}")
+        report = PromotionReport(tenant_id, tenant.db_name, generate_db_name(tenant.subdomain, tenant.id))
+        if db.query(Tenant.id).filter(Tenant.db_name == report.target_db_name, Tenant.id != tenant_id).first():
+            raise RuntimeError(f"Database name {report.target_db_name} is already used by another tenant")
+
+        tenant.status = TenantStatus.MIGRATING
+        db.execute(bump_tenants_version(tenant.organization_id))
+        db.commit()
+        logger.info(f"Tenant {tenant_id} marked migrating; waiting {drain_seconds:.0f}s for workers to stop writing")
+        time.sleep(drain_seconds)
+
+        try:
+            db_utils.create_mysql_database(report.target_db_name)
+            db_utils.run_tenant_migrations(report.target_db_name)
+            source_engine = tenant_engine_registry.get_engine(report.source_db_name)
+            target_engine = tenant_engine_registry.get_engine(report.target_db_name)
+            with source_engine.connect() as source, target_engine.begin() as target:
+                report.rows_copied = copy_tenant_rows(source, target, tenant_id, batch_size)
+        except Exception:
+            tenant.status = TenantStatus.ACTIVE
+            db.execute(bump_tenants_version(tenant.organization_id))
+            db.commit()
+            raise
+
+        tenant.db_name = report.target_db_name
+        tenant.tenancy_mode = TenancyMode.DEDICATED
+        tenant.status = TenantStatus.ACTIVE
+        db.execute(bump_tenants_version(tenant.organization_id))
+        db.commit()
+        tenant_directory.upsert(tenant)
+        logger.info(f"Tenant {tenant_id} now served from {report.target_db_name}: {report.rows_copied}")
+
+        if not keep_source:
+            with source_engine.begin() as source:
+                for table in reversed(_tenant_tables()):
+                    source.execute(delete(table).where(table.c.tenant_id == tenant_id))
+    finally:
+        db.close()
+        tenant_engine_registry.dispose_all()
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant-id", type=int, required=True)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per SELECT batch and INSERT executemany")
+    parser.add_argument("--drain-seconds", type=float, help="Wait after marking the tenant migrating (default: 2x the directory refresh interval)")
+    parser.add_argument("--keep-source", action="store_true", help="Leave the tenant's rows in the shared database")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-5.5s [%(name)s] %(message)s")
+    report = promote_tenant(args.tenant_id, args.batch_size, args.drain_seconds, args.keep_source)
+    print(
+        f"tenant {report.tenant_id}: {report.source_db_name} -> {report.target_db_name}, "
+        f"{sum(report.rows_copied.values())} rows in {report.elapsed_seconds:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+'''
+Row-level tenant isolation for shared tenant databases.
+
+A session scoped with `scope_session(session, tenant_id)` (get_tenant_db does this for
+tenants in "shared" mode) only ever sees and writes that tenant's rows of TenantScoped
+tables:
+
+- ORM SELECT/UPDATE/DELETE statements get `tenant_id = :tenant_id` added to every
+  TenantScoped entity, including joins, aliases, lazy and eager loads.
+- New objects are stamped with the tenant id at flush; objects, INSERT statements and
+  updates naming another tenant raise TenantIsolationError.
+
+Plain text() SQL and Core statements run on the connection bypass the ORM and are not
+filtered: tenant code must go through the session's ORM API.
+'''
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from app.models.tenant_models import TenantScoped
+
+TENANT_ID_KEY = "tenant_id"
+
+
+class TenantIsolationError(Exception):
+    pass
+
+
+def scope_session(session: Session, tenant_id: int) -> Session:
+    session.info[TENANT_ID_KEY] = tenant_id
+    return session
+
+def session_tenant_id(session: Session) -> Optional[int]:
+    return session.info.get(TENANT_ID_KEY)
+
+
+def _stamp(params: dict, tenant_id: int) -> dict:
+    if params.get("tenant_id", tenant_id) != tenant_id:
+        raise TenantIsolationError(f"Row for tenant {params['tenant_id']} written in a session scoped to tenant {tenant_id}")
+    return {**params, "tenant_id": tenant_id}
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _add_tenant_criteria(orm_execute_state):
+    tenant_id = session_tenant_id(orm_execute_state.session)
+    if tenant_id is None:
+        return
+    if orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is None or not issubclass(mapper.class_, TenantScoped):
+            return
+        params = orm_execute_state.parameters
+        if isinstance(params, list):
+            orm_execute_state.parameters = [_stamp(p, tenant_id) for p in params]
+        elif params:
+            orm_execute_state.parameters = _stamp(params, tenant_id)
+        else:
+            raise TenantIsolationError("INSERT .values() on a tenant table: pass rows as parameters so they can be stamped")
+        return
+    if orm_execute_state.is_update:
+        values = getattr(orm_execute_state.statement, "_values", None) or {}
+        if any(getattr(column, "key", column) == "tenant_id" for column in values):
+            raise TenantIsolationError("tenant_id cannot be updated in a tenant-scoped session")
+    if (orm_execute_state.is_select or orm_execute_state.is_update or orm_execute_state.is_delete) and not (
+        orm_execute_state.is_column_load or orm_execute_state.is_relationship_load
+    ):
+        # Lazy and column loads inherit the criteria from the statement that loaded the parent
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(TenantScoped, lambda cls: cls.tenant_id == tenant_id, include_aliases=True)
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_new_objects(session, flush_context, instances):
+    tenant_id = session_tenant_id(session)
+    if tenant_id is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, TenantScoped):
+            if obj.tenant_id in (None, 0):
+                obj.tenant_id = tenant_id
+            elif obj.tenant_id != tenant_id:
+                raise TenantIsolationError(f"Object for tenant {obj.tenant_id} added to a session scoped to tenant {tenant_id}")
+    for obj in session.dirty:
+        if isinstance(obj, TenantScoped) and obj.tenant_id != tenant_id:
+            raise TenantIsolationError(f"Object moved to tenant {obj.tenant_id} in a session scoped to tenant {tenant_id}")
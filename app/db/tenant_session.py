@@ -0,0 +1,185 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.sql_profiler import sql_profiler
+from app.db.db_utils import tenant_database_url
+from app.db.session import SessionLocal
+from app.db.tenant_scoping import scope_session
+from app.models.central_models import TenancyMode, TenantStatus
+from app.services import tenant_service
+from app.services.tenant_directory import TenantRoute, tenant_directory
+
+logger = logging.getLogger(__name__)
+
+
+class TenantEngineRegistry:
+    '''
+    Lazily builds one pooled engine per tenant database and keeps at most `max_engines`
+    of them alive. The least recently used engine is disposed when the cap is reached,
+    preferring engines with no checked-out connections so in-flight requests keep theirs.
+    '''
+
+    def __init__(self, max_engines: int, pool_size: int, max_overflow: int, pool_recycle: int):
+        self.max_engines = max(1, max_engines)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self._engines: "OrderedDict[str, Engine]" = OrderedDict()
+        self._sessionmakers: Dict[str, sessionmaker] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _create_engine(self, db_name: str) -> Engine:
+        url = tenant_database_url(db_name)
+        if url.startswith("sqlite"):
+            # SQLite file pools are cheap; only the thread check needs relaxing for FastAPI's threadpool
+            engine = create_engine(url, connect_args={"check_same_thread": False})
+        else:
+            engine = create_engine(
+                url,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_recycle=self.pool_recycle,
+                pool_pre_ping=True,
+            )
+        instrument_engine(engine)
+        if sql_profiler.enabled:
+            sql_profiler.install(engine)
+        return engine
+
+    def _get_engine_locked(self, db_name: str) -> Engine:
+        engine = self._engines.get(db_name)
+        if engine is not None:
+            self._engines.move_to_end(db_name)
+            self.hits += 1
+            return engine
+        self.misses += 1
+        while len(self._engines) >= self.max_engines:
+            self._evict_one_locked()
+        engine = self._create_engine(db_name)
+        self._engines[db_name] = engine
+        self._sessionmakers[db_name] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        return engine
+
+    def get_engine(self, db_name: str) -> Engine:
+        with self._lock:
+            return self._get_engine_locked(db_name)
+
+    def get_sessionmaker(self, db_name: str) -> sessionmaker:
+        with self._lock:
+            self._get_engine_locked(db_name)
+            return self._sessionmakers[db_name]
+
+    def _evict_one_locked(self) -> None:
+        victim: Optional[str] = None
+        for db_name, engine in self._engines.items(): # Oldest first
+            if engine.pool.checkedout() == 0:
+                victim = db_name
+                break
+        if victim is None:
+            # Every pool is busy; dispose the oldest anyway. Checked-out connections are
+            # closed when their sessions return them to the orphaned pool.
+            victim = next(iter(self._engines))
+        engine = self._engines.pop(victim)
+        self._sessionmakers.pop(victim, None)
+        engine.dispose()
+        self.evictions += 1
+        logger.info(f"Evicted tenant engine for database {victim}")
+
+    def dispose(self, db_name: str) -> None:
+        with self._lock:
+            engine = self._engines.pop(db_name, None)
+            self._sessionmakers.pop(db_name, None)
+        if engine is not None:
+            engine.dispose()
+
+    def dispose_all(self) -> None:
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+            self._sessionmakers.clear()
+        for engine in engines:
+            engine.dispose()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "engines": len(self._engines),
+                "max_engines": self.max_engines,
+                "checked_out": sum(e.pool.checkedout() for e in self._engines.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Keep the total number of tenant connections under TENANT_MAX_CONNECTIONS, whatever the cache size.
+_connections_per_engine = settings.TENANT_POOL_SIZE + settings.TENANT_MAX_OVERFLOW
+tenant_engine_registry = TenantEngineRegistry(
+    max_engines=min(settings.TENANT_ENGINE_CACHE_SIZE, settings.TENANT_MAX_CONNECTIONS // max(1, _connections_per_engine)),
+    pool_size=settings.TENANT_POOL_SIZE,
+    max_overflow=settings.TENANT_MAX_OVERFLOW,
+    pool_recycle=settings.TENANT_POOL_RECYCLE,
+)
+
+
+def get_subdomain_from_host(host: str) -> Optional[str]:
+    '''
+    Extracts the tenant subdomain from a Host header, e.g. "acme.example.com:8000" -> "acme"
+    when TENANT_BASE_DOMAIN is "example.com".
+    '''
+    hostname = host.split(":", 1)[0].strip().lower().rstrip(".")
+    suffix = "." + settings.TENANT_BASE_DOMAIN.lower()
+    if not hostname.endswith(suffix):
+        return None
+    subdomain = hostname[: -len(suffix)]
+    if not subdomain or "." in subdomain:
+        return None
+    return subdomain
+
+
+def resolve_tenant_route(subdomain: str) -> Optional[TenantRoute]:
+    # The directory answers once loaded; before that (e.g. startup refresh failed) fall back to the central DB
+    if tenant_directory.loaded:
+        return tenant_directory.lookup(subdomain)
+    db = SessionLocal()
+    try:
+        tenant = tenant_service.get_tenant_by_subdomain(db, subdomain)
+        return TenantRoute(tenant.id, tenant.db_name, tenant.organization_id, tenant.status, tenant.tenancy_mode) if tenant else None
+    finally:
+        db.close()
+
+
+# Dependency to get a session on the tenant database addressed by the request's subdomain
+def get_tenant_db(request: Request):
+    subdomain = get_subdomain_from_host(request.headers.get("host", ""))
+    tenant = resolve_tenant_route(subdomain) if subdomain else None
+    if tenant is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tenant not found")
+    if tenant.status != TenantStatus.ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Tenant is not available (status: {tenant.status})",
+            headers={"Retry-After": "5"} if tenant.status in (TenantStatus.PROVISIONING, TenantStatus.MIGRATING) else None,
+        )
+    request.state.tenant = tenant
+
+    tenant_db = tenant_engine_registry.get_sessionmaker(tenant.db_name)()
+    if tenant.tenancy_mode == TenancyMode.SHARED:
+        # Every ORM query and write in this session is confined to the tenant's rows
+        scope_session(tenant_db, tenant.id)
+    try:
+        yield tenant_db
+    finally:
+        tenant_db.close()
@@ -1,21 +1,207 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from app.core.config import settings # Ensure settings is imported if used directly
-from app.routers import auth_router # Import the auth router
-from app.routers import org_router # Import the org router
-from app.routers import tenant_router # Import the tenant router
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    # Add other FastAPI parameters like version, description if needed
-)
+logger = logging.getLogger(__name__)
+
+# Everything heavier (routers, services, metrics, engines) is imported inside create_app/lifespan,
+# so importing this module stays cheap and nothing touches the database before a worker starts.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in each worker process after fork: engines, pools and executors created here are its own
+    from app.core import metrics
+    from app.core.password_hashing import password_hasher
+    from app.core.signing_keys import key_ring
+    from app.core.sql_profiler import sql_profiler
+    from app.core.token_denylist import token_denylist
+    from app.db.provisioners import dispose_provisioner
+    from app.db.replicas import replica_router
+    from app.db.session import central_engines
+    from app.db.tenant_session import tenant_engine_registry
+    from app.services.provisioning_service import provisioning_pipeline
+    from app.services.tenant_directory import tenant_directory
+    from app.services.usage_service import usage_meter
+    from app.services.warm_pool_service import warm_pool
+
+    await central_engines.warm_up(settings.DATABASE_POOL_WARMUP)
+    password_hasher.start()
+    if settings.PASSWORD_HASH_TARGET_MS > 0:
+        await password_hasher.calibrate(
+            settings.PASSWORD_HASH_TARGET_MS, settings.PASSWORD_HASH_MIN_ROUNDS, settings.PASSWORD_HASH_MAX_ROUNDS
+        )
+    # Load the tenant directory before serving so subdomain routing never waits on the central DB
+    await run_in_threadpool(tenant_directory.refresh_from_db)
+    directory_refresher = asyncio.create_task(tenant_directory.run_refresher())
+    # Likewise the revoked-token denylist, so revocation checks never query the central DB
+    await run_in_threadpool(token_denylist.sync_from_db)
+    denylist_syncer = asyncio.create_task(token_denylist.run_syncer())
+    if key_ring.enabled:
+        # Signing keys are loaded (and the first one created) before the first login
+        await run_in_threadpool(key_ring.refresh_from_db)
+        key_rotator = asyncio.create_task(key_ring.run_rotator())
+    else:
+        key_rotator = None
+    provisioning_pipeline.start()
+    await run_in_threadpool(provisioning_pipeline.resume_pending)
+    provisioning_resumer = asyncio.create_task(provisioning_pipeline.run_resumer())
+    warm_pool_filler = asyncio.create_task(warm_pool.run_filler()) if warm_pool.enabled else None
+    if replica_router.enabled:
+        await replica_router.check() # Replicas take reads only once measured
+        replica_checker = asyncio.create_task(replica_router.run_health_checker())
+    else:
+        replica_checker = None
+    usage_flusher = asyncio.create_task(usage_meter.run_flusher()) if settings.USAGE_METERING_ENABLED else None
+    yield
+    if replica_checker is not None:
+        replica_checker.cancel()
+    directory_refresher.cancel()
+    denylist_syncer.cancel()
+    if key_rotator is not None:
+        key_rotator.cancel()
+    if warm_pool_filler is not None:
+        warm_pool_filler.cancel()
+    provisioning_resumer.cancel()
+    if usage_flusher is not None:
+        usage_flusher.cancel()
+        # Write this worker's last counters behind while the central pool is still open
+        await run_in_threadpool(usage_meter.flush_from_db)
+    provisioning_pipeline.shutdown()
+    # Close every pooled tenant connection held by this worker
+    tenant_engine_registry.dispose_all()
+    dispose_provisioner()
+    await replica_router.dispose()
+    await central_engines.dispose()
+    password_hasher.shutdown()
+    metrics.mark_process_dead()
+    if sql_profiler.enabled:
+        logger.info(sql_profiler.format_report())
+
+
+def create_app() -> FastAPI:
+    '''
+    Builds the application. Serve with `uvicorn --factory app.main:create_app` (or app.main:app).
+    '''
+    from app.routers.response_utils import ORJSONResponse
+
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+        # Add other FastAPI parameters like version, description if needed
+    )
+
+    if settings.USAGE_METERING_ENABLED:
+        # Innermost: requests shed by admission control are not billed to anyone
+        from app.middleware.usage import UsageMiddleware
+        app.add_middleware(UsageMiddleware)
+    if settings.ADMISSION_CONTROL_ENABLED:
+        # Added before metrics so it sits inside the metrics middleware, which then counts shed requests
+        from app.middleware.admission import AdmissionControlMiddleware
+        app.add_middleware(AdmissionControlMiddleware)
+    if settings.METRICS_ENABLED:
+        _add_metrics(app)
+    if settings.SQL_PROFILER_ENABLED:
+        _add_sql_profiler(app)
+
+    # Include routers
+    from app.routers import auth_router # Import the auth router
+    from app.routers import org_router # Import the org router
+    from app.routers import tenant_router # Import the tenant router
+    from app.routers import well_known_router
+    app.include_router(auth_router.router, prefix="/auth", tags=["Authentication"])
+    app.include_router(org_router.router, prefix="/organizations", tags=["Organizations"])
+    app.include_router(tenant_router.router, tags=["Tenants"]) # Add this line (prefix is part of endpoint paths)
+    app.include_router(well_known_router.router, tags=["Authentication"])
+
+    @app.get("/")
+    async def read_root():
+        return {"message": f"Welcome to {settings.PROJECT_NAME}"}
+
+    @app.get("/health", include_in_schema=False)
+    async def read_health():
+        # Liveness only: no DB access, so it keeps answering while the pool is saturated
+        return {"status": "ok"}
+
+    # Other global configurations or event handlers can go here
+    return app
+
+
+def _add_metrics(app: FastAPI) -> None:
+    from fastapi import Response
+    from prometheus_client import CONTENT_TYPE_LATEST
+
+    from app.core import metrics
+    from app.core.password_hashing import password_hasher
+    from app.core.list_cache import list_body_cache
+    from app.core.principal_cache import principal_cache
+    from app.core.signing_keys import key_ring
+    from app.core.token_denylist import token_denylist
+    from app.db.replicas import replica_router
+    from app.db.session import central_engines
+    from app.db.tenant_session import tenant_engine_registry
+    from app.middleware.admission import admission_controller
+    from app.middleware.metrics import MetricsMiddleware
+    from app.services.provisioning_service import provisioning_pipeline
+    from app.services.tenant_directory import tenant_directory
+    from app.services.usage_service import usage_meter
+    from app.services.warm_pool_service import warm_pool
+
+    app.add_middleware(MetricsMiddleware, tenant_labels=settings.METRICS_TENANT_LABELS)
+    central_engines.add_hook(metrics.instrument_engine)
+    metrics.instrument_pool_waits(central_engines.pool_waits)
+    metrics.instrument_pool_waits(central_engines.async_pool_waits)
+    for component, source in {
+        "password_hasher": password_hasher,
+        "principal_cache": principal_cache,
+        "list_cache": list_body_cache,
+        "token_denylist": token_denylist,
+        "signing_keys": key_ring,
+        "tenant_directory": tenant_directory,
+        "tenant_engines": tenant_engine_registry,
+        "provisioning": provisioning_pipeline,
+        "warm_pool": warm_pool,
+        "replicas": replica_router,
+        "central_pool": central_engines,
+        "admission": admission_controller,
+        "usage": usage_meter,
+    }.items():
+        metrics.stats_collector.register(component, source.stats)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def read_metrics():
+        return Response(metrics.render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+def _add_sql_profiler(app: FastAPI) -> None:
+    from fastapi.responses import PlainTextResponse
+
+    from app.core.sql_profiler import sql_profiler
+    from app.db.session import central_engines
+    from app.middleware.sql_profiler import SQLProfilerMiddleware
+
+    # Development/staging aid: the report lists statement shapes (no values) per endpoint
+    app.add_middleware(SQLProfilerMiddleware)
+    central_engines.add_hook(sql_profiler.install)
+
+    @app.get("/debug/sql-profile", include_in_schema=False)
+    async def read_sql_profile(top: int = 20, format: str = "json"):
+        if format == "text":
+            return PlainTextResponse(sql_profiler.format_report(top))
+        return sql_profiler.report(top)
 
-# Include routers
-app.include_router(auth_router.router, prefix="/auth", tags=["Authentication"])
-app.include_router(org_router.router, prefix="/organizations", tags=["Organizations"])
-app.include_router(tenant_router.router, tags=["Tenants"]) # Add this line (prefix is part of endpoint paths)
 
-@app.get("/")
-async def read_root():
-    return {"message": f"Welcome to {settings.PROJECT_NAME}"}
+_app = None
 
-# Other global configurations or event handlers can go here
+def __getattr__(name: str):
+    # `app.main:app` keeps working, built on first access instead of at import
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
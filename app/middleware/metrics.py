@@ -0,0 +1,68 @@
+import time
+
+from app.core import metrics
+
+# Not worth a histogram series of their own
+EXCLUDED_PATHS = {"/metrics"}
+
+
+def route_template(scope) -> str:
+    '''
+    Full path template of the matched route. FastAPI before 0.143 copied included routes with
+    the router prefix applied, so route.path is complete; newer versions keep the router's own
+    route (path without the prefix) and put the prefixed path on the effective route context.
+    '''
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    '''
+    Records latency, status and DB usage per route template (never the raw path, which
+    would give one series per id), plus per-tenant totals when a handler resolved a tenant.
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses are not buffered and
+    the per-request cost stays at a few dict lookups.
+    '''
+
+    def __init__(self, app, tenant_labels: bool = False):
+        self.app = app
+        self.tenant_labels = tenant_labels
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500 # Unless the app gets to send its response
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        db_stats = metrics.RequestDBStats()
+        token = metrics.current_db_stats.set(db_stats)
+        metrics.IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.IN_PROGRESS.dec()
+            metrics.current_db_stats.reset(token)
+
+            route = route_template(scope)
+            method = scope["method"]
+            metrics.REQUESTS.labels(method, route, status_code).inc()
+            metrics.REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            metrics.DB_QUERIES_PER_REQUEST.labels(route).observe(db_stats.queries)
+            metrics.DB_TIME_PER_REQUEST.labels(route).observe(db_stats.seconds)
+
+            # request.state.tenant, set by get_tenant_db
+            tenant = scope.get("state", {}).get("tenant")
+            if tenant is not None and self.tenant_labels:
+                metrics.TENANT_REQUESTS.labels(tenant.id).inc()
+                metrics.TENANT_REQUEST_SECONDS.labels(tenant.id).inc(elapsed)
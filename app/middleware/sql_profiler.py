@@ -0,0 +1,22 @@
+from app.core.sql_profiler import sql_profiler
+from app.middleware.metrics import EXCLUDED_PATHS, route_template
+
+
+class SQLProfilerMiddleware:
+    '''
+    Opens one statement profile per HTTP request and files it under the route template.
+    Only added when SQL_PROFILER_ENABLED is set.
+    '''
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        token = sql_profiler.begin_request(f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sql_profiler.end_request(token, f"{scope['method']} {route_template(scope)}")
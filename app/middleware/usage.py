@@ -0,0 +1,61 @@
+import time
+from typing import Optional, Tuple
+
+from app.services.usage_service import UsageMeter, usage_meter
+
+
+def usage_owner(scope) -> Optional[Tuple[int, int]]:
+    '''
+    (organization id, tenant id) a request is billed to, or None. Subdomain requests carry
+    their TenantRoute in request.state.tenant (set by get_tenant_db); organization and
+    tenant routes record the owner they checked with record_usage_owner. Requests that never
+    got that far are not billed to anyone.
+    '''
+    state = scope.get("state", {})
+    tenant = state.get("tenant")
+    if tenant is not None:
+        return tenant.organization_id, tenant.id
+    return state.get("usage_owner")
+
+
+class UsageMiddleware:
+    '''
+    Meters requests, body bytes each way and latency per tenant into the usage meter, which
+    aggregates them in memory and writes them behind in batches. Plain ASGI like
+    MetricsMiddleware, and added innermost so shed requests are never billed.
+    '''
+
+    def __init__(self, app, meter: UsageMeter = usage_meter):
+        self.app = app
+        self.meter = meter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        bytes_in = 0
+        bytes_out = 0
+        status_code = 500 # Unless the app gets to send its response
+        async def receive_wrapper():
+            nonlocal bytes_in
+            message = await receive()
+            if message["type"] == "http.request":
+                bytes_in += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal bytes_out, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            owner = usage_owner(scope)
+            if owner is not None:
+                self.meter.record(*owner, status_code, bytes_in, bytes_out, time.perf_counter() - start)
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Column, Computed, Integer, String, ForeignKey, DateTime, Float, Index, Text, func
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -11,6 +16,7 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     full_name = Column(String(255), index=True)
+    orgs_version = Column(Integer, nullable=False, default=0, server_default="0") # Bumped when their organization list changes
 
     organizations = relationship("Organization", back_populates="owner")
 
@@ -20,17 +26,172 @@ class Organization(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), index=True, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    tenants_version = Column(Integer, nullable=False, default=0, server_default="0") # Bumped when its tenant list changes
 
     owner = relationship("User", back_populates="organizations")
     tenants = relationship("Tenant", back_populates="organization")
 
+    __table_args__ = (
+        # Ownership checks and the keyset-paginated organization list (owner_id = ? AND id > ? ORDER BY id)
+        Index("ix_organizations_owner_id_id", "owner_id", "id"),
+    )
+
+class TenantStatus:
+    PROVISIONING = "provisioning"
+    ACTIVE = "active"
+    FAILED = "failed"
+    MIGRATING = "migrating" # Being promoted from a shared to a dedicated database
+
+class TenancyMode:
+    DEDICATED = "dedicated" # Own database (Tenant.db_name)
+    SHARED = "shared" # Rows in a shared database, told apart by tenant_id (see SharedDatabase)
+
 class Tenant(Base):
     __tablename__ = "tenants"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
-    subdomain = Column(String(255), unique=True, index=True, nullable=False)
-    db_name = Column(String(255), unique=True, nullable=False)
+    subdomain = Column(String(255), unique=True, index=True, nullable=False) # Always lowercase, so lookups use the index
+    # Database holding the tenant's data; shared by many tenants when tenancy_mode is "shared"
+    db_name = Column(String(255), index=True, nullable=False)
+    # db_name for dedicated tenants, NULL for shared ones: its unique index keeps two tenants off one dedicated database
+    dedicated_db_name = Column(String(255), Computed(f"CASE WHEN tenancy_mode = '{TenancyMode.DEDICATED}' THEN db_name END"))
     organization_id = Column(Integer, ForeignKey("organizations.id"))
+    status = Column(String(20), nullable=False, index=True, default=TenantStatus.ACTIVE, server_default=TenantStatus.ACTIVE)
+    tenancy_mode = Column(String(20), nullable=False, default=TenancyMode.DEDICATED, server_default=TenancyMode.DEDICATED)
+    provisioning_error = Column(String(1024), nullable=True) # Last error when status is "failed"
+    # Lease of the provisioning job working on it, so concurrent workers never run the same job twice
+    provisioning_claimed_by = Column(String(64), nullable=True)
+    provisioning_lease_until = Column(DateTime, nullable=True)
+    # Set once provisioning created the database, so a resumed job adopts it but never someone else's
+    db_created_at = Column(DateTime, nullable=True)
+    # Change marker used by the in-process tenant directory for incremental refreshes
+    updated_at = Column(DateTime, nullable=False, index=True, default=utcnow, onupdate=utcnow, server_default=func.now())
 
     organization = relationship("Organization", back_populates="tenants")
+
+    __table_args__ = (
+        # Tenant listing, keyset-paginated within an organization (organization_id = ? AND id > ? ORDER BY id)
+        Index("ix_tenants_organization_id_id", "organization_id", "id"),
+        Index("uq_tenants_dedicated_db_name", "dedicated_db_name", unique=True),
+    )
+
+    @validates("subdomain")
+    def _normalize_subdomain(self, key, subdomain):
+        return subdomain.lower()
+
+class SpareDatabaseStatus:
+    READY = "ready"
+    CLAIMED = "claimed"
+
+class SpareDatabase(Base):
+    # Pre-created, fully migrated tenant databases waiting to be claimed by create_tenant
+    __tablename__ = "spare_databases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    db_name = Column(String(255), unique=True, nullable=False)
+    status = Column(String(20), nullable=False, index=True, default=SpareDatabaseStatus.READY)
+    revision = Column(String(64), nullable=True) # Tenant schema revision; ready spares are kept current by fleet migrations
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+
+class SharedDatabaseStatus:
+    PROVISIONING = "provisioning" # Placed tenants wait in "provisioning" until it is created
+    CREATING = "creating" # A provisioning job is creating and migrating it
+    READY = "ready"
+
+class SharedDatabase(Base):
+    # Databases that hold the rows of many small tenants; placement counts their tenants (see shared_database_service)
+    __tablename__ = "shared_databases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    db_name = Column(String(255), unique=True, nullable=False)
+    status = Column(String(20), nullable=False, index=True, default=SharedDatabaseStatus.PROVISIONING)
+    revision = Column(String(64), nullable=True) # Tenant schema revision, kept by fleet migrations
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    status_changed_at = Column(DateTime, nullable=False, default=utcnow)
+
+class MigrationStatus:
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class TenantMigrationState(Base):
+    # Last fleet migration outcome per tenant database; kept off the tenants table so
+    # fleet runs don't bump Tenant.updated_at and churn the tenant directory.
+    __tablename__ = "tenant_migration_states"
+
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), primary_key=True)
+    revision = Column(String(64), nullable=True, index=True) # Revision the tenant DB is at
+    status = Column(String(20), nullable=False, index=True)
+    error = Column(String(1024), nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+
+class RefreshToken(Base):
+    # One row per issued refresh token. Each refresh rotates it (used_at) and issues the next
+    # token of the same family; presenting a used token again revokes the whole family.
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(64), unique=True, nullable=False)
+    family_id = Column(String(64), nullable=False, index=True) # jti of the login's first token
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+class RevokedToken(Base):
+    # Access tokens revoked before their exp; synced into every worker's in-memory denylist
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True) # Rows are purged once the token would have expired anyway
+    revoked_at = Column(DateTime, nullable=False, index=True, default=utcnow) # Change marker for the denylist sync
+
+class SigningKey(Base):
+    # JWT signing keys (see core/signing_keys.py). A key is published in the JWKS from
+    # created_at, signs tokens from activates_at until retires_at, and stays published until
+    # expires_at, when no token it signed can still be valid.
+    __tablename__ = "signing_keys"
+
+    kid = Column(String(64), primary_key=True)
+    algorithm = Column(String(16), nullable=False)
+    private_key_pem = Column(Text, nullable=False) # PKCS#8, encrypted with SECRET_KEY
+    public_jwk = Column(Text, nullable=False) # JSON, as served from /.well-known/jwks.json
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    activates_at = Column(DateTime, nullable=False, index=True)
+    retires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class ReplicationHeartbeat(Base):
+    # Single row the primary rewrites every health check; how old it is on a replica is that replica's lag
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(DateTime, nullable=False)
+
+class BackgroundLease(Base):
+    # Elects the one worker allowed to run a fleet-wide background job (see db/leases.py)
+    __tablename__ = "background_leases"
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(64), nullable=False)
+    lease_until = Column(DateTime, nullable=False)
+
+class TenantUsage(Base):
+    # Request totals per tenant and time bucket, upserted in batches by each worker's usage meter
+    # (see services/usage_service.py). tenant_id 0 holds organization-level requests.
+    __tablename__ = "tenant_usage"
+
+    organization_id = Column(Integer, primary_key=True) # Leads the key: usage is read per organization and time range
+    bucket_start = Column(DateTime, primary_key=True)
+    tenant_id = Column(Integer, primary_key=True)
+    requests = Column(BigInteger, nullable=False, default=0)
+    errors = Column(BigInteger, nullable=False, default=0) # 5xx responses
+    bytes_in = Column(BigInteger, nullable=False, default=0)
+    bytes_out = Column(BigInteger, nullable=False, default=0)
+    duration_ms = Column(Float, nullable=False, default=0.0) # Sum; divide by requests for the mean
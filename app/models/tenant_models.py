@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Index, Integer, String, Text
+from sqlalchemy.ext.declarative import declarative_base
+
+# Tables that live in every tenant database; migrated by alembic_tenant, not alembic_central.
+TenantBase = declarative_base()
+
+class TenantScoped:
+    '''
+    Mixin for every tenant table. In a shared database each row carries its tenant's id and
+    sessions scoped with db/tenant_scoping.py filter and stamp it automatically; in a
+    dedicated database it is always 0.
+    '''
+    tenant_id = Column(Integer, nullable=False, default=0, server_default="0")
+
+class TenantSetting(TenantScoped, TenantBase):
+    __tablename__ = "tenant_settings"
+    __table_args__ = (Index("ix_tenant_settings_tenant_id_key", "tenant_id", "key", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(255), nullable=False) # Unique per tenant
+    value = Column(Text, nullable=True)
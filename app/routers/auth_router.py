@@ -1,34 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
-from app.schemas.auth_schemas import UserCreate, UserRead, Token
+from app.core.security import get_current_token_claims
+from app.db.session import get_async_db
+from app.schemas.auth_schemas import LogoutRequest, RefreshRequest, UserCreate, UserRead, Token
 from app.services import auth_service
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-def register_new_user(user_in: UserCreate, db: Session = Depends(get_db)):
-    db_user = auth_service.get_user_by_email(db, email=user_in.email)
+async def register_new_user(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await auth_service.get_user_by_email_async(db, email=user_in.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    user = auth_service.create_user(db=db, user_in=user_in)
+    user = await auth_service.create_user_async(db=db, user_in=user_in)
     return user
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = auth_service.authenticate_user(db, email=form_data.username, password=form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await auth_service.authenticate_user_async(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = auth_service.create_access_token(
-        data={"sub": user.email} # 'sub' is standard for subject in JWT
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await auth_service.issue_tokens_async(db, user)
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(body: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    # No bcrypt: clients keep sessions alive with refresh tokens instead of logging in again
+    tokens = await auth_service.refresh_tokens_async(db, body.refresh_token)
+    if tokens is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return tokens
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    body: Optional[LogoutRequest] = None,
+    claims: dict = Depends(get_current_token_claims),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Revokes the access token used for this request, and the refresh token's login if one is given
+    if claims.get("jti"):
+        await auth_service.revoke_access_token_async(db, claims["jti"], claims.get("uid"), claims["exp"])
+    if body is not None and body.refresh_token:
+        await auth_service.revoke_refresh_token_async(db, body.refresh_token, claims.get("uid"))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
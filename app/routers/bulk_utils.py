@@ -0,0 +1,53 @@
+import json
+from typing import Any, List, Tuple, Type
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+from app.schemas.bulk_schemas import BulkItemResult
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+async def parse_bulk_body(request: Request, schema: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], List[BulkItemResult]]:
+    '''
+    Reads a JSON array or an NDJSON body and validates each item with `schema`.
+    Returns (index, item) pairs for valid items and error results for the rest, so one
+    bad line doesn't reject the whole batch.
+    '''
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    raw_items: List[Any] = []
+    errors: List[BulkItemResult] = []
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        for index, line in enumerate(line for line in body.splitlines() if line.strip()):
+            try:
+                raw_items.append(json.loads(line))
+            except ValueError as e:
+                raw_items.append(None)
+                errors.append(BulkItemResult(index=index, status="error", error=f"Invalid JSON: {e}"))
+    else:
+        try:
+            raw_items = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON body: {e}")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array or an NDJSON body")
+
+    if len(raw_items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_MAX_ITEMS} items per request"
+        )
+
+    invalid = {e.index for e in errors}
+    valid: List[Tuple[int, BaseModel]] = []
+    for index, raw in enumerate(raw_items):
+        if index in invalid:
+            continue
+        try:
+            valid.append((index, schema.model_validate(raw)))
+        except ValidationError as e:
+            errors.append(BulkItemResult(index=index, status="error", error=str(e.errors()[0].get("msg", e))))
+    return valid, errors
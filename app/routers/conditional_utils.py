@@ -0,0 +1,55 @@
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request, Response
+
+from app.core.list_cache import list_body_cache
+from app.routers.response_utils import rows_response
+from app.routers.streaming_utils import wants_ndjson
+
+# Clients may keep the body but must revalidate it (If-None-Match) before every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def list_etag(kind: str, scope_id: int, version: int, request: Request) -> str:
+    '''
+    Strong ETag of a listing: its version counter (see services/list_versions.py) plus a
+    digest of what selects the body at that version, i.e. the query string and the format.
+    '''
+    variant = hashlib.blake2b(f"{request.url.query}|{wants_ndjson(request)}".encode(), digest_size=6).hexdigest()
+    return f'"{kind}-{scope_id}-{version}-{variant}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return etag in (candidate.strip().removeprefix("W/") for candidate in header.split(","))
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
+
+def cached_list_response(etag: str) -> Optional[Response]:
+    if not list_body_cache.enabled:
+        return None
+    cached = list_body_cache.get(etag)
+    if cached is None:
+        return None
+    return Response(cached.body, media_type="application/json", headers=cached.headers)
+
+def versioned_rows_response(rows: List[Dict[str, Any]], limit: int, etag: str) -> Response:
+    '''
+    rows_response with the listing's ETag, remembered in the list body cache when enabled.
+    The ETag already names the version and query, so it is the cache key.
+    '''
+    response = rows_response(rows, limit)
+    response.headers.update(etag_headers(etag))
+    if list_body_cache.enabled:
+        headers = {k: v for k, v in response.headers.items() if k in ("etag", "cache-control", "x-next-cursor")}
+        list_body_cache.put(etag, response.body, headers)
+    return response
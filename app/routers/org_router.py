@@ -1,39 +1,114 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.replicas import get_read_db, get_read_sessionmaker
+from app.db.session import get_async_db
+from app.routers.bulk_utils import parse_bulk_body
+from app.routers.conditional_utils import (
+    cached_list_response, etag_headers, etag_matches, list_etag, not_modified, versioned_rows_response,
+)
+from app.routers.streaming_utils import ndjson_response, wants_ndjson
+from app.schemas.bulk_schemas import BulkItemResult, BulkResult
 from app.schemas.org_schemas import OrganizationCreate, OrganizationRead
-from app.services import org_service
+from app.schemas.usage_schemas import OrganizationUsageRead
+from app.services import org_service, usage_service
 from app.models.central_models import User # Import User model
+from app.core.request_context import RequestContext, get_read_request_context
 from app.core.security import get_current_active_user # Import the dependency
 
 router = APIRouter()
 
 @router.post("/", response_model=OrganizationRead, status_code=status.HTTP_201_CREATED)
-def create_new_organization(
+async def create_new_organization(
     org_in: OrganizationCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_active_user) # Protect endpoint
 ):
-    organization = org_service.create_organization(db=db, org_in=org_in, owner=current_user)
+    organization = await org_service.create_organization_async(db=db, org_in=org_in, owner=current_user)
     return organization
 
+@router.post("/bulk", response_model=BulkResult)
+async def create_organizations_bulk(
+    request: Request, # JSON array or NDJSON (Content-Type: application/x-ndjson) of OrganizationCreate
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    valid, results = await parse_bulk_body(request, OrganizationCreate)
+    ids = await org_service.create_organizations_bulk_async(
+        db=db, orgs_in=[org_in for _, org_in in valid], owner=current_user, chunk_size=settings.BULK_CHUNK_SIZE
+    )
+    results += [BulkItemResult(index=index, status="created", id=org_id) for (index, _), org_id in zip(valid, ids)]
+    results.sort(key=lambda r: r.index)
+    return BulkResult(created=len(ids), failed=len(results) - len(ids), results=results)
+
 @router.get("/", response_model=List[OrganizationRead])
-def read_user_organizations(
-    db: Session = Depends(get_db), 
+async def read_user_organizations(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: Optional[int] = Query(None, description="Cursor: the X-Next-Cursor header of the previous page"),
+    name_prefix: Optional[str] = Query(None, max_length=255),
+    db: AsyncSession = Depends(get_read_db),
+    sessionmaker: async_sessionmaker = Depends(get_read_sessionmaker),
     current_user: User = Depends(get_current_active_user) # Protect endpoint
 ):
-    organizations = org_service.get_user_organizations(db=db, owner_id=current_user.id)
-    return organizations
+    # Polling clients send If-None-Match: unchanged listings cost one primary-key read
+    version = await org_service.get_organizations_version_async(db, current_user.id)
+    etag = list_etag("orgs", current_user.id, version, request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if wants_ndjson(request):
+        # Accept: application/x-ndjson streams every matching row instead of one page
+        response = ndjson_response(org_service.stream_user_organizations_async(
+            owner_id=current_user.id, after_id=after_id, name_prefix=name_prefix, sessionmaker=sessionmaker
+        ))
+        response.headers.update(etag_headers(etag))
+        return response
+    cached = cached_list_response(etag)
+    if cached is not None:
+        return cached
+    organizations = await org_service.get_user_organization_rows_async(
+        db=db, owner_id=current_user.id, limit=limit, after_id=after_id, name_prefix=name_prefix
+    )
+    # Rows are already OrganizationRead-shaped: skip response_model validation
+    return versioned_rows_response(organizations, limit, etag)
 
 @router.get("/{org_id}", response_model=OrganizationRead)
-def read_specific_organization(
+async def read_specific_organization(
     org_id: int, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_active_user) # Protect endpoint
+    context: RequestContext = Depends(get_read_request_context) # Protect endpoint
 ):
-    organization = org_service.get_organization_by_id(db=db, org_id=org_id, owner_id=current_user.id)
+    organization = await context.get_organization(org_id)
     if organization is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Organization not found or not owned by user")
     return organization
+
+@router.get("/{org_id}/usage", response_model=OrganizationUsageRead)
+async def read_organization_usage(
+    org_id: int,
+    start: Optional[datetime] = Query(None, description="Inclusive; defaults to 7 days before end"),
+    end: Optional[datetime] = Query(None, description="Exclusive; defaults to now"),
+    granularity: Literal["bucket", "day"] = Query("day"),
+    tenant_id: Optional[int] = Query(None, description="Only this tenant; 0 for organization-level requests"),
+    context: RequestContext = Depends(get_read_request_context)
+):
+    # Reads the pre-rolled tenant_usage buckets; the last USAGE_FLUSH_SECONDS may not be flushed yet
+    organization = await context.get_organization(org_id)
+    if organization is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Organization not found or not owned by user")
+    start, end = usage_service.usage_range(start, end)
+    if start >= end or end - start > timedelta(days=settings.USAGE_QUERY_MAX_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"start must be before end, at most {settings.USAGE_QUERY_MAX_DAYS} days apart",
+        )
+    rows = await usage_service.get_organization_usage_async(context.db, org_id, start, end, tenant_id)
+    return {
+        "organization_id": org_id,
+        "start": start,
+        "end": end,
+        "granularity": granularity,
+        "buckets": usage_service.roll_up_usage(rows, granularity),
+    }
@@ -0,0 +1,24 @@
+from typing import Any, Dict, List
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    '''
+    Default response class (see main.py): orjson encodes several times faster than the
+    stdlib json module and handles datetimes natively.
+    '''
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def rows_response(rows: List[Dict[str, Any]], limit: int) -> ORJSONResponse:
+    '''
+    Serializes plain row dicts (already shaped like the route's response model) straight
+    to JSON, skipping ORM hydration and pydantic validation, for large list endpoints.
+    A full page means there may be more: the last id goes back as the next after_id.
+    '''
+    headers = {"X-Next-Cursor": str(rows[-1]["id"])} if len(rows) == limit else None
+    return ORJSONResponse(rows, headers=headers)
@@ -0,0 +1,19 @@
+from typing import Any, AsyncIterator, Dict
+
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_response(rows: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    '''
+    Streams rows as newline-delimited JSON as they come off the cursor.
+    '''
+    async def lines():
+        async for row in rows:
+            yield orjson.dumps(row) + b"\n"
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
@@ -1,11 +1,21 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Path
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, Path
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db.session import get_db
-from app.schemas.tenant_schemas import TenantCreate, TenantRead
-from app.services import tenant_service, org_service # org_service for checking org ownership
+from app.core.config import settings
+from app.db.replicas import get_read_db, get_read_sessionmaker
+from app.routers.bulk_utils import parse_bulk_body
+from app.core.list_cache import list_body_cache
+from app.routers.conditional_utils import (
+    cached_list_response, etag_headers, etag_matches, list_etag, not_modified, versioned_rows_response,
+)
+from app.routers.streaming_utils import ndjson_response, wants_ndjson
+from app.schemas.bulk_schemas import BulkResult
+from app.schemas.tenant_schemas import TenantCreate, TenantRead, TenantStatusRead
+from app.services import tenant_service
+from app.services.usage_service import record_usage_owner
 from app.models.central_models import User # Import User model
+from app.core.request_context import RequestContext, get_read_request_context, get_request_context # Ownership checks, memoized per request
 from app.core.security import get_current_active_user # Import the dependency
 import logging # Import logging
 
@@ -15,16 +25,15 @@ logger = logging.getLogger(__name__) # Get logger for this module
 @router.post(
     "/organizations/{org_id}/tenants/", 
     response_model=TenantRead, 
-    status_code=status.HTTP_201_CREATED
+    status_code=status.HTTP_202_ACCEPTED # The tenant database is provisioned in the background
 )
-def create_new_tenant(
+async def create_new_tenant(
     tenant_in: TenantCreate,
     org_id: int = Path(..., title="The ID of the organization to create the tenant under"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    context: RequestContext = Depends(get_request_context)
 ):
     # Verify organization exists and is owned by the current user
-    organization = org_service.get_organization_by_id(db=db, org_id=org_id, owner_id=current_user.id)
+    organization = await context.get_organization(org_id)
     if not organization:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -32,7 +41,7 @@ def create_new_tenant(
         )
     
     try:
-        tenant = tenant_service.create_tenant(db=db, tenant_in=tenant_in, organization=organization)
+        tenant = await tenant_service.create_tenant_async(db=context.db, tenant_in=tenant_in, organization=organization)
         return tenant
     except ValueError as ve: # Catch specific error for duplicate subdomain
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
@@ -43,25 +52,100 @@ def create_new_tenant(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Tenant creation failed due to an unexpected error.")
 
 
+@router.post(
+    "/organizations/{org_id}/tenants/bulk",
+    response_model=BulkResult,
+    status_code=status.HTTP_202_ACCEPTED # Tenant databases are provisioned in the background
+)
+async def create_organization_tenants_bulk(
+    request: Request, # JSON array or NDJSON (Content-Type: application/x-ndjson) of TenantCreate
+    org_id: int = Path(..., title="The ID of the organization to create the tenants under"),
+    context: RequestContext = Depends(get_request_context)
+):
+    organization = await context.get_organization(org_id)
+    if not organization:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found or you do not have permission to access it."
+        )
+
+    valid, results = await parse_bulk_body(request, TenantCreate)
+    results += await tenant_service.create_tenants_bulk_async(
+        db=context.db, items=valid, organization=organization, chunk_size=settings.BULK_CHUNK_SIZE
+    )
+    results.sort(key=lambda r: r.index)
+    created = sum(1 for r in results if r.status == "created")
+    return BulkResult(created=created, failed=len(results) - created, results=results)
+
+
 @router.get(
     "/organizations/{org_id}/tenants/", 
     response_model=List[TenantRead]
 )
-def read_organization_tenants(
+async def read_organization_tenants(
+    request: Request,
     org_id: int = Path(..., title="The ID of the organization to list tenants for"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: Optional[int] = Query(None, description="Cursor: the X-Next-Cursor header of the previous page"),
+    name_prefix: Optional[str] = Query(None, max_length=255),
+    sessionmaker: async_sessionmaker = Depends(get_read_sessionmaker),
+    context: RequestContext = Depends(get_read_request_context)
 ):
-    # First, check if the organization exists and is owned by the user.
-    # This is a more explicit check before calling the tenant service.
-    organization = org_service.get_organization_by_id(db=db, org_id=org_id, owner_id=current_user.id)
-    if not organization:
+    if "if-none-match" in request.headers or wants_ndjson(request) or list_body_cache.enabled:
+        # Version first (it is also the ownership check): unchanged listings stop at a 304
+        version = await context.get_tenants_version(org_id)
+        tenants = None
+    else:
+        # Plain GET: ownership check, version and the first page in one round trip
+        version, tenants = await context.get_organization_tenant_rows(
+            org_id, limit=limit, after_id=after_id, name_prefix=name_prefix
+        )
+    if version is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Organization not found or you do not have permission to access it."
         )
-        
-    # Service function get_tenants_for_organization already checks ownership but might return [] if org not found.
-    # The check above makes the 404 for the organization explicit.
-    tenants = tenant_service.get_tenants_for_organization(db=db, organization_id=org_id, owner_id=current_user.id)
-    return tenants
+    etag = list_etag("tenants", org_id, version, request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    if wants_ndjson(request):
+        # Accept: application/x-ndjson streams every matching row instead of one page
+        response = ndjson_response(tenant_service.stream_tenants_for_organization_async(
+            organization_id=org_id, owner_id=context.user.id, after_id=after_id, name_prefix=name_prefix,
+            sessionmaker=sessionmaker,
+        ))
+        response.headers.update(etag_headers(etag))
+        return response
+    if tenants is None:
+        cached = cached_list_response(etag)
+        if cached is not None:
+            return cached
+        _, tenants = await context.get_organization_tenant_rows(
+            org_id, limit=limit, after_id=after_id, name_prefix=name_prefix
+        )
+    # Rows are already TenantRead-shaped: skip response_model validation
+    return versioned_rows_response(tenants, limit, etag)
+
+
+@router.get(
+    "/organizations/{org_id}/tenants/{tenant_id}/status",
+    response_model=TenantStatusRead
+)
+async def read_tenant_status(
+    request: Request,
+    org_id: int = Path(..., title="The ID of the organization the tenant belongs to"),
+    tenant_id: int = Path(..., title="The ID of the tenant"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    tenant = await tenant_service.get_tenant_for_organization_async(
+        db=db, tenant_id=tenant_id, organization_id=org_id, owner_id=current_user.id
+    )
+    if not tenant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tenant not found or you do not have permission to access it."
+        )
+    record_usage_owner(request, org_id, tenant_id)
+    return tenant
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Request, Response
+
+from app.core.config import settings
+from app.core.signing_keys import key_ring
+from app.routers.conditional_utils import etag_matches
+
+router = APIRouter()
+
+@router.get("/.well-known/jwks.json")
+async def read_jwks(request: Request):
+    # Public keys for verifying access tokens locally. Cacheable: a new key is published
+    # JWT_KEY_PREPUBLISH_HOURS before it signs, far longer than max-age.
+    body, etag = key_ring.jwks
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
@@ -17,6 +17,14 @@ class UserRead(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None # Access token lifetime in seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None # Also ends the login this refresh token belongs to
 
 class TokenData(BaseModel):
     email: Optional[str] = None
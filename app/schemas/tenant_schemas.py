@@ -1,4 +1,5 @@
 from pydantic import BaseModel, validator
+from typing import Literal, Optional
 import re
 
 class TenantBase(BaseModel):
@@ -14,12 +15,24 @@ class TenantBase(BaseModel):
         return v
 
 class TenantCreate(TenantBase):
-    pass
+    # Defaults to TENANT_DEFAULT_TENANCY_MODE; "shared" tenants are ready without creating a database
+    tenancy_mode: Optional[Literal["dedicated", "shared"]] = None
 
 class TenantRead(TenantBase):
     id: int
     db_name: str
     organization_id: int
+    status: str
+    tenancy_mode: str
+
+    class Config:
+        from_attributes = True
+
+class TenantStatusRead(BaseModel):
+    id: int
+    subdomain: str
+    status: str # "provisioning", "active" or "failed"
+    provisioning_error: Optional[str] = None
 
     class Config:
         from_attributes = True
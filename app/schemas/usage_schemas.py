@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import List, Literal
+
+from pydantic import BaseModel
+
+class UsageBucketRead(BaseModel):
+    tenant_id: int # 0: requests to the organization itself (listings, tenant creation)
+    bucket_start: datetime
+    requests: int
+    errors: int # 5xx responses
+    bytes_in: int
+    bytes_out: int
+    avg_duration_ms: float
+
+class OrganizationUsageRead(BaseModel):
+    organization_id: int
+    start: datetime
+    end: datetime
+    granularity: Literal["bucket", "day"] # bucket: as stored (USAGE_BUCKET_SECONDS); day: summed per UTC day
+    buckets: List[UsageBucketRead]
@@ -1,21 +1,28 @@
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import JWTError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models.central_models import User
+from app.models.central_models import RefreshToken, RevokedToken, User, utcnow
 from app.schemas.auth_schemas import UserCreate
 from app.core.config import settings
+from app.core.password_hashing import password_hasher, bcrypt_hash, bcrypt_verify
+from app.core.signing_keys import key_ring
+from app.core.token_denylist import token_denylist
+import logging
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
+# Sync helpers for scripts and background jobs; the request path uses password_hasher directly.
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return bcrypt_verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return bcrypt_hash(password, password_hasher.rounds)
 
 def create_user(db: Session, user_in: UserCreate) -> User:
     hashed_password = get_password_hash(user_in.password)
@@ -40,12 +47,145 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
         return None
     return user
 
+# Async variants used by the request path. bcrypt is CPU-bound, so it runs in the password hashing pool.
+
+async def create_user_async(db: AsyncSession, user_in: UserCreate) -> User:
+    hashed_password = await password_hasher.hash(user_in.password)
+    db_user = User(
+        email=user_in.email,
+        hashed_password=hashed_password,
+        full_name=user_in.full_name
+    )
+    db.add(db_user)
+    await db.commit() # No refresh needed: attributes survive the commit (expire_on_commit=False)
+    return db_user
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email).limit(1))
+    return result.scalars().first()
+
+async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        return None
+    if not await password_hasher.verify(password, user.hashed_password):
+        return None
+    if password_hasher.needs_rehash(user.hashed_password):
+        # The bcrypt cost changed since this hash was stored; upgrade it while we hold the plaintext
+        try:
+            user.hashed_password = await password_hasher.hash(password)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"Could not rehash password for user {user.id}: {e}")
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)})
+    to_encode.setdefault("jti", uuid.uuid4().hex) # Lets the token be revoked (see core/token_denylist.py)
+    encoded_jwt = key_ring.encode(to_encode) # Current rotated key, or SECRET_KEY with HS256
     return encoded_jwt
+
+# Refresh tokens and revocation
+
+REFRESH_TOKEN_TYPE = "refresh" # "typ" claim of refresh tokens; access tokens have none
+
+def token_claims(user: User) -> dict:
+    # 'sub' is standard for subject in JWT; uid/name let get_current_user skip the users lookup
+    return {"sub": user.email, "uid": user.id, "name": user.full_name}
+
+async def issue_tokens_async(db: AsyncSession, user: User, family_id: Optional[str] = None) -> dict:
+    '''
+    Access token plus a refresh token recorded in refresh_tokens. Commits. `family_id` carries
+    a rotated refresh token's login over to its successor.
+    '''
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    jti = uuid.uuid4().hex
+    db.add(RefreshToken(
+        jti=jti, family_id=family_id or jti, user_id=user.id, expires_at=expires_at.replace(tzinfo=None)
+    ))
+    await db.commit()
+    refresh_token = key_ring.encode(
+        {**token_claims(user), "typ": REFRESH_TOKEN_TYPE, "jti": jti, "exp": expires_at, "iat": now}
+    )
+    return {
+        "access_token": create_access_token(token_claims(user)),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def decode_refresh_token(token: str) -> Optional[dict]:
+    try:
+        payload = key_ring.decode(token)
+    except JWTError:
+        return None
+    if payload.get("typ") != REFRESH_TOKEN_TYPE or not payload.get("jti"):
+        return None
+    return payload
+
+async def revoke_refresh_family_async(db: AsyncSession, family_id: str) -> None:
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=utcnow())
+    )
+    await db.commit()
+
+async def refresh_tokens_async(db: AsyncSession, refresh_token: str) -> Optional[dict]:
+    '''
+    Rotates a refresh token: marks it used and issues a new pair in the same family.
+    Returns None if the token is invalid, expired, revoked or already used; reuse of a used
+    token revokes its whole family, since one of the two presenters is not the user.
+    '''
+    payload = decode_refresh_token(refresh_token)
+    if payload is None:
+        return None
+    result = await db.execute(
+        select(RefreshToken.family_id, RefreshToken.revoked_at, User)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.jti == payload["jti"])
+        .limit(1)
+    )
+    row = result.first()
+    if row is None or row.revoked_at is not None:
+        return None
+    # The used_at guard makes rotation atomic: of two concurrent refreshes, one wins
+    rotated = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.jti == payload["jti"], RefreshToken.used_at.is_(None), RefreshToken.revoked_at.is_(None))
+        .values(used_at=utcnow())
+    )
+    if rotated.rowcount != 1:
+        logger.warning(f"Refresh token reuse for user {row.User.id}; revoking token family {row.family_id}")
+        await revoke_refresh_family_async(db, row.family_id)
+        return None
+    return await issue_tokens_async(db, row.User, family_id=row.family_id)
+
+async def revoke_refresh_token_async(db: AsyncSession, refresh_token: str, user_id: int) -> bool:
+    payload = decode_refresh_token(refresh_token)
+    if payload is None or payload.get("uid") != user_id:
+        return False
+    family_id = await db.scalar(select(RefreshToken.family_id).where(RefreshToken.jti == payload["jti"]))
+    if family_id is None:
+        return False
+    await revoke_refresh_family_async(db, family_id)
+    return True
+
+async def revoke_access_token_async(db: AsyncSession, jti: str, user_id: int, expires_at: float) -> None:
+    '''
+    Denies an access token until its exp: immediately in this worker, in the others after
+    their next denylist sync.
+    '''
+    await db.merge(RevokedToken(
+        jti=jti, user_id=user_id,
+        expires_at=datetime.fromtimestamp(expires_at, timezone.utc).replace(tzinfo=None), revoked_at=utcnow(),
+    ))
+    await db.commit()
+    token_denylist.add(jti, expires_at)
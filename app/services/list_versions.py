@@ -0,0 +1,34 @@
+'''
+Version counters behind the ETags of the organization and tenant listings (see
+routers/conditional_utils.py). Every write that changes what a listing returns bumps its
+counter in the same transaction, so a matching If-None-Match is answered from one
+primary-key read of the counter.
+
+    users.orgs_version            GET /organizations/ of that owner
+    organizations.tenants_version GET /organizations/{org_id}/tenants/
+'''
+from sqlalchemy import select, update
+
+from app.models.central_models import Organization, User
+
+
+def bump_organizations_version(owner_id: int):
+    # Core-style UPDATE: no ORM after_update events, so the principal cache keeps the user
+    return (
+        update(User).where(User.id == owner_id).values(orgs_version=User.orgs_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def bump_tenants_version(organization_id: int):
+    return (
+        update(Organization).where(Organization.id == organization_id)
+        .values(tenants_version=Organization.tenants_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def organizations_version_statement(owner_id: int):
+    return select(User.orgs_version).where(User.id == owner_id)
+
+def tenants_version_statement(organization_id: int, owner_id: int):
+    # Doubles as the ownership check: no row means not found or not owned
+    return select(Organization.tenants_version).where(Organization.id == organization_id, Organization.owner_id == owner_id)
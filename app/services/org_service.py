@@ -1,12 +1,17 @@
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Session
 
+from app.db.session import AsyncSessionLocal
 from app.models.central_models import Organization, User
 from app.schemas.org_schemas import OrganizationCreate
+from app.services.list_versions import bump_organizations_version, organizations_version_statement
 
 def create_organization(db: Session, org_in: OrganizationCreate, owner: User) -> Organization:
     db_org = Organization(**org_in.model_dump(), owner_id=owner.id)
     db.add(db_org)
+    db.execute(bump_organizations_version(owner.id))
     db.commit()
     db.refresh(db_org)
     return db_org
@@ -16,3 +21,93 @@ def get_user_organizations(db: Session, owner_id: int) -> List[Organization]:
 
 def get_organization_by_id(db: Session, org_id: int, owner_id: int) -> Optional[Organization]:
     return db.query(Organization).filter(Organization.id == org_id, Organization.owner_id == owner_id).first()
+
+# Async variants used by the request path
+
+async def create_organization_async(db: AsyncSession, org_in: OrganizationCreate, owner: User) -> Organization:
+    db_org = Organization(**org_in.model_dump(), owner_id=owner.id)
+    db.add(db_org)
+    await db.execute(bump_organizations_version(owner.id))
+    await db.commit() # No refresh needed: attributes survive the commit (expire_on_commit=False)
+    return db_org
+
+async def get_organizations_version_async(db: AsyncSession, owner_id: int) -> int:
+    return await db.scalar(organizations_version_statement(owner_id)) or 0
+
+# Columns of OrganizationRead, in its field order
+ORGANIZATION_READ_COLUMNS = (Organization.name, Organization.id, Organization.owner_id)
+
+def _user_organizations_statement(owner_id: int, after_id: Optional[int], name_prefix: Optional[str]):
+    # Keyset pagination on id: each page is an index range scan, however deep the cursor
+    statement = select(Organization).where(Organization.owner_id == owner_id)
+    if after_id is not None:
+        statement = statement.where(Organization.id > after_id)
+    if name_prefix:
+        statement = statement.where(Organization.name.startswith(name_prefix, autoescape=True))
+    return statement.order_by(Organization.id)
+
+async def get_user_organizations_async(
+    db: AsyncSession, owner_id: int, limit: Optional[int] = None, after_id: Optional[int] = None, name_prefix: Optional[str] = None
+) -> List[Organization]:
+    statement = _user_organizations_statement(owner_id, after_id, name_prefix)
+    if limit is not None:
+        statement = statement.limit(limit)
+    result = await db.execute(statement)
+    return list(result.scalars().all())
+
+async def get_user_organization_rows_async(
+    db: AsyncSession, owner_id: int, limit: int, after_id: Optional[int] = None, name_prefix: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    '''
+    Same page as get_user_organizations_async, as plain dicts shaped like OrganizationRead.
+    '''
+    statement = _user_organizations_statement(owner_id, after_id, name_prefix).with_only_columns(*ORGANIZATION_READ_COLUMNS)
+    result = await db.execute(statement.limit(limit))
+    return [row._asdict() for row in result]
+
+async def stream_user_organizations_async(
+    owner_id: int, after_id: Optional[int] = None, name_prefix: Optional[str] = None,
+    sessionmaker: async_sessionmaker = AsyncSessionLocal,
+) -> AsyncIterator[Dict[str, Any]]:
+    '''
+    Yields organizations as dicts from a server-side cursor, 500 rows at a time. Opens its own
+    session (from `sessionmaker`, e.g. a replica's) because the stream outlives the request handler.
+    '''
+    statement = _user_organizations_statement(owner_id, after_id, name_prefix).with_only_columns(*ORGANIZATION_READ_COLUMNS)
+    async with sessionmaker() as db:
+        result = await db.stream(statement.execution_options(yield_per=500))
+        async for row in result:
+            yield row._asdict()
+
+async def get_organization_by_id_async(db: AsyncSession, org_id: int, owner_id: int) -> Optional[Organization]:
+    result = await db.execute(
+        select(Organization).where(Organization.id == org_id, Organization.owner_id == owner_id).limit(1)
+    )
+    return result.scalars().first()
+
+async def create_organizations_bulk_async(db: AsyncSession, orgs_in: Sequence[OrganizationCreate], owner: User, chunk_size: int) -> List[int]:
+    '''
+    Inserts organizations in chunks of `chunk_size`, one INSERT and one transaction per chunk,
+    and returns their ids in input order.
+    '''
+    dialect = db.get_bind().dialect
+    ids: List[int] = []
+    for start in range(0, len(orgs_in), chunk_size):
+        rows = [{**org_in.model_dump(), "owner_id": owner.id} for org_in in orgs_in[start:start + chunk_size]]
+        if dialect.insert_executemany_returning_sort_by_parameter_order:
+            # One executemany with RETURNING, ids come back in parameter order
+            result = await db.scalars(
+                insert(Organization).returning(Organization.id, sort_by_parameter_order=True), rows
+            )
+            ids.extend(result.all())
+        else:
+            # MySQL: no RETURNING. One multi-row INSERT is a "simple insert", so InnoDB hands it
+            # consecutive ids in every autoinc lock mode, and lastrowid is the first of them
+            # (assumes auto_increment_increment = 1, the default).
+            result = await db.execute(insert(Organization).values(rows))
+            if result.rowcount != len(rows):
+                raise RuntimeError(f"Inserted {result.rowcount} of {len(rows)} organizations")
+            ids.extend(range(result.lastrowid, result.lastrowid + len(rows)))
+        await db.execute(bump_organizations_version(owner.id))
+        await db.commit()
+    return ids
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import db_utils
+from app.db.session import SessionLocal
+from app.models.central_models import TenancyMode, Tenant, TenantStatus, utcnow
+from app.services.list_versions import bump_tenants_version
+from app.services.shared_database_service import ensure_shared_database_ready
+
+logger = logging.getLogger(__name__)
+
+
+def claim_provisioning(db: Session, tenant_id: int, claim: str) -> bool:
+    '''
+    Takes (or renews) the provisioning lease of a tenant still in "provisioning". Another
+    job's lease is only taken over once it expired, i.e. that job's worker died. Commits.
+    '''
+    now = utcnow()
+    result = db.execute(
+        update(Tenant)
+        .where(
+            Tenant.id == tenant_id,
+            Tenant.status == TenantStatus.PROVISIONING,
+            or_(
+                Tenant.provisioning_claimed_by == claim,
+                Tenant.provisioning_lease_until.is_(None),
+                Tenant.provisioning_lease_until < now,
+            ),
+        )
+        .values(
+            provisioning_claimed_by=claim,
+            provisioning_lease_until=now + timedelta(seconds=settings.TENANT_PROVISIONING_LEASE_SECONDS),
+        )
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def provision_tenant(tenant_id: int, max_attempts: int, retry_backoff_seconds: float) -> str:
+    '''
+    Creates and migrates the database of a tenant in "provisioning" status, retrying with
+    exponential backoff. On final failure the database is dropped (if the tenant's
+    provisioning created it) and the tenant is marked "failed". Returns the resulting status,
+    or "provisioning" if another job holds the tenant's lease.
+
+    Every app worker resumes pending jobs, so the job first claims the tenant with a lease,
+    renews it before each attempt, and only records the outcome while still holding it.
+
+    A dedicated database that already exists is only used if the tenant's provisioning
+    created it (db_created_at, set right after the CREATE). Anything else fails the tenant
+    without retrying: the database belongs to someone else.
+
+    Shared tenants only need their shared database to exist; it is never dropped here.
+    '''
+    claim = uuid.uuid4().hex
+    db = SessionLocal()
+    try:
+        if not claim_provisioning(db, tenant_id, claim):
+            # Already handled, or being handled by another job (possibly in another worker)
+            return db.scalar(select(Tenant.status).where(Tenant.id == tenant_id)) or TenantStatus.FAILED
+        tenant = db.execute(
+            select(Tenant.db_name, Tenant.tenancy_mode, Tenant.organization_id, Tenant.db_created_at)
+            .where(Tenant.id == tenant_id)
+        ).one()
+        db.commit()
+        db_name = tenant.db_name
+        shared = tenant.tenancy_mode == TenancyMode.SHARED
+        created = tenant.db_created_at is not None # By this job or an earlier one for the same tenant
+        error: Optional[Exception] = None
+
+        for attempt in range(1, max_attempts + 1):
+            if attempt > 1 and not claim_provisioning(db, tenant_id, claim):
+                logger.warning(f"Lost the provisioning lease of tenant {tenant_id} ({db_name}); leaving it to the new holder")
+                return TenantStatus.PROVISIONING
+            try:
+                if shared:
+                    ensure_shared_database_ready(db, db_name)
+                else:
+                    if db_utils.create_mysql_database(db_name):
+                        created = True
+                        db.execute(
+                            update(Tenant)
+                            .where(Tenant.id == tenant_id, Tenant.provisioning_claimed_by == claim)
+                            .values(db_created_at=utcnow())
+                        )
+                        db.commit()
+                    elif not created:
+                        error = RuntimeError(f"Database {db_name} already exists and was not created for tenant {tenant_id}")
+                        break
+                    db_utils.run_tenant_migrations(db_name)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                logger.warning(f"Provisioning attempt {attempt}/{max_attempts} failed for {db_name}: {e}")
+                if attempt < max_attempts:
+                    time.sleep(retry_backoff_seconds * 2 ** (attempt - 1))
+
+        status = TenantStatus.ACTIVE if error is None else TenantStatus.FAILED
+        recorded = db.execute(
+            update(Tenant)
+            .where(Tenant.id == tenant_id, Tenant.status == TenantStatus.PROVISIONING, Tenant.provisioning_claimed_by == claim)
+            .values(
+                status=status,
+                provisioning_error=None if error is None else str(error)[:1024],
+                provisioning_claimed_by=None,
+                provisioning_lease_until=None,
+            )
+        ).rowcount == 1
+        if not recorded:
+            # The lease expired mid-attempt and another job took over: its outcome stands
+            db.rollback()
+            logger.warning(f"Lost the provisioning lease of tenant {tenant_id} ({db_name}); not recording {status}")
+            return TenantStatus.PROVISIONING
+        db.execute(bump_tenants_version(tenant.organization_id)) # The status shows in the tenant listing
+        db.commit()
+
+        if error is None:
+            logger.info(f"Provisioned tenant {tenant_id} ({db_name})")
+        else:
+            # Compensate: never leave a half-migrated database behind a failed tenant
+            if created:
+                try:
+                    db_utils.drop_mysql_database(db_name)
+                except Exception as e:
+                    logger.error(f"Could not drop {db_name} after failed provisioning: {e}")
+            logger.error(f"Provisioning failed for tenant {tenant_id} ({db_name}): {error}")
+        return status
+    finally:
+        db.close()
+
+
+class ProvisioningPipeline:
+    '''
+    Runs tenant provisioning jobs on a bounded thread pool, so a signup spike queues
+    jobs here instead of opening unbounded concurrent DDL sessions on the MySQL server.
+    '''
+
+    def __init__(self, max_workers: int, max_attempts: int, retry_backoff_seconds: float):
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._queued: Set[int] = set() # Tenant ids submitted here and not finished yet
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0 # Claimed by another job when this one started
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tenant-provisioning")
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            # Unstarted jobs stay in "provisioning" and are picked up by resume_pending on the next start
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, tenant_id: int) -> Future:
+        self.start()
+        self.submitted += 1
+        with self._lock:
+            self._queued.add(tenant_id)
+        future = self._executor.submit(provision_tenant, tenant_id, self.max_attempts, self.retry_backoff_seconds)
+        future.add_done_callback(lambda future: self._record_result(tenant_id, future))
+        return future
+
+    def _record_result(self, tenant_id: int, future: Future) -> None:
+        with self._lock:
+            self._queued.discard(tenant_id)
+        if future.cancelled():
+            return
+        result = None if future.exception() is not None else future.result()
+        if result == TenantStatus.ACTIVE:
+            self.succeeded += 1
+        elif result == TenantStatus.PROVISIONING:
+            self.skipped += 1
+        else:
+            self.failed += 1
+
+    def resume_pending(self) -> int:
+        '''
+        Enqueues tenants left in "provisioning" whose job is not running anywhere: never
+        claimed, or claimed by a job whose lease expired (its worker died). Runs at startup
+        and then every TENANT_PROVISIONING_RESUME_SECONDS from run_resumer.
+        '''
+        db = SessionLocal()
+        try:
+            tenant_ids = [
+                tenant_id for (tenant_id,) in
+                db.query(Tenant.id)
+                .filter(
+                    Tenant.status == TenantStatus.PROVISIONING,
+                    or_(Tenant.provisioning_lease_until.is_(None), Tenant.provisioning_lease_until < utcnow()),
+                )
+                .order_by(Tenant.id)
+            ]
+        except Exception as e:
+            logger.error(f"Could not load pending tenant provisioning jobs: {e}")
+            return 0
+        finally:
+            db.close()
+        with self._lock:
+            tenant_ids = [tenant_id for tenant_id in tenant_ids if tenant_id not in self._queued]
+        for tenant_id in tenant_ids:
+            self.submit(tenant_id)
+        return len(tenant_ids)
+
+    async def run_resumer(self) -> None:
+        '''
+        Background loop started from the app lifespan.
+        '''
+        while True:
+            await asyncio.sleep(settings.TENANT_PROVISIONING_RESUME_SECONDS)
+            await run_in_threadpool(self.resume_pending)
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "in_progress": self.submitted - self.succeeded - self.failed - self.skipped,
+        }
+
+
+provisioning_pipeline = ProvisioningPipeline(
+    max_workers=settings.TENANT_PROVISIONING_WORKERS,
+    max_attempts=settings.TENANT_PROVISIONING_MAX_ATTEMPTS,
+    retry_backoff_seconds=settings.TENANT_PROVISIONING_RETRY_BACKOFF_SECONDS,
+)
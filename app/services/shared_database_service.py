@@ -0,0 +1,127 @@
+import logging
+import time
+import uuid
+from datetime import timedelta
+from typing import List, Tuple
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import db_utils
+from app.models.central_models import SharedDatabase, SharedDatabaseStatus, TenancyMode, Tenant, utcnow
+
+logger = logging.getLogger(__name__)
+
+# A "creating" claim older than this is from a job that died; another job may take it over
+STALE_CREATE_AFTER = timedelta(minutes=10)
+# How long a provisioning job waits for another job to finish creating the same shared database
+CREATE_WAIT_SECONDS = 120
+
+
+def generate_shared_db_name() -> str:
+    return f"shared_{uuid.uuid4().hex[:20]}_db"
+
+
+def _candidates_statement(capacity: int):
+    # Fill the oldest databases first so tenants pack onto as few as possible. Tenants are
+    # counted rather than kept in a counter, so the cap is soft under concurrent placement.
+    placed = func.count(Tenant.id)
+    return (
+        select(SharedDatabase.db_name, SharedDatabase.status, placed.label("placed"))
+        .outerjoin(Tenant, (Tenant.db_name == SharedDatabase.db_name) & (Tenant.tenancy_mode == TenancyMode.SHARED))
+        .group_by(SharedDatabase.id, SharedDatabase.db_name, SharedDatabase.status)
+        .having(placed < capacity)
+        .order_by(SharedDatabase.id)
+    )
+
+def _assign(candidates, count: int, capacity: int) -> List[Tuple[str, bool]]:
+    placements: List[Tuple[str, bool]] = []
+    for db_name, status, placed in candidates:
+        take = min(count - len(placements), capacity - placed)
+        placements += [(db_name, status == SharedDatabaseStatus.READY)] * take
+        if len(placements) == count:
+            break
+    return placements
+
+def _new_databases(count: int, capacity: int) -> List[SharedDatabase]:
+    return [SharedDatabase(db_name=generate_shared_db_name()) for _ in range(-(-count // capacity))]
+
+
+def place_shared_tenants(db: Session, count: int) -> List[Tuple[str, bool]]:
+    '''
+    Picks a shared database for each of `count` new tenants: (db_name, ready) pairs. When the
+    existing ones are full, registers new ones in "provisioning" and commits them right away,
+    so the provisioning jobs of the tenants placed there can find them.
+    '''
+    capacity = max(1, settings.SHARED_DATABASE_CAPACITY)
+    placements = _assign(db.execute(_candidates_statement(capacity)).all(), count, capacity)
+    if len(placements) < count:
+        new = _new_databases(count - len(placements), capacity)
+        db.add_all(new)
+        db.commit()
+        placements += _assign([(d.db_name, d.status, 0) for d in new], count - len(placements), capacity)
+    return placements
+
+async def place_shared_tenants_async(db: AsyncSession, count: int) -> List[Tuple[str, bool]]:
+    capacity = max(1, settings.SHARED_DATABASE_CAPACITY)
+    placements = _assign((await db.execute(_candidates_statement(capacity))).all(), count, capacity)
+    if len(placements) < count:
+        new = _new_databases(count - len(placements), capacity)
+        db.add_all(new)
+        await db.commit()
+        placements += _assign([(d.db_name, d.status, 0) for d in new], count - len(placements), capacity)
+    return placements
+
+
+def ensure_shared_database_ready(db: Session, db_name: str) -> None:
+    '''
+    Called by the provisioning job of a tenant placed in `db_name`. One job claims the
+    database and creates and migrates it; jobs of other tenants placed there meanwhile wait
+    for it. Raises if it is not ready in time, so the job's retry loop takes over.
+    '''
+    deadline = time.monotonic() + CREATE_WAIT_SECONDS
+    while True:
+        status = db.scalar(select(SharedDatabase.status).where(SharedDatabase.db_name == db_name))
+        db.commit() # End the read transaction so the next poll sees other jobs' commits
+        if status is None:
+            raise RuntimeError(f"Shared database {db_name} is not registered")
+        if status == SharedDatabaseStatus.READY:
+            return
+        claimed = db.execute(
+            update(SharedDatabase)
+            .where(
+                SharedDatabase.db_name == db_name,
+                or_(
+                    SharedDatabase.status == SharedDatabaseStatus.PROVISIONING,
+                    (SharedDatabase.status == SharedDatabaseStatus.CREATING)
+                    & (SharedDatabase.status_changed_at < utcnow() - STALE_CREATE_AFTER),
+                ),
+            )
+            .values(status=SharedDatabaseStatus.CREATING, status_changed_at=utcnow())
+        ).rowcount == 1
+        db.commit()
+        if claimed:
+            break
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Timed out waiting for shared database {db_name} to be created")
+        time.sleep(1)
+
+    try:
+        db_utils.create_mysql_database(db_name)
+        revision = db_utils.run_tenant_migrations(db_name)
+    except Exception:
+        # Hand it back: the next attempt (of this job or another) claims it again
+        db.execute(
+            update(SharedDatabase).where(SharedDatabase.db_name == db_name)
+            .values(status=SharedDatabaseStatus.PROVISIONING, status_changed_at=utcnow())
+        )
+        db.commit()
+        raise
+    db.execute(
+        update(SharedDatabase).where(SharedDatabase.db_name == db_name)
+        .values(status=SharedDatabaseStatus.READY, status_changed_at=utcnow(), revision=revision)
+    )
+    db.commit()
+    logger.info(f"Created shared tenant database {db_name}")
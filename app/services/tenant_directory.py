@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.central_models import TenancyMode, Tenant
+
+logger = logging.getLogger(__name__)
+
+# Re-read rows this far behind the marker so transactions that committed late with an
+# earlier updated_at (or writers with slightly skewed clocks) are not missed.
+MARKER_OVERLAP = timedelta(seconds=30)
+
+
+class TenantRoute(NamedTuple):
+    # A plain tuple per tenant keeps the directory at ~100 bytes/tenant plus the strings
+    id: int
+    db_name: str
+    organization_id: int
+    status: str
+    tenancy_mode: str = TenancyMode.DEDICATED
+
+
+class TenantDirectory:
+    '''
+    In-process snapshot of subdomain -> (tenant id, db_name, organization id, status, tenancy mode).
+    Loaded once at startup, then refreshed incrementally using Tenant.updated_at as the
+    change marker, so subdomain routing never queries the central DB on the hot path.
+    '''
+
+    def __init__(self):
+        self._routes: Dict[str, TenantRoute] = {}
+        self._subdomain_by_id: Dict[int, str] = {} # To drop the old key when a subdomain changes
+        self._marker: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.last_refresh_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.stale_lookups = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def staleness_seconds(self) -> Optional[float]:
+        if self.last_refresh_at is None:
+            return None
+        return time.monotonic() - self.last_refresh_at
+
+    def lookup(self, subdomain: str) -> Optional[TenantRoute]:
+        route = self._routes.get(subdomain.lower())
+        if route is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        staleness = self.staleness_seconds()
+        if staleness is not None and staleness > settings.TENANT_DIRECTORY_MAX_STALENESS_SECONDS:
+            self.stale_lookups += 1
+        return route
+
+    def _put_locked(
+        self, tenant_id: int, subdomain: str, db_name: str, organization_id: int, status: str, tenancy_mode: str
+    ) -> None:
+        subdomain = subdomain.lower()
+        previous = self._subdomain_by_id.get(tenant_id)
+        if previous is not None and previous != subdomain:
+            self._routes.pop(previous, None)
+        self._routes[subdomain] = TenantRoute(tenant_id, db_name, organization_id, status, tenancy_mode)
+        self._subdomain_by_id[tenant_id] = subdomain
+
+    def upsert(self, tenant: Tenant) -> None:
+        '''
+        Records a tenant written by this worker so it is routable before the next refresh.
+        '''
+        self.upsert_route(tenant.id, tenant.subdomain, tenant.db_name, tenant.organization_id, tenant.status, tenant.tenancy_mode)
+
+    def upsert_route(
+        self, tenant_id: int, subdomain: str, db_name: str, organization_id: int, status: str,
+        tenancy_mode: str = TenancyMode.DEDICATED,
+    ) -> None:
+        with self._lock:
+            self._put_locked(tenant_id, subdomain, db_name, organization_id, status, tenancy_mode)
+
+    def refresh(self, db: Session) -> int:
+        '''
+        Loads every tenant on the first call and only rows changed since the last marker afterwards.
+        Returns the number of rows applied.
+        '''
+        query = db.query(
+            Tenant.id, Tenant.subdomain, Tenant.db_name, Tenant.organization_id, Tenant.status, Tenant.tenancy_mode,
+            Tenant.updated_at,
+        )
+        if self._marker is not None:
+            # Re-applying already-seen rows is idempotent
+            query = query.filter(Tenant.updated_at >= self._marker - MARKER_OVERLAP)
+        applied = 0
+        marker = self._marker
+        with self._lock:
+            for tenant_id, subdomain, db_name, organization_id, status, tenancy_mode, updated_at in query.yield_per(5000):
+                self._put_locked(tenant_id, subdomain, db_name, organization_id, status, tenancy_mode)
+                if updated_at is not None and (marker is None or updated_at > marker):
+                    marker = updated_at
+                applied += 1
+            self._marker = marker
+            self.loaded = True
+            self.last_refresh_at = time.monotonic()
+            self.refreshes += 1
+        return applied
+
+    def refresh_from_db(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.refresh(db)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.error(f"Tenant directory refresh failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def run_refresher(self) -> None:
+        '''
+        Background loop started from the app lifespan.
+        '''
+        while True:
+            await asyncio.sleep(settings.TENANT_DIRECTORY_REFRESH_SECONDS)
+            await run_in_threadpool(self.refresh_from_db)
+
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._routes),
+            "loaded": self.loaded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_lookups": self.stale_lookups,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "staleness_seconds": self.staleness_seconds(),
+        }
+
+
+tenant_directory = TenantDirectory()
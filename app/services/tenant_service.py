@@ -1,73 +1,92 @@
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Session
-from sqlalchemy import func # For case-insensitive subdomain check
-from fastapi import HTTPException, status # Added this import
 
-from app.models.central_models import Tenant, Organization, User
+from app.db.session import AsyncSessionLocal
+from app.models.central_models import TenancyMode, Tenant, TenantStatus, Organization, User
+from app.schemas.bulk_schemas import BulkItemResult
 from app.schemas.tenant_schemas import TenantCreate
-from app.db.db_utils import create_mysql_database, run_tenant_migrations # Import the new util
+from app.services.list_versions import bump_tenants_version
+from app.services.provisioning_service import provisioning_pipeline
+from app.services.shared_database_service import place_shared_tenants, place_shared_tenants_async
+from app.services.tenant_directory import tenant_directory
+from app.services.warm_pool_service import claim_spare_database, claim_spare_database_async, warm_pool
 from app.core.config import settings
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
-def generate_db_name(subdomain: str) -> str:
-    # Sanitize subdomain further if necessary, though validator should handle most.
-    # Ensure it's valid for MySQL DB names.
-    prefix = "tenant" 
-    # Remove hyphens and ensure it's not too long for a DB name component
-    safe_subdomain_part = subdomain.replace("-", "_")[:30] # Max DB name length is 64
-    # Corrected as per the latest prompt
-    return f"{prefix}_{safe_subdomain_part}_{settings.PROJECT_NAME.lower().replace(' ', '_')[:15]}_db"
+def generate_db_name(subdomain: str, tenant_id: Optional[int] = None) -> str:
+    '''
+    Name of a new dedicated tenant database. The subdomain part is only for humans: it is
+    truncated, so the name ends in the tenant id when it is known (promotion, which must find
+    the same database again on a re-run) and in a random token otherwise (new tenants, named
+    before they have an id). Stays within MySQL's 64 characters.
+    '''
+    safe_subdomain_part = subdomain.replace("-", "_")[:24]
+    project_part = settings.PROJECT_NAME.lower().replace(' ', '_')[:12]
+    suffix = f"t{tenant_id}" if tenant_id is not None else uuid.uuid4().hex[:12]
+    return f"tenant_{safe_subdomain_part}_{project_part}_{suffix}_db"
+
+def tenancy_mode_for(tenant_in: TenantCreate) -> str:
+    return tenant_in.tenancy_mode or settings.TENANT_DEFAULT_TENANCY_MODE
 
 
 def get_tenant_by_subdomain(db: Session, subdomain: str) -> Optional[Tenant]:
-    return db.query(Tenant).filter(func.lower(Tenant.subdomain) == func.lower(subdomain)).first()
+    # Subdomains are stored lowercase (see TenantBase validator), so compare on the raw
+    # column to keep the unique index usable.
+    return db.query(Tenant).filter(Tenant.subdomain == subdomain.lower()).first()
+
+def subdomain_in_use(db: Session, subdomain: str) -> bool:
+    # Answer from the in-process directory once it is loaded; the unique constraint on
+    # Tenant.subdomain still catches tenants created by other workers since the last refresh.
+    if tenant_directory.loaded:
+        return tenant_directory.lookup(subdomain) is not None
+    return get_tenant_by_subdomain(db, subdomain) is not None
 
 def create_tenant(db: Session, tenant_in: TenantCreate, organization: Organization) -> Tenant:
-    if get_tenant_by_subdomain(db, tenant_in.subdomain):
+    if subdomain_in_use(db, tenant_in.subdomain):
         # This ValueError will be caught by the router and turned into an HTTPException
         raise ValueError(f"Subdomain '{tenant_in.subdomain}' is already in use.")
 
-    db_name = generate_db_name(tenant_in.subdomain)
-
-    # 1. Create the physical database
-    try:
-        create_mysql_database(db_name)
-    except Exception as e:
-        logger.error(f"Tenant DB creation failed for {db_name}. Error: {e}")
-        # Potentially add more robust error handling or cleanup here
-        # Corrected as per the latest prompt
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to provision tenant database: {e}")
-
+    tenancy_mode = tenancy_mode_for(tenant_in)
+    if tenancy_mode == TenancyMode.SHARED:
+        # Shared tenants are active at once unless their shared database is still being created
+        [(db_name, ready)] = place_shared_tenants(db, 1)
+    else:
+        # Claim a pre-provisioned database from the warm pool in the same transaction as the
+        # tenant row. Without one, record the tenant as "provisioning" and let the provisioning
+        # pipeline create and migrate its database off the request path.
+        started = time.perf_counter()
+        spare_db_name = claim_spare_database(db) if warm_pool.enabled else None
+        warm_pool.record_claim(time.perf_counter() - started, claimed=spare_db_name is not None)
+        db_name, ready = spare_db_name or generate_db_name(tenant_in.subdomain), spare_db_name is not None
 
-    # 2. Create the tenant record in the central database
     db_tenant = Tenant(
         name=tenant_in.name,
         subdomain=tenant_in.subdomain,
         db_name=db_name,
-        organization_id=organization.id
+        organization_id=organization.id,
+        status=TenantStatus.ACTIVE if ready else TenantStatus.PROVISIONING,
+        tenancy_mode=tenancy_mode,
     )
     db.add(db_tenant)
-    # We commit here to get the tenant ID for migrations, or if migrations are separate.
-    # If migrations fail, we might need a compensating transaction (delete tenant record).
-    db.commit() 
-    db.refresh(db_tenant)
-    
-    # 3. Run migrations for the new tenant DB (placeholder for now)
+    db.execute(bump_tenants_version(organization.id))
     try:
-        run_tenant_migrations(db_name)
-    except Exception as e:
-        # This is critical. If migrations fail, the tenant DB might be unusable.
-        logger.error(f"Tenant migrations (placeholder) failed for {db_name}. Error: {str(e)}")
-        # For now, we are not rolling back the tenant creation in central DB.
-        # This needs careful consideration for production.
-        # A common pattern is to have a status field on the Tenant model (e.g., 'provisioning', 'active', 'failed').
-        # If this step fails, update status to 'provisioning_failed' and alert admins.
-        # For this task, we'll proceed with the tenant record created.
-    # Corrected as per the latest prompt
-    pass # Passing for now as it's a placeholder
+        db.commit()
+    except IntegrityError:
+        # Another worker claimed the subdomain after our directory snapshot was taken
+        db.rollback()
+        raise ValueError(f"Subdomain '{tenant_in.subdomain}' is already in use.")
+    db.refresh(db_tenant)
+    tenant_directory.upsert(db_tenant)
 
+    if db_tenant.status == TenantStatus.PROVISIONING:
+        provisioning_pipeline.submit(db_tenant.id)
     return db_tenant
 
 def get_tenants_for_organization(db: Session, organization_id: int, owner_id: int) -> List[Tenant]:
@@ -77,3 +96,192 @@ def get_tenants_for_organization(db: Session, organization_id: int, owner_id: in
         # Corrected as per the latest prompt
         return [] # Or raise HTTPException(status_code=404, detail="Organization not found or not owned by user")
     return db.query(Tenant).filter(Tenant.organization_id == organization_id).all()
+
+# Async variants used by the request path
+
+async def get_tenant_by_subdomain_async(db: AsyncSession, subdomain: str) -> Optional[Tenant]:
+    result = await db.execute(select(Tenant).where(Tenant.subdomain == subdomain.lower()).limit(1))
+    return result.scalars().first()
+
+async def subdomain_in_use_async(db: AsyncSession, subdomain: str) -> bool:
+    if tenant_directory.loaded:
+        return tenant_directory.lookup(subdomain) is not None
+    return await get_tenant_by_subdomain_async(db, subdomain) is not None
+
+async def create_tenant_async(db: AsyncSession, tenant_in: TenantCreate, organization: Organization) -> Tenant:
+    if await subdomain_in_use_async(db, tenant_in.subdomain):
+        raise ValueError(f"Subdomain '{tenant_in.subdomain}' is already in use.")
+
+    tenancy_mode = tenancy_mode_for(tenant_in)
+    if tenancy_mode == TenancyMode.SHARED:
+        [(db_name, ready)] = await place_shared_tenants_async(db, 1)
+    else:
+        started = time.perf_counter()
+        spare_db_name = await claim_spare_database_async(db) if warm_pool.enabled else None
+        warm_pool.record_claim(time.perf_counter() - started, claimed=spare_db_name is not None)
+        db_name, ready = spare_db_name or generate_db_name(tenant_in.subdomain), spare_db_name is not None
+
+    db_tenant = Tenant(
+        name=tenant_in.name,
+        subdomain=tenant_in.subdomain,
+        db_name=db_name,
+        organization_id=organization.id,
+        status=TenantStatus.ACTIVE if ready else TenantStatus.PROVISIONING,
+        tenancy_mode=tenancy_mode,
+    )
+    db.add(db_tenant)
+    await db.execute(bump_tenants_version(organization.id))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise ValueError(f"Subdomain '{tenant_in.subdomain}' is already in use.")
+    # No refresh: the session keeps attributes after commit and every column was set client-side
+    tenant_directory.upsert(db_tenant)
+
+    if db_tenant.status == TenantStatus.PROVISIONING:
+        provisioning_pipeline.submit(db_tenant.id)
+    return db_tenant
+
+async def get_tenant_for_organization_async(db: AsyncSession, tenant_id: int, organization_id: int, owner_id: int) -> Optional[Tenant]:
+    result = await db.execute(
+        select(Tenant)
+        .join(Organization, Tenant.organization_id == Organization.id)
+        .where(Tenant.id == tenant_id, Tenant.organization_id == organization_id, Organization.owner_id == owner_id)
+        .limit(1)
+    )
+    return result.scalars().first()
+
+# Columns of TenantRead, in its field order
+TENANT_READ_COLUMNS = (
+    Tenant.name, Tenant.subdomain, Tenant.id, Tenant.db_name, Tenant.organization_id, Tenant.status, Tenant.tenancy_mode
+)
+
+def _organization_tenants_statement(organization_id: int, owner_id: int, after_id: Optional[int], name_prefix: Optional[str]):
+    # Ownership check folded into the tenant query; keyset pagination on id
+    statement = (
+        select(Tenant)
+        .join(Organization, Tenant.organization_id == Organization.id)
+        .where(Tenant.organization_id == organization_id, Organization.owner_id == owner_id)
+    )
+    if after_id is not None:
+        statement = statement.where(Tenant.id > after_id)
+    if name_prefix:
+        statement = statement.where(Tenant.name.startswith(name_prefix, autoescape=True))
+    return statement.order_by(Tenant.id)
+
+async def get_tenants_for_organization_async(
+    db: AsyncSession, organization_id: int, owner_id: int,
+    limit: Optional[int] = None, after_id: Optional[int] = None, name_prefix: Optional[str] = None
+) -> List[Tenant]:
+    statement = _organization_tenants_statement(organization_id, owner_id, after_id, name_prefix)
+    if limit is not None:
+        statement = statement.limit(limit)
+    result = await db.execute(statement)
+    return list(result.scalars().all())
+
+async def stream_tenants_for_organization_async(
+    organization_id: int, owner_id: int, after_id: Optional[int] = None, name_prefix: Optional[str] = None,
+    sessionmaker: async_sessionmaker = AsyncSessionLocal,
+) -> AsyncIterator[Dict[str, Any]]:
+    '''
+    Yields tenants as dicts from a server-side cursor, 500 rows at a time, in its own session.
+    '''
+    statement = _organization_tenants_statement(organization_id, owner_id, after_id, name_prefix).with_only_columns(
+        *TENANT_READ_COLUMNS
+    )
+    async with sessionmaker() as db:
+        result = await db.stream(statement.execution_options(yield_per=500))
+        async for row in result:
+            yield row._asdict()
+
+async def find_taken_subdomains_async(db: AsyncSession, subdomains: Sequence[str]) -> Set[str]:
+    # One IN query per 1000 subdomains instead of one lookup per tenant
+    taken: Set[str] = set()
+    for start in range(0, len(subdomains), 1000):
+        result = await db.execute(select(Tenant.subdomain).where(Tenant.subdomain.in_(subdomains[start:start + 1000])))
+        taken.update(result.scalars())
+    return taken
+
+async def create_tenants_bulk_async(
+    db: AsyncSession, items: Sequence[Tuple[int, TenantCreate]], organization: Organization, chunk_size: int
+) -> List[BulkItemResult]:
+    '''
+    Creates tenants with executemany inserts, one transaction per chunk, and hands their
+    databases to the provisioning pipeline, whose worker pool bounds the fan-out.
+    `items` are (request index, tenant) pairs; returns one result per item.
+    '''
+    results: List[BulkItemResult] = []
+    candidates: List[Tuple[int, TenantCreate]] = []
+    seen: Set[str] = set()
+    for index, tenant_in in items:
+        if tenant_in.subdomain in seen:
+            results.append(BulkItemResult(index=index, status="error", error=f"Subdomain '{tenant_in.subdomain}' appears more than once in this batch."))
+            continue
+        seen.add(tenant_in.subdomain)
+        candidates.append((index, tenant_in))
+
+    taken = await find_taken_subdomains_async(db, [tenant_in.subdomain for _, tenant_in in candidates])
+    accepted: List[Tuple[int, TenantCreate]] = []
+    for index, tenant_in in candidates:
+        if tenant_in.subdomain in taken:
+            results.append(BulkItemResult(index=index, status="error", error=f"Subdomain '{tenant_in.subdomain}' is already in use."))
+            continue
+        accepted.append((index, tenant_in))
+
+    shared_count = sum(1 for _, tenant_in in accepted if tenancy_mode_for(tenant_in) == TenancyMode.SHARED)
+    placements = iter(await place_shared_tenants_async(db, shared_count) if shared_count else [])
+    pending: List[Tuple[int, dict]] = []
+    for index, tenant_in in accepted:
+        tenancy_mode = tenancy_mode_for(tenant_in)
+        if tenancy_mode == TenancyMode.SHARED:
+            db_name, ready = next(placements)
+        else:
+            db_name, ready = generate_db_name(tenant_in.subdomain), False
+        pending.append((index, {
+            "name": tenant_in.name,
+            "subdomain": tenant_in.subdomain,
+            "db_name": db_name,
+            "organization_id": organization.id,
+            "status": TenantStatus.ACTIVE if ready else TenantStatus.PROVISIONING,
+            "tenancy_mode": tenancy_mode,
+        }))
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        inserted = chunk
+        try:
+            await db.execute(insert(Tenant), [row for _, row in chunk])
+            await db.execute(bump_tenants_version(organization.id))
+            await db.commit()
+        except IntegrityError:
+            # Lost a race with another writer: retry this chunk row by row to pin down the conflicts
+            await db.rollback()
+            inserted = []
+            for index, row in chunk:
+                try:
+                    await db.execute(insert(Tenant), [row])
+                    await db.execute(bump_tenants_version(organization.id))
+                    await db.commit()
+                    inserted.append((index, row))
+                except IntegrityError:
+                    await db.rollback()
+                    results.append(BulkItemResult(index=index, status="error", error=f"Subdomain '{row['subdomain']}' is already in use."))
+
+        if not inserted:
+            continue
+        # executemany doesn't return ids portably; read them back through the unique subdomain index
+        id_result = await db.execute(
+            select(Tenant.subdomain, Tenant.id).where(Tenant.subdomain.in_([row["subdomain"] for _, row in inserted]))
+        )
+        ids = dict(id_result.all())
+        for index, row in inserted:
+            tenant_id = ids[row["subdomain"]]
+            tenant_directory.upsert_route(
+                tenant_id, row["subdomain"], row["db_name"], organization.id, row["status"], row["tenancy_mode"]
+            )
+            if row["status"] == TenantStatus.PROVISIONING:
+                provisioning_pipeline.submit(tenant_id)
+            results.append(BulkItemResult(index=index, status="created", id=tenant_id))
+
+    return sorted(results, key=lambda r: r.index)
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.central_models import TenantUsage
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("requests", "errors", "bytes_in", "bytes_out", "duration_ms")
+# Rows per upsert executemany; a flush is still one transaction
+FLUSH_BATCH_ROWS = 500
+
+
+def _upsert_statement(dialect_name: str):
+    # INSERT ... adding to the existing counters when the (organization, bucket, tenant) row exists
+    table = TenantUsage.__table__
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        return statement.on_duplicate_key_update({name: table.c[name] + statement.inserted[name] for name in COUNTERS})
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key.columns],
+            set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS},
+        )
+    raise NotImplementedError(f"Usage upserts are not implemented for {dialect_name}")
+
+
+class UsageMeter:
+    '''
+    Per-worker usage counters keyed by (organization id, tenant id, bucket start), filled by
+    the usage middleware with a dict update per request. Every USAGE_FLUSH_SECONDS, or as soon
+    as USAGE_FLUSH_MAX_KEYS counters are pending, they are added to tenant_usage in one
+    transaction of batched upserts: one row per tenant and bucket, however many requests.
+
+    A failed flush puts its counters back for the next one. If the database stays down,
+    counters for new (tenant, bucket) keys are dropped beyond USAGE_MAX_PENDING_KEYS rather
+    than growing without bound. The lifespan flushes once more at shutdown.
+    '''
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, int, int], List[float]] = {}
+        self._lock = threading.Lock() # record() runs on the event loop, flush() in the threadpool
+        self._flush_wanted: Optional[asyncio.Event] = None
+        self.recorded = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+
+    def record(
+        self, organization_id: int, tenant_id: int, status_code: int, bytes_in: int, bytes_out: int, seconds: float
+    ) -> None:
+        bucket = int(time.time()) // settings.USAGE_BUCKET_SECONDS * settings.USAGE_BUCKET_SECONDS
+        key = (organization_id, tenant_id, bucket)
+        with self._lock:
+            counters = self._pending.get(key)
+            if counters is None:
+                if len(self._pending) >= settings.USAGE_MAX_PENDING_KEYS:
+                    self.dropped += 1
+                    return
+                counters = self._pending[key] = [0, 0, 0, 0, 0.0]
+            counters[0] += 1
+            counters[1] += status_code >= 500
+            counters[2] += bytes_in
+            counters[3] += bytes_out
+            counters[4] += seconds * 1000
+            pending = len(self._pending)
+        self.recorded += 1
+        if pending >= settings.USAGE_FLUSH_MAX_KEYS and self._flush_wanted is not None:
+            self._flush_wanted.set()
+
+    def _restore(self, pending: Dict[Tuple[int, int, int], List[float]]) -> None:
+        with self._lock:
+            for key, counters in pending.items():
+                current = self._pending.get(key)
+                if current is None:
+                    if len(self._pending) >= settings.USAGE_MAX_PENDING_KEYS:
+                        self.dropped += int(counters[0])
+                        continue
+                    self._pending[key] = counters
+                else:
+                    for i, value in enumerate(counters):
+                        current[i] += value
+
+    def flush(self, db: Session) -> int:
+        '''
+        Upserts every pending counter and commits. Returns the number of rows written.
+        '''
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        rows = [
+            {
+                "organization_id": organization_id,
+                "tenant_id": tenant_id,
+                "bucket_start": datetime.fromtimestamp(bucket, timezone.utc).replace(tzinfo=None),
+                **dict(zip(COUNTERS, counters)),
+            }
+            for (organization_id, tenant_id, bucket), counters in pending.items()
+        ]
+        try:
+            statement = _upsert_statement(db.get_bind().dialect.name)
+            for start in range(0, len(rows), FLUSH_BATCH_ROWS):
+                db.execute(statement, rows[start:start + FLUSH_BATCH_ROWS])
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._restore(pending)
+            raise
+        self.flushes += 1
+        self.flushed_rows += len(rows)
+        return len(rows)
+
+    def flush_from_db(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.flush(db)
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error(f"Usage flush failed, keeping {len(self._pending)} counters for the next one: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def run_flusher(self) -> None:
+        '''
+        Background loop started from the app lifespan.
+        '''
+        self._flush_wanted = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wanted.wait(), settings.USAGE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wanted.clear()
+            await run_in_threadpool(self.flush_from_db)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+        }
+
+
+usage_meter = UsageMeter()
+
+
+def record_usage_owner(request, organization_id: int, tenant_id: int = 0) -> None:
+    '''
+    Bills the request to (organization, tenant); tenant 0 for organization-level requests.
+    Call it only once the current user's ownership has been checked: the usage middleware
+    never falls back to the ids in the path, which are just what the caller typed.
+    '''
+    request.state.usage_owner = (organization_id, tenant_id)
+
+
+async def get_organization_usage_async(
+    db: AsyncSession, organization_id: int, start: datetime, end: datetime, tenant_id: Optional[int] = None
+) -> List[TenantUsage]:
+    # A primary key range: organization_id, then bucket_start
+    statement = select(TenantUsage).where(
+        TenantUsage.organization_id == organization_id, TenantUsage.bucket_start >= start, TenantUsage.bucket_start < end
+    )
+    if tenant_id is not None:
+        statement = statement.where(TenantUsage.tenant_id == tenant_id)
+    result = await db.execute(statement.order_by(TenantUsage.bucket_start, TenantUsage.tenant_id))
+    return list(result.scalars().all())
+
+
+def roll_up_usage(rows: List[TenantUsage], granularity: str) -> List[Dict[str, Any]]:
+    '''
+    Usage rows as UsageBucketRead dicts, per stored bucket or summed per UTC day.
+    '''
+    buckets: Dict[Tuple[datetime, int], Dict[str, Any]] = {}
+    for row in rows:
+        bucket_start = row.bucket_start
+        if granularity == "day":
+            bucket_start = bucket_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        bucket = buckets.get((bucket_start, row.tenant_id))
+        if bucket is None:
+            bucket = buckets[(bucket_start, row.tenant_id)] = {
+                "tenant_id": row.tenant_id, "bucket_start": bucket_start, **dict.fromkeys(COUNTERS, 0)
+            }
+        for name in COUNTERS:
+            bucket[name] += getattr(row, name)
+    for bucket in buckets.values():
+        bucket["avg_duration_ms"] = bucket.pop("duration_ms") / bucket["requests"] if bucket["requests"] else 0.0
+    return list(buckets.values())
+
+
+def usage_range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    # Naive UTC, like the stored buckets; defaults to the last 7 days
+    def naive_utc(value: datetime) -> datetime:
+        return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+    end = naive_utc(end) if end else datetime.now(timezone.utc).replace(tzinfo=None)
+    start = naive_utc(start) if start else end - timedelta(days=7)
+    return start, end
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import uuid
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import db_utils
+from app.db.leases import acquire_lease
+from app.db.provisioners import get_provisioner
+from app.db.session import SessionLocal
+from app.models.central_models import SpareDatabase, SpareDatabaseStatus, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Claims race on the oldest ready row; retry a few times before falling back to provisioning
+CLAIM_ATTEMPTS = 3
+FILLER_LEASE = "warm_pool_filler"
+
+
+def generate_spare_db_name() -> str:
+    # Spare databases are created before we know the tenant, so the name can't derive from the subdomain
+    return f"tenant_{uuid.uuid4().hex[:20]}_db"
+
+
+def _claim_statement(spare_id: int):
+    return (
+        update(SpareDatabase)
+        .where(SpareDatabase.id == spare_id, SpareDatabase.status == SpareDatabaseStatus.READY)
+        .values(status=SpareDatabaseStatus.CLAIMED, claimed_at=utcnow())
+    )
+
+def _candidate_statement():
+    return (
+        select(SpareDatabase.id, SpareDatabase.db_name)
+        .where(SpareDatabase.status == SpareDatabaseStatus.READY)
+        .order_by(SpareDatabase.id)
+        .limit(1)
+    )
+
+
+def claim_spare_database(db: Session) -> Optional[str]:
+    '''
+    Marks one ready spare database as claimed and returns its name, or None if the pool is empty.
+    Does not commit: the caller commits the claim together with the tenant row.
+    '''
+    for _ in range(CLAIM_ATTEMPTS):
+        candidate = db.execute(_candidate_statement()).first()
+        if candidate is None:
+            return None
+        # The status guard makes the claim atomic: a concurrent claimer updates zero rows and retries
+        if db.execute(_claim_statement(candidate.id)).rowcount == 1:
+            return candidate.db_name
+    return None
+
+async def claim_spare_database_async(db: AsyncSession) -> Optional[str]:
+    for _ in range(CLAIM_ATTEMPTS):
+        candidate = (await db.execute(_candidate_statement())).first()
+        if candidate is None:
+            return None
+        if (await db.execute(_claim_statement(candidate.id))).rowcount == 1:
+            return candidate.db_name
+    return None
+
+
+class WarmPool:
+    '''
+    Keeps `target_size` spare tenant databases created and migrated ahead of demand,
+    refilling at most `refill_batch` per tick so the filler never floods the MySQL server.
+    Every worker runs the loop, but only the holder of the filler lease refills: counting
+    and creating in several workers at once would overshoot the target.
+    '''
+
+    def __init__(self, target_size: int, refill_batch: int, refill_interval_seconds: float):
+        self.target_size = target_size
+        self.refill_batch = refill_batch
+        self.refill_interval_seconds = refill_interval_seconds
+        self.ready = 0
+        self.created = 0
+        self.create_errors = 0
+        self.skipped_ticks = 0 # Another worker held the filler lease
+        self.claims = 0
+        self.claim_misses = 0
+        self.claim_seconds_total = 0.0
+        self.claim_seconds_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0
+
+    def record_claim(self, seconds: float, claimed: bool) -> None:
+        if claimed:
+            self.claims += 1
+            self.ready = max(0, self.ready - 1) # Recounted on the next refill tick
+        else:
+            self.claim_misses += 1
+        self.claim_seconds_total += seconds
+        self.claim_seconds_max = max(self.claim_seconds_max, seconds)
+
+    def _migrate_spare(self, db: Session, db_name: str) -> None:
+        try:
+            revision = db_utils.run_tenant_migrations(db_name)
+        except Exception:
+            db_utils.drop_mysql_database(db_name)
+            raise
+        db.add(SpareDatabase(db_name=db_name, status=SpareDatabaseStatus.READY, revision=revision))
+        db.commit()
+
+    def _drop_unmigrated(self, names: List[str]) -> None:
+        # Created by this refill but never migrated or recorded: nothing else knows about them
+        for db_name in names:
+            try:
+                db_utils.drop_mysql_database(db_name)
+            except Exception as e:
+                logger.error(f"Could not drop unused spare database {db_name}: {e}")
+
+    def fill_once(self) -> int:
+        '''
+        Creates up to `refill_batch` spare databases if the pool is below target. Returns how many were created.
+        '''
+        db = SessionLocal()
+        try:
+            self.ready = db.scalar(
+                select(func.count()).select_from(SpareDatabase).where(SpareDatabase.status == SpareDatabaseStatus.READY)
+            )
+            missing = min(self.refill_batch, self.target_size - self.ready)
+            if missing <= 0:
+                return 0
+            if not acquire_lease(db, FILLER_LEASE, settings.TENANT_WARM_POOL_FILLER_LEASE_SECONDS):
+                self.skipped_ticks += 1
+                return 0
+            # One batched CREATE pass on the shared admin connection, then migrate each
+            names = get_provisioner().create_databases([generate_spare_db_name() for _ in range(missing)])
+            created = 0
+            for index, db_name in enumerate(names):
+                # Renewed per spare, so a slow batch of migrations doesn't let a second filler in
+                if not acquire_lease(db, FILLER_LEASE, settings.TENANT_WARM_POOL_FILLER_LEASE_SECONDS):
+                    self._drop_unmigrated(names[index:])
+                    logger.warning(f"Lost the warm pool filler lease; stopping the refill after {created} spares")
+                    break
+                try:
+                    self._migrate_spare(db, db_name)
+                except Exception as e:
+                    db.rollback()
+                    self.create_errors += 1
+                    logger.error(f"Could not create spare tenant database: {e}")
+                    continue
+                created += 1
+            self.ready += created
+            self.created += created
+            return created
+        except Exception as e:
+            self.create_errors += 1
+            logger.error(f"Warm pool refill failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def run_filler(self) -> None:
+        '''
+        Background loop started from the app lifespan.
+        '''
+        while True:
+            await run_in_threadpool(self.fill_once)
+            await asyncio.sleep(self.refill_interval_seconds)
+
+    def stats(self) -> dict:
+        attempts = self.claims + self.claim_misses
+        return {
+            "target_size": self.target_size,
+            "ready": self.ready,
+            "created": self.created,
+            "create_errors": self.create_errors,
+            "skipped_ticks": self.skipped_ticks,
+            "claims": self.claims,
+            "claim_misses": self.claim_misses,
+            "claim_seconds_avg": self.claim_seconds_total / attempts if attempts else 0.0,
+            "claim_seconds_max": self.claim_seconds_max,
+        }
+
+
+warm_pool = WarmPool(
+    target_size=settings.TENANT_WARM_POOL_SIZE,
+    refill_batch=settings.TENANT_WARM_POOL_REFILL_BATCH,
+    refill_interval_seconds=settings.TENANT_WARM_POOL_REFILL_INTERVAL_SECONDS,
+)
@@ -0,0 +1,306 @@
+'''
+Load and latency benchmark for the HTTP API, run in-process.
+
+Boots the app from app.main.create_app on an httpx ASGI transport (lifespan included) against a throwaway
+SQLite central database and SQLite tenant files, seeds users/organizations/tenants, then
+drives each scenario with a fixed number of concurrent requests and reports req/s and
+p50/p95/p99 per endpoint. Cold start (import, app creation, startup and first request) is
+measured first, in a fresh interpreter.
+
+    python -m benchmarks.bench_api --users 200 --orgs-per-user 5 --tenants-per-org 5
+    python -m benchmarks.bench_api --output results.json --baseline benchmarks/baselines/api.json
+
+With --baseline the run exits non-zero when any scenario loses more than --max-regression
+of its throughput or grows its p95 by more than that fraction. Write a new baseline with
+--output after an intentional change, on the same machine the comparison will run on.
+'''
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks import percentile # Nothing from app.* here: settings must see configure_environment first
+
+SCENARIOS = ["register", "login", "list_organizations", "list_tenants", "create_tenant"]
+PASSWORD = "benchmark-password"
+
+
+def configure_environment(workdir: str, bcrypt_rounds: int) -> None:
+    # Must run before anything imports app.core.config: settings are read at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/central.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["TENANT_DB_BACKEND"] = "sqlite"
+    os.environ["TENANT_SQLITE_DIR"] = os.path.join(workdir, "tenants")
+    os.environ["TENANT_WARM_POOL_SIZE"] = "0"
+    os.environ["PASSWORD_HASH_ROUNDS"] = str(bcrypt_rounds)
+    os.environ["PASSWORD_HASH_MIN_ROUNDS"] = str(bcrypt_rounds)
+    os.environ["PASSWORD_HASH_TARGET_MS"] = "0" # Keep the configured cost, don't calibrate
+
+
+def seed(users: int, orgs_per_user: int, tenants_per_org: int, bcrypt_rounds: int) -> List[dict]:
+    '''
+    Creates the central schema and bulk-inserts the seed data. Returns, per user, the email
+    and the ids of their organizations.
+    '''
+    from sqlalchemy import insert, select
+
+    from app.core.password_hashing import bcrypt_hash
+    from app.db.session import SessionLocal, get_engine
+    from app.models.central_models import Base, Organization, Tenant, TenantStatus, User
+
+    Base.metadata.create_all(get_engine())
+    hashed = bcrypt_hash(PASSWORD, bcrypt_rounds) # Same password for everyone: hash once
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"email": f"seed{i}@bench.example.com", "hashed_password": hashed, "full_name": f"Seed {i}", "is_active": True}
+            for i in range(users)
+        ])
+        user_ids = db.scalars(select(User.id).order_by(User.id)).all()
+        db.execute(insert(Organization), [
+            {"name": f"org-{user_id}-{j}", "owner_id": user_id} for user_id in user_ids for j in range(orgs_per_user)
+        ])
+        organizations = db.execute(select(Organization.id, Organization.owner_id).order_by(Organization.id)).all()
+        if tenants_per_org:
+            db.execute(insert(Tenant), [
+                {
+                    "name": f"tenant-{org_id}-{k}",
+                    "subdomain": f"seed-{org_id}-{k}",
+                    "db_name": f"tenant_seed_{org_id}_{k}_db",
+                    "organization_id": org_id,
+                    "status": TenantStatus.ACTIVE,
+                }
+                for org_id, _ in organizations for k in range(tenants_per_org)
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+    org_ids_by_owner: Dict[int, List[int]] = {}
+    for org_id, owner_id in organizations:
+        org_ids_by_owner.setdefault(owner_id, []).append(org_id)
+    return [
+        {"email": f"seed{i}@bench.example.com", "org_ids": org_ids_by_owner.get(user_id, [])}
+        for i, user_id in enumerate(user_ids)
+    ]
+
+
+async def run_scenario(request: Callable[[int], Awaitable], requests: int, concurrency: int, first: int = 0) -> dict:
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            response = await request(first + i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "errors": errors,
+        "requests_per_sec": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run_benchmark(args, accounts: List[dict]) -> Dict[str, dict]:
+    import httpx
+
+    from app.main import create_app
+
+    app = create_app()
+    results = {}
+    run_id = uuid.uuid4().hex[:8] # Unique emails/subdomains, also across repeated runs on one database
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench.example.com") as client:
+            # A small set of logged-in users drives the read/write scenarios
+            sessions = []
+            for account in accounts[:max(1, min(len(accounts), args.concurrency))]:
+                response = await client.post("/auth/login", data={"username": account["email"], "password": PASSWORD})
+                response.raise_for_status()
+                headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+                sessions.append({"headers": headers, "org_ids": account["org_ids"]})
+            with_orgs = [s for s in sessions if s["org_ids"]]
+
+            def session_for(i: int) -> dict:
+                return sessions[i % len(sessions)]
+
+            def organization_for(i: int):
+                session = with_orgs[i % len(with_orgs)]
+                return session["headers"], session["org_ids"][i % len(session["org_ids"])]
+
+            def list_tenants(i: int):
+                headers, org_id = organization_for(i)
+                return client.get(f"/organizations/{org_id}/tenants/", params={"limit": args.page_size}, headers=headers)
+
+            def create_tenant(i: int):
+                headers, org_id = organization_for(i)
+                return client.post(
+                    f"/organizations/{org_id}/tenants/",
+                    json={"name": f"Bench {i}", "subdomain": f"bench-{run_id}-{i}"},
+                    headers=headers,
+                )
+
+            scenarios = {
+                "register": lambda i: client.post("/auth/register", json={
+                    "email": f"new-{run_id}-{i}@bench.example.com", "password": PASSWORD, "full_name": f"New {i}",
+                }),
+                "login": lambda i: client.post("/auth/login", data={
+                    "username": accounts[i % len(accounts)]["email"], "password": PASSWORD,
+                }),
+                "list_organizations": lambda i: client.get(
+                    "/organizations/", params={"limit": args.page_size}, headers=session_for(i)["headers"]
+                ),
+                "list_tenants": list_tenants,
+                "create_tenant": create_tenant,
+            }
+            for name in args.scenarios:
+                if name in ("list_tenants", "create_tenant") and not with_orgs:
+                    print(f"skipping {name}: no seeded organizations", file=sys.stderr)
+                    continue
+                # Warmup and timed requests use disjoint indices, so created emails/subdomains never collide
+                await run_scenario(scenarios[name], args.warmup, args.concurrency)
+                results[name] = await run_scenario(scenarios[name], args.requests, args.concurrency, first=args.warmup)
+    return results
+
+
+def cold_start_probe(email: str) -> None:
+    '''
+    Runs in a fresh interpreter (see measure_cold_start): times importing app.main, building
+    the app, running its startup and serving the first request, and prints them as JSON.
+    '''
+    started = time.perf_counter()
+    import app.main
+    imported = time.perf_counter()
+    application = app.main.create_app()
+    created = time.perf_counter()
+
+    async def run():
+        import httpx
+        async with application.router.lifespan_context(application):
+            ready = time.perf_counter()
+            transport = httpx.ASGITransport(app=application)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench.example.com") as client:
+                response = await client.post("/auth/login", data={"username": email, "password": PASSWORD})
+                response.raise_for_status()
+            return ready, time.perf_counter()
+
+    ready, first_response = asyncio.run(run())
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "create_app_ms": (created - imported) * 1000,
+        "startup_ms": (ready - created) * 1000,
+        "first_request_ms": (first_response - ready) * 1000,
+        "time_to_first_response_ms": (first_response - started) * 1000,
+    }))
+
+def measure_cold_start(email: str) -> dict:
+    # The environment set by configure_environment is inherited by the child
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_api", "--cold-start-probe", email],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current["requests_per_sec"] < base["requests_per_sec"] * (1 - max_regression):
+            regressions.append(
+                f"{name}: {current['requests_per_sec']:.1f} req/s vs baseline {base['requests_per_sec']:.1f}"
+            )
+        if current["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {current['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--orgs-per-user", type=int, default=5)
+    parser.add_argument("--tenants-per-org", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=500, help="Timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="Low by default so login doesn't dominate")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed fractional slowdown vs the baseline")
+    parser.add_argument("--cold-start-probe", metavar="EMAIL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.cold_start_probe:
+        cold_start_probe(args.cold_start_probe)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_api_")
+    configure_environment(workdir, args.bcrypt_rounds)
+    accounts = seed(args.users, args.orgs_per_user, args.tenants_per_org, args.bcrypt_rounds)
+    cold_start = measure_cold_start(accounts[0]["email"]) if accounts else {}
+    results = asyncio.run(run_benchmark(args, accounts))
+
+    print(
+        f"{args.users} users x {args.orgs_per_user} orgs x {args.tenants_per_org} tenants, "
+        f"{args.requests} requests per scenario, concurrency {args.concurrency}"
+    )
+    if cold_start:
+        print(
+            f"cold start: import {cold_start['import_ms']:.0f} ms, create_app {cold_start['create_app_ms']:.0f} ms, "
+            f"startup {cold_start['startup_ms']:.0f} ms, first request {cold_start['first_request_ms']:.0f} ms, "
+            f"time to first response {cold_start['time_to_first_response_ms']:.0f} ms"
+        )
+    for name, r in results.items():
+        print(
+            f"{name:20} {r['requests_per_sec']:8.1f} req/s  p50 {r['p50_ms']:7.1f} ms  "
+            f"p95 {r['p95_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  errors {r['errors']}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+                "python": platform.python_version(),
+                "cold_start": cold_start,
+                "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.max_regression:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+'''
+Micro-benchmark: bcrypt verification inline in the request threadpool ("before") vs the
+dedicated process pool in app.core.password_hashing ("after").
+
+Runs a burst of concurrent logins while a second stream of cheap threadpool calls stands in
+for unrelated endpoints, and reports logins/sec plus p99 latency of both streams.
+
+    python -m benchmarks.bench_password_hashing --logins 200 --concurrency 50 --rounds 10
+'''
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.password_hashing import PasswordHasher, bcrypt_hash, bcrypt_verify
+from benchmarks import percentile
+
+
+async def run_scenario(verify, hashed: str, logins: int, concurrency: int) -> dict:
+    login_latencies = []
+    other_latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async def login():
+        async with semaphore:
+            start = time.perf_counter()
+            await verify("benchmark-password", hashed)
+            login_latencies.append(time.perf_counter() - start)
+
+    async def unrelated_traffic():
+        while not done.is_set():
+            start = time.perf_counter()
+            await run_in_threadpool(sum, range(100))
+            other_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.005)
+
+    background = asyncio.create_task(unrelated_traffic())
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await background
+
+    return {
+        "logins_per_sec": logins / elapsed,
+        "login_p50_ms": statistics.median(login_latencies) * 1000,
+        "login_p99_ms": percentile(login_latencies, 99) * 1000,
+        "other_p99_ms": percentile(other_latencies, 99) * 1000 if other_latencies else 0.0,
+    }
+
+
+async def main(args) -> None:
+    hashed = bcrypt_hash("benchmark-password", args.rounds)
+
+    async def inline_verify(password, hashed_password):
+        return await run_in_threadpool(bcrypt_verify, password, hashed_password)
+
+    hasher = PasswordHasher(max_workers=args.workers, max_queue=args.logins, rounds=args.rounds)
+    hasher.start()
+    try:
+        await hasher.verify("warmup", hashed) # Spawn the worker processes outside the timed run
+        results = {
+            "before (threadpool)": await run_scenario(inline_verify, hashed, args.logins, args.concurrency),
+            "after (process pool)": await run_scenario(hasher.verify, hashed, args.logins, args.concurrency),
+        }
+    finally:
+        hasher.shutdown()
+
+    print(f"{args.logins} logins, concurrency {args.concurrency}, bcrypt rounds {args.rounds}, {args.workers} hash workers")
+    for name, r in results.items():
+        print(
+            f"{name:22} {r['logins_per_sec']:8.1f} logins/s  "
+            f"login p50 {r['login_p50_ms']:7.1f} ms  p99 {r['login_p99_ms']:7.1f} ms  "
+            f"other endpoints p99 {r['other_p99_ms']:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    asyncio.run(main(parser.parse_args()))
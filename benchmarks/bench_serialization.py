@@ -0,0 +1,99 @@
+'''
+CPU per list response: ORM instances validated through the response model and encoded
+with the stdlib json module ("before"), vs column tuples serialized straight to orjson
+("after", the path used by the list endpoints).
+
+Each strategy runs the query and builds the response body for the same N-row listing on
+an SQLite central database; CPU time is measured with time.process_time.
+
+    python -m benchmarks.bench_serialization --rows 10000 --iterations 20
+'''
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import percentile # Nothing from app.* here: settings must see the environment first
+
+
+async def main(args) -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_serialization_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/central.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy import insert
+    from typing import List
+
+    from app.core.request_context import RequestContext
+    from app.db.session import AsyncSessionLocal, SessionLocal, central_engines, get_engine
+    from app.models.central_models import Base, Organization, Tenant, TenantStatus, User
+    from app.routers.response_utils import rows_response
+    from app.schemas.org_schemas import OrganizationRead
+    from app.schemas.tenant_schemas import TenantRead
+    from app.services import org_service, tenant_service
+
+    Base.metadata.create_all(get_engine())
+    with SessionLocal() as db:
+        db.execute(insert(User), [{"email": "owner@bench.example.com", "hashed_password": "x", "full_name": "Owner"}])
+        db.execute(insert(Organization), [{"name": f"organization {i}", "owner_id": 1} for i in range(args.rows)])
+        db.execute(insert(Tenant), [
+            {"name": f"tenant {i}", "subdomain": f"tenant-{i}", "db_name": f"tenant_{i}_db", "organization_id": 1, "status": TenantStatus.ACTIVE}
+            for i in range(args.rows)
+        ])
+        db.commit()
+
+    owner = User(id=1, email="owner@bench.example.com")
+    organizations_adapter = TypeAdapter(List[OrganizationRead])
+    tenants_adapter = TypeAdapter(List[TenantRead])
+
+    async def organizations_before(db):
+        organizations = await org_service.get_user_organizations_async(db, owner_id=1, limit=args.rows)
+        validated = organizations_adapter.validate_python(organizations, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    async def organizations_after(db):
+        rows = await org_service.get_user_organization_rows_async(db, owner_id=1, limit=args.rows)
+        return rows_response(rows, args.rows).body
+
+    async def tenants_before(db):
+        tenants = await tenant_service.get_tenants_for_organization_async(db, organization_id=1, owner_id=1, limit=args.rows)
+        validated = tenants_adapter.validate_python(tenants, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    async def tenants_after(db):
+        # What the tenants list endpoint runs: ownership check and page in one query
+        _, rows = await RequestContext(db, owner).get_organization_tenant_rows(1, limit=args.rows)
+        return rows_response(rows, args.rows).body
+
+    strategies = {
+        "organizations before": organizations_before,
+        "organizations after": organizations_after,
+        "tenants before": tenants_before,
+        "tenants after": tenants_after,
+    }
+    print(f"{args.rows} rows per response, {args.iterations} iterations")
+    for name, build in strategies.items():
+        cpu = []
+        for i in range(args.iterations + 1):
+            async with AsyncSessionLocal() as db: # Fresh session: no identity-map reuse across iterations
+                start = time.process_time()
+                body = await build(db)
+                if i: # First run warms caches
+                    cpu.append(time.process_time() - start)
+        print(
+            f"{name:22} CPU per response p50 {statistics.median(cpu) * 1000:8.1f} ms  "
+            f"p95 {percentile(cpu, 95) * 1000:8.1f} ms  body {len(body) / 1024:8.0f} KiB"
+        )
+    await central_engines.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
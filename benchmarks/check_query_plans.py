@@ -0,0 +1,378 @@
+'''
+Query plan regression check for the central database.
+
+Migrates a scratch central database with alembic_central (so plans reflect the migrations,
+not create_all), seeds it, then runs each hot service query below while recording the SQL
+it sends, and EXPLAINs every recorded statement with the parameters it ran with. A full
+table or full index scan on a table the check does not expect one on fails the run.
+
+    python -m benchmarks.check_query_plans
+    python -m benchmarks.check_query_plans --verbose --checks organizations_list tenants_list
+    python -m benchmarks.check_query_plans --database-url mysql+mysqlclient://u:p@localhost/plans_scratch
+
+SQLite in a temporary directory is the default. Point --database-url at an empty scratch
+MySQL database to check the plans production gets; the script creates and seeds its tables.
+Exits non-zero when any check fails.
+'''
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Nothing from app.* at import time: settings must see configure_environment first
+
+
+def configure_environment(workdir: str, database_url: Optional[str]) -> None:
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{workdir}/central.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["DATABASE_REPLICA_URLS"] = ""
+    os.environ["TENANT_DB_BACKEND"] = "sqlite"
+    os.environ["TENANT_SQLITE_DIR"] = os.path.join(workdir, "tenants")
+    os.environ["TENANT_WARM_POOL_SIZE"] = "0"
+    os.environ["JWT_ALGORITHM"] = "HS256" # Token checks issue tokens without loading a key ring
+
+
+def migrate() -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config(os.path.join(ROOT, "alembic.ini")), "head")
+
+
+@dataclass
+class Seed:
+    owner_id: int
+    email: str
+    org_id: int
+    tenant_id: int
+    subdomain: str
+
+
+def seed(users: int, orgs_per_user: int, tenants_per_org: int) -> Seed:
+    '''
+    Bulk-inserts users/organizations/tenants and a few rows in the other tables, then
+    refreshes planner statistics. Returns ids of a user in the middle of the data.
+    '''
+    from datetime import timedelta
+
+    from sqlalchemy import insert, select, text
+
+    from app.db.session import SessionLocal
+    from app.models.central_models import (
+        Base, Organization, RevokedToken, SharedDatabase, SharedDatabaseStatus, SpareDatabase, Tenant, TenantStatus,
+        User, utcnow,
+    )
+
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"email": f"plan{i}@plans.example.com", "hashed_password": "x", "full_name": f"Plan {i}"} for i in range(users)
+        ])
+        user_ids = db.scalars(select(User.id).order_by(User.id)).all()
+        db.execute(insert(Organization), [
+            {"name": f"org-{user_id}-{j}", "owner_id": user_id} for user_id in user_ids for j in range(orgs_per_user)
+        ])
+        org_ids = db.scalars(select(Organization.id).order_by(Organization.id)).all()
+        db.execute(insert(Tenant), [
+            {
+                "name": f"tenant-{org_id}-{k}",
+                "subdomain": f"plan-{org_id}-{k}",
+                "db_name": f"tenant_plan_{org_id}_{k}_db",
+                "organization_id": org_id,
+                "status": TenantStatus.ACTIVE,
+            }
+            for org_id in org_ids for k in range(tenants_per_org)
+        ])
+        db.execute(insert(SpareDatabase), [{"db_name": f"tenant_spare_{i}_db"} for i in range(20)])
+        db.execute(insert(SharedDatabase), [
+            {"db_name": f"shared_plan_{i}_db", "status": SharedDatabaseStatus.READY} for i in range(5)
+        ])
+        now = utcnow()
+        db.execute(insert(RevokedToken), [
+            {"jti": f"plan-revoked-{i}", "user_id": user_ids[i % len(user_ids)], "expires_at": now + timedelta(minutes=i % 60)}
+            for i in range(1000)
+        ])
+        db.commit()
+        if db.get_bind().dialect.name == "sqlite":
+            db.execute(text("ANALYZE"))
+        else:
+            db.execute(text(f"ANALYZE TABLE {', '.join(Base.metadata.tables)}"))
+        db.commit()
+
+        owner_id = user_ids[len(user_ids) // 2]
+        org_id = db.scalar(select(Organization.id).where(Organization.owner_id == owner_id).order_by(Organization.id))
+        tenant_id, subdomain = db.execute(
+            select(Tenant.id, Tenant.subdomain).where(Tenant.organization_id == org_id).order_by(Tenant.id)
+        ).first()
+        email = db.scalar(select(User.email).where(User.id == owner_id))
+    finally:
+        db.close()
+    return Seed(owner_id, email, org_id, tenant_id, subdomain)
+
+
+class StatementRecorder:
+    '''
+    Records the SELECT/UPDATE/DELETE statements (and their DBAPI parameters) sent by the
+    central engines while recording is on.
+    '''
+
+    def __init__(self):
+        self.statements: List[Tuple[str, object]] = []
+        self.recording = False
+
+    def install(self, engine) -> None:
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording and not executemany and statement.lstrip()[:6].upper() in ("SELECT", "UPDATE", "DELETE"):
+            self.statements.append((statement, parameters))
+
+    @contextmanager
+    def paused(self):
+        # For setup a check needs but whose queries it does not judge
+        self.recording = False
+        try:
+            yield
+        finally:
+            self.recording = True
+
+
+@dataclass
+class CheckContext:
+    db: object # AsyncSession
+    sync_db: object # Session
+    seed: Seed
+    recorder: StatementRecorder
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    run: Callable[[CheckContext], Awaitable[None]]
+    allowed_scans: Tuple[str, ...] = () # Tables this check legitimately reads in full
+
+
+CHECKS: List[PlanCheck] = []
+
+def plan_check(name: str, allowed_scans: Tuple[str, ...] = ()):
+    def register(run):
+        CHECKS.append(PlanCheck(name, run, allowed_scans))
+        return run
+    return register
+
+
+@plan_check("login_lookup")
+async def _login_lookup(ctx: CheckContext):
+    from app.services import auth_service
+
+    await auth_service.get_user_by_email_async(ctx.db, ctx.seed.email)
+
+@plan_check("organizations_list")
+async def _organizations_list(ctx: CheckContext):
+    from app.services import org_service
+
+    await org_service.get_organizations_version_async(ctx.db, ctx.seed.owner_id)
+    await org_service.get_user_organization_rows_async(ctx.db, ctx.seed.owner_id, limit=50)
+    await org_service.get_user_organization_rows_async(ctx.db, ctx.seed.owner_id, limit=50, after_id=ctx.seed.org_id)
+
+@plan_check("organization_get")
+async def _organization_get(ctx: CheckContext):
+    from app.services import org_service
+
+    await org_service.get_organization_by_id_async(ctx.db, ctx.seed.org_id, ctx.seed.owner_id)
+
+@plan_check("tenants_list")
+async def _tenants_list(ctx: CheckContext):
+    from app.core.request_context import RequestContext
+    from app.models.central_models import User
+    from app.services import tenant_service
+
+    request_context = RequestContext(ctx.db, User(id=ctx.seed.owner_id))
+    await request_context.get_tenants_version(ctx.seed.org_id)
+    await request_context.get_organization_tenant_rows(ctx.seed.org_id, limit=50)
+    await request_context.get_organization_tenant_rows(ctx.seed.org_id, limit=50, after_id=ctx.seed.tenant_id)
+    await tenant_service.get_tenants_for_organization_async(ctx.db, ctx.seed.org_id, ctx.seed.owner_id, limit=50)
+
+@plan_check("tenant_get")
+async def _tenant_get(ctx: CheckContext):
+    from app.services import tenant_service
+
+    await tenant_service.get_tenant_for_organization_async(ctx.db, ctx.seed.tenant_id, ctx.seed.org_id, ctx.seed.owner_id)
+
+@plan_check("subdomain_lookup")
+async def _subdomain_lookup(ctx: CheckContext):
+    from app.services import tenant_service
+
+    await tenant_service.get_tenant_by_subdomain_async(ctx.db, ctx.seed.subdomain.upper())
+    tenant_service.get_tenant_by_subdomain(ctx.sync_db, ctx.seed.subdomain)
+    await tenant_service.find_taken_subdomains_async(ctx.db, [ctx.seed.subdomain, "plan-unused"])
+
+@plan_check("tenant_directory_refresh")
+async def _tenant_directory_refresh(ctx: CheckContext):
+    from app.services.tenant_directory import TenantDirectory
+
+    directory = TenantDirectory()
+    with ctx.recorder.paused():
+        directory.refresh(ctx.sync_db) # The first load reads every tenant by design
+    directory.refresh(ctx.sync_db)
+
+@plan_check("provisioning_resume")
+async def _provisioning_resume(ctx: CheckContext):
+    from app.services.provisioning_service import provisioning_pipeline
+
+    provisioning_pipeline.resume_pending() # The seed has no tenants in "provisioning", so nothing is submitted
+
+@plan_check("refresh_token_rotation")
+async def _refresh_token_rotation(ctx: CheckContext):
+    from app.services import auth_service
+
+    with ctx.recorder.paused():
+        user = await auth_service.get_user_by_email_async(ctx.db, ctx.seed.email)
+        tokens = await auth_service.issue_tokens_async(ctx.db, user)
+    rotated = await auth_service.refresh_tokens_async(ctx.db, tokens["refresh_token"])
+    await auth_service.revoke_refresh_token_async(ctx.db, rotated["refresh_token"], user.id)
+
+@plan_check("token_denylist_sync")
+async def _token_denylist_sync(ctx: CheckContext):
+    from app.core.token_denylist import TokenDenylist
+
+    denylist = TokenDenylist()
+    denylist.sync(ctx.sync_db)
+    denylist.sync(ctx.sync_db)
+    denylist.purge_expired(ctx.sync_db)
+
+@plan_check("spare_database_claim")
+async def _spare_database_claim(ctx: CheckContext):
+    from app.services.warm_pool_service import claim_spare_database
+
+    claim_spare_database(ctx.sync_db)
+    ctx.sync_db.rollback()
+
+@plan_check("shared_placement", allowed_scans=("shared_databases",)) # Counts tenants per shared database
+async def _shared_placement(ctx: CheckContext):
+    from app.services.shared_database_service import place_shared_tenants_async
+
+    await place_shared_tenants_async(ctx.db, 1)
+
+@plan_check("signing_keys_load", allowed_scans=("signing_keys",)) # A few rows: every unexpired key
+async def _signing_keys_load(ctx: CheckContext):
+    from app.core.signing_keys import KeyRing
+
+    KeyRing().load(ctx.sync_db)
+
+
+@plan_check("organization_usage")
+async def _organization_usage(ctx: CheckContext):
+    from datetime import datetime, timedelta, timezone
+
+    from app.services import usage_service
+
+    end = datetime.now(timezone.utc).replace(tzinfo=None)
+    await usage_service.get_organization_usage_async(ctx.db, ctx.seed.org_id, end - timedelta(days=7), end)
+
+
+@dataclass
+class PlanStep:
+    table: Optional[str]
+    full_scan: bool
+    detail: str
+
+
+@dataclass
+class CheckResult:
+    name: str
+    plans: List[Tuple[str, List[PlanStep]]] = field(default_factory=list)
+    violations: List[str] = field(default_factory=list)
+
+
+def explain(connection, statement: str, parameters) -> List[PlanStep]:
+    if connection.dialect.name == "sqlite":
+        steps = []
+        for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+            detail = row[-1]
+            words = detail.split()
+            # "SCAN t" and "SCAN t USING [COVERING] INDEX i" both read every row; SEARCH is a lookup or range
+            full_scan = words[0] == "SCAN" and words[1] != "CONSTANT" and not words[1].startswith("(")
+            steps.append(PlanStep(words[1] if full_scan else None, full_scan, detail))
+        return steps
+    steps = []
+    for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters).mappings():
+        # MySQL: type ALL is a full table scan, index a full index scan
+        full_scan = row["type"] in ("ALL", "index")
+        steps.append(PlanStep(
+            row["table"], full_scan, f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}"
+        ))
+    return steps
+
+
+async def run_checks(checks: List[PlanCheck], seed_data: Seed) -> List[CheckResult]:
+    from app.db.session import AsyncSessionLocal, SessionLocal, central_engines, get_engine
+
+    recorder = StatementRecorder()
+    central_engines.add_hook(recorder.install)
+    results = []
+    for check in checks:
+        recorder.statements = []
+        async with AsyncSessionLocal() as db:
+            sync_db = SessionLocal()
+            try:
+                recorder.recording = True
+                await check.run(CheckContext(db, sync_db, seed_data, recorder))
+            finally:
+                recorder.recording = False
+                sync_db.close()
+        result = CheckResult(check.name)
+        with get_engine().connect() as connection:
+            for statement, parameters in recorder.statements:
+                steps = explain(connection, statement, parameters)
+                result.plans.append((statement, steps))
+                for step in steps:
+                    if step.full_scan and step.table not in check.allowed_scans:
+                        result.violations.append(f"full scan of {step.table}: {step.detail}\n    in: {' '.join(statement.split())}")
+        if not recorder.statements:
+            result.violations.append("no statements recorded")
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Empty scratch central database (default: a temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--orgs-per-user", type=int, default=5)
+    parser.add_argument("--tenants-per-org", type=int, default=3)
+    parser.add_argument("--checks", nargs="+", choices=[check.name for check in CHECKS])
+    parser.add_argument("--verbose", action="store_true", help="Print every statement's plan")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="query_plans_")
+    configure_environment(workdir, args.database_url)
+    migrate()
+    seed_data = seed(args.users, args.orgs_per_user, args.tenants_per_org)
+    checks = [check for check in CHECKS if not args.checks or check.name in args.checks]
+    results = asyncio.run(run_checks(checks, seed_data))
+
+    failed = 0
+    for result in results:
+        print(f"{'FAIL' if result.violations else 'ok':4} {result.name} ({len(result.plans)} statements)")
+        if args.verbose:
+            for statement, steps in result.plans:
+                print(f"    {' '.join(statement.split())}")
+                for step in steps:
+                    print(f"      {'!' if step.full_scan else '-'} {step.detail}")
+        for violation in result.violations:
+            print(f"    {violation}")
+        failed += bool(result.violations)
+    print(f"{len(results) - failed}/{len(results)} checks passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+'''
+Database round-trip budgets for the organization and tenant endpoints.
+
+Boots the app with its lifespan on a scratch central database migrated with
+alembic_central, registers and logs in a user, then calls each endpoint below inside
+`sql_profiler.profile(max_queries=...)`. A request that sends more statements than its
+budget, or answers with an unexpected status, fails the run. Statements from background
+loops (denylist sync, usage flushes, provisioning jobs) run outside the request and are
+not counted.
+
+    python -m benchmarks.check_round_trips
+    python -m benchmarks.check_round_trips --verbose
+
+The budgets are the round trips each endpoint needs once the caller's principal is cached.
+Raise one only together with the change that needs the extra query. Exits non-zero when
+any budget is exceeded.
+'''
+import argparse
+import os
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from benchmarks.check_query_plans import configure_environment, migrate # Neither imports app.* at import time
+
+EMAIL = "round-trips@example.com"
+PASSWORD = "round-trips-password"
+
+
+@dataclass
+class Ids:
+    org_id: Optional[int] = None
+    tenant_id: Optional[int] = None
+    organizations_etag: Optional[str] = None
+    tenants_etag: Optional[str] = None
+
+
+@dataclass
+class RoundTripBudget:
+    name: str
+    method: str
+    path: Callable[[Ids], str]
+    max_queries: int
+    status_code: int = 200
+    json: Optional[Callable[[Ids], dict]] = None
+    headers: Optional[Callable[[Ids], dict]] = None
+    keep: Optional[Callable[[Ids, object], None]] = None # Stores ids from the response for later steps
+
+
+# In order: later steps use the organization, tenant and ETags from earlier ones
+BUDGETS: List[RoundTripBudget] = [
+    # The insert plus the owner's orgs_version bump that invalidates cached listings
+    RoundTripBudget(
+        "create_organization", "POST", lambda ids: "/organizations/", 2, 201,
+        json=lambda ids: {"name": "round-trips"},
+        keep=lambda ids, response: setattr(ids, "org_id", response.json()["id"]),
+    ),
+    # The version counter read, then the page
+    RoundTripBudget(
+        "list_organizations", "GET", lambda ids: "/organizations/", 2,
+        keep=lambda ids, response: setattr(ids, "organizations_etag", response.headers["etag"]),
+    ),
+    RoundTripBudget(
+        "list_organizations_not_modified", "GET", lambda ids: "/organizations/", 1, 304,
+        headers=lambda ids: {"If-None-Match": ids.organizations_etag},
+    ),
+    RoundTripBudget("get_organization", "GET", lambda ids: f"/organizations/{ids.org_id}", 1),
+    # Ownership check, then the insert and the tenants_version bump
+    RoundTripBudget(
+        "create_tenant", "POST", lambda ids: f"/organizations/{ids.org_id}/tenants/", 3, 202,
+        json=lambda ids: {"name": "Round trips", "subdomain": "round-trips"},
+        keep=lambda ids, response: setattr(ids, "tenant_id", response.json()["id"]),
+    ),
+    # Ownership, version and the first page in one join
+    RoundTripBudget(
+        "list_tenants", "GET", lambda ids: f"/organizations/{ids.org_id}/tenants/", 1,
+        keep=lambda ids, response: setattr(ids, "tenants_etag", response.headers["etag"]),
+    ),
+    RoundTripBudget(
+        "list_tenants_not_modified", "GET", lambda ids: f"/organizations/{ids.org_id}/tenants/", 1, 304,
+        headers=lambda ids: {"If-None-Match": ids.tenants_etag},
+    ),
+    RoundTripBudget("unknown_organization", "GET", lambda ids: "/organizations/999999999/tenants/", 1, 404),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="Print every request's statements")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="round_trips_")
+    configure_environment(workdir, None)
+    os.environ["PASSWORD_HASH_TARGET_MS"] = "0" # Keep the configured cost, don't calibrate
+    os.environ["PASSWORD_HASH_ROUNDS"] = os.environ["PASSWORD_HASH_MIN_ROUNDS"] = "4"
+    migrate()
+
+    from fastapi.testclient import TestClient
+
+    from app.core.sql_profiler import QueryBudgetExceeded, sql_profiler
+    from app.main import app
+
+    failed = 0
+    ids = Ids()
+    with TestClient(app) as client:
+        client.post("/auth/register", json={"email": EMAIL, "password": PASSWORD, "full_name": "Round Trips"})
+        token = client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.get("/organizations/", headers=headers) # Caches the principal, as for any caller after its first request
+
+        for budget in BUDGETS:
+            error = None
+            try:
+                with sql_profiler.profile(budget.name, max_queries=budget.max_queries) as profile:
+                    response = client.request(
+                        budget.method,
+                        budget.path(ids),
+                        headers={**headers, **(budget.headers(ids) if budget.headers else {})},
+                        json=budget.json(ids) if budget.json else None,
+                    )
+            except QueryBudgetExceeded as e:
+                error = str(e)
+            if response.status_code != budget.status_code:
+                error = f"{budget.name}: status {response.status_code}, expected {budget.status_code}: {response.text[:200]}"
+            elif budget.keep is not None:
+                budget.keep(ids, response)
+            print(f"{'FAIL' if error else 'ok':4} {budget.name} ({profile.queries} queries, budget {budget.max_queries})")
+            if args.verbose:
+                for fp, stats in profile.fingerprints.items():
+                    print(f"    {stats.count}x {fp}")
+            if error:
+                print("    " + error.replace("\n", "\n    "))
+            failed += bool(error)
+    print(f"{len(BUDGETS) - failed}/{len(BUDGETS)} budgets met")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()